@@ -0,0 +1,76 @@
+"""Benchmark header-only image inspection against the Pillow verify() path.
+
+Usage:
+    JWT_SECRET=bench poetry run python benchmarks/bench_image_inspect.py [--iterations N]
+
+For each sample image the script times:
+- inspect:  storage.image_header.inspect_image_file (header parse, no decode)
+- verify:   Image.open(path) + img.verify() as done by save_profile_photo
+- decode:   Image.open(path) + img.load(), the cost a later thumbnailer would pay
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nta_user_svc.storage.image_header import inspect_image_file  # noqa: E402
+
+
+def _samples(directory: str):
+    noisy = Image.merge(
+        "RGB",
+        [Image.effect_noise((1024, 768), 40), Image.linear_gradient("L").resize((1024, 768)), Image.effect_noise((1024, 768), 20)],
+    )
+    samples = {
+        "jpeg-1024x768.jpg": (noisy, "JPEG", {"quality": 85}),
+        "png-1024x768.png": (noisy, "PNG", {}),
+        "webp-1024x768.webp": (noisy, "WEBP", {"quality": 80}),
+        "png-bomb-10000x3000.png": (Image.new("1", (10000, 3000)), "PNG", {}),
+    }
+    paths = {}
+    for name, (img, fmt, kwargs) in samples.items():
+        path = os.path.join(directory, name)
+        img.save(path, format=fmt, **kwargs)
+        paths[name] = path
+    return paths
+
+
+def _time(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def _verify(path: str) -> None:
+    with Image.open(path) as img:
+        img.verify()
+
+
+def _decode(path: str) -> None:
+    Image.MAX_IMAGE_PIXELS = None
+    with Image.open(path) as img:
+        img.load()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'sample':<26} {'bytes':>9} {'inspect us':>11} {'verify us':>11} {'decode us':>11}")
+        for name, path in _samples(directory).items():
+            inspect_us = _time(lambda: inspect_image_file(path), args.iterations)
+            verify_us = _time(lambda: _verify(path), args.iterations)
+            decode_us = _time(lambda: _decode(path), max(1, args.iterations // 20))
+            print(f"{name:<26} {os.path.getsize(path):>9} {inspect_us:>11.1f} {verify_us:>11.1f} {decode_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
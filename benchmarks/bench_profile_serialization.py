@@ -0,0 +1,96 @@
+"""Benchmark profile response encoding: FastAPI's response_model path vs cached serializers.
+
+Usage:
+    JWT_SECRET=bench poetry run python benchmarks/bench_profile_serialization.py [--iterations N]
+
+For ProfileOut and ProfilePublic payloads built from an ORM-like object, measures the
+per-response cost of:
+- response_model: model_validate in the handler, then FastAPI's serialize_response
+  (second validation + jsonable conversion) and JSONResponse (stdlib json)
+- response_model+orjson: the same, rendered with ORJSONResponse (needs orjson)
+- serializer: routers.responses.model_response, i.e. one validation and pydantic-core's
+  JSON encoder through the cached TypeAdapter (what FAST_JSON_RESPONSES enables)
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("JWT_SECRET", "bench")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+import nta_user_svc.config as config  # noqa: E402
+from nta_user_svc.routers.responses import ORJSONResponse, model_response, orjson  # noqa: E402
+from nta_user_svc.schemas.profile import ProfileOut, ProfilePublic  # noqa: E402
+
+
+def _orm_profile() -> SimpleNamespace:
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    return SimpleNamespace(
+        id=1,
+        user_id=42,
+        email="someone@example.com",
+        name="Alice Example",
+        phone="+4915112345678",
+        bio="Photographer and weekend climber. " * 10,
+        hobby="climbing",
+        occupation="photographer",
+        location="Berlin",
+        profile_photo_path="ab/cd/42/0123456789abcdef0123456789abcdef.jpg",
+        photo_placeholder="LEHV6nWB2yk8pyo0adR*.7kCMdnj",
+        photo_width=1024,
+        photo_height=768,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+def _bench(fn, iterations: int) -> float:
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    config.FAST_JSON_RESPONSES = True
+    obj = _orm_profile()
+    loop = asyncio.new_event_loop()
+
+    print(f"{'schema':<14} {'path':<24} {'responses/s':>12} {'speed-up':>9}")
+    for schema in (ProfileOut, ProfilePublic):
+        field = create_model_field(name="Response", type_=schema, mode="serialization")
+
+        def response_model(response_class=JSONResponse):
+            content = loop.run_until_complete(
+                serialize_response(field=field, response_content=schema.model_validate(obj))
+            )
+            return response_class(content).body
+
+        paths = [("response_model", response_model)]
+        if orjson is not None:
+            paths.append(("response_model+orjson", lambda: response_model(ORJSONResponse)))
+        paths.append(("serializer", lambda: model_response(schema, obj).body))
+
+        baseline = None
+        for name, fn in paths:
+            rate = _bench(fn, args.iterations)
+            baseline = baseline or rate
+            print(f"{schema.__name__:<14} {name:<24} {rate:>12.0f} {rate / baseline:>8.2f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
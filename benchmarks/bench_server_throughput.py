@@ -0,0 +1,146 @@
+"""Benchmark HTTP throughput: the previous single-process entry point vs the launcher.
+
+Usage:
+    JWT_SECRET=bench poetry run python benchmarks/bench_server_throughput.py [--duration S] [--workers N]
+
+Seeds a temporary SQLite database with one user and profile, then for each server
+configuration starts the service in a subprocess and drives GET /api/profiles/{id}
+(JWT auth, one indexed query, ProfilePublic encoding) from several client processes
+over keep-alive connections for --duration seconds. Configurations:
+- baseline: uvicorn.run(app) as main.main() did before (one process, debug on, access log)
+- launcher-1: main.main() with APP_ENV=production and one worker
+- launcher-N: main.main() with APP_ENV=production and --workers N (pre-fork, gc.freeze)
+uvloop/httptools are used by all configurations when installed ("auto").
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.insert(0, SRC)
+os.environ.setdefault("JWT_SECRET", "bench")
+
+BASELINE = "import uvicorn, sys; from nta_user_svc.app import app; uvicorn.run(app, host='127.0.0.1', port=int(sys.argv[1]))"
+
+
+def seed(database_url: str) -> int:
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from nta_user_svc.models import Base, Profile, User
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.add(Profile(user_id=user.id, name="Bench User", occupation="Benchmarking", bio="x" * 200))
+        db.commit()
+        user_id = user.id
+    engine.dispose()
+    return user_id
+
+
+def _client(port: int, path: str, token: str, connections: int, duration: float, results) -> None:
+    stop_at = time.monotonic() + duration
+    counts = [0] * connections
+
+    def run(i: int) -> None:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        headers = {"Authorization": f"Bearer {token}"}
+        while time.monotonic() < stop_at:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                counts[i] += 1
+        conn.close()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(connections)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(sum(counts))
+
+
+def wait_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/openapi.json")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def measure(cmd, env, port, path, token, duration, clients, connections) -> float:
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_client, args=(port, path, token, connections, duration, results))
+            for _ in range(clients)
+        ]
+        for p in procs:
+            p.start()
+        total = sum(results.get() for _ in procs)
+        for p in procs:
+            p.join()
+        return total / duration
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=8, help="keep-alive connections per client")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        user_id = seed(database_url)
+        from nta_user_svc.security.jwt import create_access_token
+
+        token = create_access_token({"user_id": user_id})
+        path = f"/api/profiles/{user_id}"
+        env = {
+            **os.environ,
+            "DATABASE_URL": database_url,
+            "PYTHONPATH": SRC,
+            "PHOTO_DELETION_WORKER_ENABLED": "false",
+        }
+        launcher = [sys.executable, "-m", "nta_user_svc.main", "--host", "127.0.0.1", "--port", str(args.port)]
+        configurations = [
+            ("baseline", [sys.executable, "-c", BASELINE, str(args.port)], env),
+            ("launcher-1", launcher + ["--workers", "1"], {**env, "APP_ENV": "production"}),
+            (f"launcher-{args.workers}", launcher + ["--workers", str(args.workers)], {**env, "APP_ENV": "production"}),
+        ]
+
+        print(f"{'configuration':<14} {'req/s':>10} {'vs baseline':>12}")
+        baseline = None
+        for name, cmd, cmd_env in configurations:
+            rate = measure(cmd, cmd_env, args.port, path, token, args.duration, args.clients, args.connections)
+            baseline = baseline or rate
+            print(f"{name:<14} {rate:>10.0f} {rate / baseline:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark cold start: import time of the app and time to the first served request.
+
+Usage:
+    JWT_SECRET=bench poetry run python benchmarks/bench_startup.py [--runs N] [--top N]
+
+- import: runs ``python -X importtime -c "import nta_user_svc.app"`` --runs times and
+  reports the median total, the share spent in this package's own modules, and the
+  modules with the largest cumulative time (from the fastest run)
+- first request: starts ``python -m nta_user_svc.main`` and measures the time until it
+  answers its first HTTP request (median of --runs)
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+sys.path.insert(0, SRC)
+os.environ.setdefault("JWT_SECRET", "bench")
+
+ENV = {**os.environ, "PYTHONPATH": SRC, "LOAD_DOTENV": "false", "PHOTO_DELETION_WORKER_ENABLED": "false"}
+
+
+def parse_importtime(stderr: str):
+    """[(module, self_us, cumulative_us, depth)] from ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure_import():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import nta_user_svc.app"],
+        env=ENV,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def measure_first_request(port: int) -> float:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "nta_user_svc.main", "--host", "127.0.0.1", "--port", str(port)],
+        env=ENV,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                # unauthenticated: answered without touching the database
+                conn.request("GET", "/api/users/me/profile")
+                conn.getresponse().read()
+                return time.perf_counter() - started
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.005)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+
+    runs = [measure_import() for _ in range(args.runs)]
+    totals = [sum(row[1] for row in rows) for rows in runs]
+    own = [sum(row[1] for row in rows if row[0].startswith("nta_user_svc")) for rows in runs]
+    print(f"import nta_user_svc.app: median {statistics.median(totals) / 1000:.0f} ms "
+          f"(own modules {statistics.median(own) / 1000:.0f} ms) over {args.runs} runs")
+
+    fastest = runs[totals.index(min(totals))]
+    top_level = [row for row in fastest if row[3] <= 1]
+    print(f"\n{'module':<48} {'cumulative ms':>14}")
+    for name, _, cumulative, _ in sorted(top_level, key=lambda row: row[2], reverse=True)[: args.top]:
+        print(f"{name:<48} {cumulative / 1000:>14.1f}")
+
+    first = [measure_first_request(args.port) for _ in range(args.runs)]
+    print(f"\ntime to first request: median {statistics.median(first) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark the photo publish path under each PHOTO_DURABILITY level.
+
+Usage:
+    JWT_SECRET=bench poetry run python benchmarks/bench_write_durability.py \
+        [--dir PATH] [--uploads N] [--concurrency C] [--size BYTES] [--dirs D] [--window-ms MS]
+
+Each upload writes ``--size`` bytes to a temp file under ``--dir`` and publishes it into
+one of ``--dirs`` per-user directories with storage.durability.durable_replace, from ``--concurrency``
+threads (the photo I/O pool). Reports uploads per second and p50/p99 publish latency.
+Run it on the filesystem that holds PROFILE_PHOTO_DIR: fsync cost is device specific.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+os.environ.setdefault("JWT_SECRET", "bench")
+
+import nta_user_svc.config as config  # noqa: E402
+from nta_user_svc.storage import durability  # noqa: E402
+
+
+def _run(base: Path, mode: str, uploads: int, concurrency: int, payload: bytes, dirs: int, window_ms: float):
+    config.PHOTO_DURABILITY = mode
+    durability._committer = durability.GroupCommitter(window_ms / 1000.0)
+    incoming = base / ".incoming"
+    incoming.mkdir(exist_ok=True)
+    latencies = []
+    lock = threading.Lock()
+
+    def _upload(i: int) -> None:
+        dest_dir = base / str(i % dirs)
+        dest_dir.mkdir(exist_ok=True)
+        tmp = incoming / f"{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        start = time.perf_counter()
+        durability.durable_replace(tmp, dest_dir / f"{uuid.uuid4().hex}.jpg")
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_upload, range(uploads)))
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return uploads / total, statistics.median(latencies) * 1e3, p99 * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default=None, help="directory on the target filesystem (default: a temp dir)")
+    parser.add_argument("--uploads", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--dirs", type=int, default=64, help="distinct destination directories")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    print(
+        f"{args.uploads} uploads of {args.size} bytes into {args.dirs} directories, "
+        f"{args.concurrency} threads, group window {args.window_ms} ms"
+    )
+    print(f"{'mode':<10} {'uploads/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in ("none", "per-file", "grouped"):
+        with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+            rate, p50, p99 = _run(
+                Path(directory), mode, args.uploads, args.concurrency, payload, max(1, args.dirs), args.window_ms
+            )
+        print(f"{mode:<10} {rate:>10.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
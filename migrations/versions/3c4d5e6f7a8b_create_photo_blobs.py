@@ -0,0 +1,30 @@
+"""Create photo_blobs reference-count table for content-addressed photos
+
+Revision ID: 3c4d5e6f7a8b
+Revises: 2b3c4d5e6f7a
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3c4d5e6f7a8b"
+down_revision = "2b3c4d5e6f7a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "photo_blobs",
+        sa.Column("sha256", sa.String(length=64), primary_key=True),
+        sa.Column("path", sa.String(length=1024), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.UniqueConstraint("path", name="uq_photo_blobs_path"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("photo_blobs")
@@ -0,0 +1,35 @@
+"""Create photo_deletion_outbox table for deferred photo file removal
+
+Revision ID: 4d5e6f7a8b9c
+Revises: 3c4d5e6f7a8b
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "4d5e6f7a8b9c"
+down_revision = "3c4d5e6f7a8b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "photo_deletion_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("path", sa.String(length=1024), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(length=255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    )
+    op.create_index(
+        "ix_photo_deletion_outbox_next_attempt_at", "photo_deletion_outbox", ["next_attempt_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_photo_deletion_outbox_next_attempt_at", table_name="photo_deletion_outbox")
+    op.drop_table("photo_deletion_outbox")
@@ -0,0 +1,33 @@
+"""Add stored photo metadata columns to profiles
+
+Revision ID: 5e6f7a8b9c0d
+Revises: 4d5e6f7a8b9c
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "5e6f7a8b9c0d"
+down_revision = "4d5e6f7a8b9c"
+branch_labels = None
+depends_on = None
+
+_COLUMNS = ("photo_width", "photo_height", "photo_size", "photo_mime_type", "photo_sha256")
+
+
+def upgrade() -> None:
+    # Nullable: existing rows are filled by the nta_user_svc_backfill_photo_metadata job
+    with op.batch_alter_table("profiles") as batch_op:
+        batch_op.add_column(sa.Column("photo_width", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("photo_height", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("photo_size", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("photo_mime_type", sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column("photo_sha256", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("profiles") as batch_op:
+        for name in reversed(_COLUMNS):
+            batch_op.drop_column(name)
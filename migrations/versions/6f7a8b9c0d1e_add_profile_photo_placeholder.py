@@ -0,0 +1,26 @@
+"""Add photo placeholder (blurhash) column to profiles
+
+Revision ID: 6f7a8b9c0d1e
+Revises: 5e6f7a8b9c0d
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "6f7a8b9c0d1e"
+down_revision = "5e6f7a8b9c0d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable: existing rows are filled by the nta_user_svc_backfill_photo_metadata job
+    with op.batch_alter_table("profiles") as batch_op:
+        batch_op.add_column(sa.Column("photo_placeholder", sa.String(length=200), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("profiles") as batch_op:
+        batch_op.drop_column("photo_placeholder")
@@ -0,0 +1,27 @@
+"""Add releases_reference column to photo_deletion_outbox for upload reservations
+
+Revision ID: 7a8b9c0d1e2f
+Revises: 6f7a8b9c0d1e
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "7a8b9c0d1e2f"
+down_revision = "6f7a8b9c0d1e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("photo_deletion_outbox") as batch_op:
+        batch_op.add_column(
+            sa.Column("releases_reference", sa.Boolean(), nullable=False, server_default=sa.false())
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("photo_deletion_outbox") as batch_op:
+        batch_op.drop_column("releases_reference")
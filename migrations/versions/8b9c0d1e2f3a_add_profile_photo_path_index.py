@@ -0,0 +1,61 @@
+"""Add an index on profiles.profile_photo_path for exact-path reference checks
+
+Revision ID: 8b9c0d1e2f3a
+Revises: 7a8b9c0d1e2f
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+
+# revision identifiers, used by Alembic.
+revision = "8b9c0d1e2f3a"
+down_revision = "7a8b9c0d1e2f"
+branch_labels = None
+depends_on = None
+
+_INDEX = "ix_profiles_profile_photo_path"
+
+
+def _dialect_name() -> str:
+    bind = op.get_bind()
+    try:
+        return bind.dialect.name
+    except Exception:
+        # Fallback if bind not available
+        return ""
+
+
+def upgrade() -> None:
+    """Create ix_profiles_profile_photo_path.
+
+    Built concurrently on PostgreSQL (outside the migration transaction) to avoid locking
+    profiles; a plain CREATE INDEX IF NOT EXISTS elsewhere (e.g. sqlite).
+    """
+    logger = logging.getLogger("alembic.migrations.add_profile_photo_path_index")
+    try:
+        if _dialect_name() == "postgresql":
+            with op.get_context().autocommit_block():
+                op.execute(
+                    sa.text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_INDEX} ON profiles (profile_photo_path);")
+                )
+        else:
+            op.execute(sa.text(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON profiles (profile_photo_path);"))
+    except Exception as e:
+        logger.error("Failed to create index on profiles.profile_photo_path", exc_info=True)
+        raise
+
+
+def downgrade() -> None:
+    """Drop ix_profiles_profile_photo_path."""
+    logger = logging.getLogger("alembic.migrations.add_profile_photo_path_index")
+    try:
+        if _dialect_name() == "postgresql":
+            with op.get_context().autocommit_block():
+                op.execute(sa.text(f"DROP INDEX CONCURRENTLY IF EXISTS {_INDEX};"))
+        else:
+            op.execute(sa.text(f"DROP INDEX IF EXISTS {_INDEX};"))
+    except Exception as e:
+        logger.error("Failed to drop index on profiles.profile_photo_path", exc_info=True)
+        raise
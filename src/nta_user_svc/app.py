@@ -1,16 +1,58 @@
 from fastapi import FastAPI
 import logging
 
-from nta_user_svc.routers import users_router, auth_router, photos_router
+import nta_user_svc.config as config
 
-from nta_user_svc.services import init_profile_photo_cleanup_listeners
+from nta_user_svc.metrics import instrument_engine, start_metrics, stop_metrics
+from nta_user_svc.middleware import (
+    CompressionMiddleware,
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    TracingMiddleware,
+    UploadLimitMiddleware,
+)
+from nta_user_svc.routers import users_router, auth_router, photos_router, health_router, metrics_router, debug_router
+from nta_user_svc.routers.responses import default_response_class
 
-app = FastAPI(debug=True)
+from nta_user_svc.database import engine
+from nta_user_svc.services import (
+    init_profile_photo_cleanup_listeners,
+    start_photo_deletion_worker,
+    stop_photo_deletion_worker,
+)
+from nta_user_svc.storage.backends import close_storage_backend
+from nta_user_svc.storage.executors import shutdown_executors
+from nta_user_svc.threadpool import configure_threadpool, start_threadpool_monitor, stop_threadpool_monitor
+from nta_user_svc.tracing import start_tracing, stop_tracing, trace_engine
+from nta_user_svc.warmup import start_warmup
+
+# debug mode (tracebacks in error responses) only in development, see APP_ENV
+app = FastAPI(debug=config.DEBUG, default_response_class=default_response_class())
+
+# Reject oversize / non-image photo uploads while the body is still streaming in
+app.add_middleware(UploadLimitMiddleware)
+# zstd/br/gzip per Accept-Encoding; photos and small bodies are sent as they are
+app.add_middleware(CompressionMiddleware)
+# per-route latency and status counts for /metrics
+app.add_middleware(MetricsMiddleware)
+# root span of sampled requests (TRACING_SAMPLE_RATE), see /debug/traces
+app.add_middleware(TracingMiddleware)
+# opt-in sampled stack profiles of single requests (PROFILING_ENABLED)
+app.add_middleware(ProfilingMiddleware)
 
 # include routers
 app.include_router(users_router, prefix="/api")
 app.include_router(auth_router, prefix="/api")
 app.include_router(photos_router, prefix="/api")
+# liveness/readiness probes, outside /api
+app.include_router(health_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
+
+# statement counts and durations for /metrics
+instrument_engine(engine)
+# statement spans of sampled requests
+trace_engine(engine)
 
 
 @app.on_event("startup")
@@ -20,3 +62,58 @@ def _startup_event() -> None:
     except Exception as e:
         # Log but do not prevent application startup
         logging.error("Failed to init profile photo cleanup listeners on startup", exc_info=True)
+    try:
+        # drains photo removals queued by committed transactions (and leftovers from before a restart)
+        start_photo_deletion_worker(engine)
+    except Exception as e:
+        logging.error("Failed to start photo deletion worker", exc_info=True)
+    try:
+        # /health/ready reports ready once this has finished
+        start_warmup(engine)
+    except Exception as e:
+        logging.error("Failed to start warm-up", exc_info=True)
+
+
+@app.on_event("startup")
+async def _configure_threadpool() -> None:
+    # AnyIO's limiter belongs to the running loop, so this cannot happen at import time
+    try:
+        configure_threadpool()
+        start_threadpool_monitor()
+    except Exception as e:
+        logging.error("Failed to configure the sync handler threadpool", exc_info=True)
+
+
+@app.on_event("startup")
+async def _start_metrics() -> None:
+    try:
+        start_metrics()
+    except Exception as e:
+        logging.error("Failed to start metrics collection", exc_info=True)
+    try:
+        start_tracing()
+    except Exception as e:
+        logging.error("Failed to start trace export", exc_info=True)
+
+
+@app.on_event("shutdown")
+async def _stop_threadpool_monitor() -> None:
+    await stop_threadpool_monitor()
+    await stop_metrics()
+
+
+@app.on_event("shutdown")
+def _shutdown_event() -> None:
+    try:
+        stop_photo_deletion_worker()
+    except Exception as e:
+        logging.error("Failed to stop photo deletion worker", exc_info=True)
+    try:
+        shutdown_executors()
+    except Exception as e:
+        logging.error("Failed to shut down photo executors", exc_info=True)
+    close_storage_backend()
+    try:
+        stop_tracing()
+    except Exception as e:
+        logging.error("Failed to stop trace export", exc_info=True)
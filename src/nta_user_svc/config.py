@@ -1,12 +1,201 @@
 import os
 import logging
-from dotenv import load_dotenv
 
-load_dotenv()
+# LOAD_DOTENV=false skips the .env lookup (and importing python-dotenv) where the
+# environment is already complete, e.g. in containers
+if os.getenv("LOAD_DOTENV", "true").strip().lower() in ("1", "true", "yes", "on"):
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///:memory:")
 SERVICE_PORT = os.getenv("SERVICE_PORT", 8000)
 
+# "development" turns on FastAPI's debug mode (tracebacks in 500 responses); any other value,
+# including the default "production", leaves it off. DEBUG overrides the choice explicitly.
+APP_ENV = os.getenv("APP_ENV", "production").strip().lower()
+DEBUG = os.getenv("DEBUG", "true" if APP_ENV == "development" else "false").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+# Server launcher (main.main). SERVER_LOOP: auto|asyncio|uvloop, SERVER_HTTP: auto|h11|httptools;
+# "auto" uses uvloop/httptools when installed (the optional "server" extra).
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto").strip().lower()
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto").strip().lower()
+
+try:
+    SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 1))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid SERVER_WORKERS value, falling back to 1", exc_info=True)
+    SERVER_WORKERS = 1
+
+try:
+    SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", 2048))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid SERVER_BACKLOG value, falling back to 2048", exc_info=True)
+    SERVER_BACKLOG = 2048
+
+try:
+    SERVER_KEEP_ALIVE = int(os.getenv("SERVER_KEEP_ALIVE", 5))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid SERVER_KEEP_ALIVE value, falling back to 5", exc_info=True)
+    SERVER_KEEP_ALIVE = 5
+
+# Maximum concurrent connections/tasks per worker before answering 503; 0 means unlimited
+try:
+    SERVER_LIMIT_CONCURRENCY = int(os.getenv("SERVER_LIMIT_CONCURRENCY", 0))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid SERVER_LIMIT_CONCURRENCY value, falling back to 0", exc_info=True)
+    SERVER_LIMIT_CONCURRENCY = 0
+
+# Tokens of AnyIO's default thread limiter, i.e. how many sync routes/dependencies run at
+# once per worker (AnyIO's own default is 40). Size it against the DB pool.
+try:
+    THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid THREADPOOL_SIZE value, falling back to 40", exc_info=True)
+    THREADPOOL_SIZE = 40
+
+THREADPOOL_MONITOR_ENABLED = os.getenv("THREADPOOL_MONITOR_ENABLED", "true").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+
+try:
+    THREADPOOL_MONITOR_INTERVAL = float(os.getenv("THREADPOOL_MONITOR_INTERVAL", 0.1))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid THREADPOOL_MONITOR_INTERVAL value, falling back to 0.1", exc_info=True)
+    THREADPOOL_MONITOR_INTERVAL = 0.1
+
+# Startup warm-up (pool priming, statement compilation, serializers, bcrypt, Pillow) run in
+# the background; /health/ready answers 503 until it has finished
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
+try:
+    WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", 5))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid WARMUP_DB_CONNECTIONS value, falling back to 5", exc_info=True)
+    WARMUP_DB_CONNECTIONS = 5
+
+# Prometheus metrics at GET /metrics. With several workers, set METRICS_MULTIPROC_DIR to a
+# directory shared by them (cleared by the launcher at startup) so any worker can answer
+# a scrape with the totals of all of them.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+
+try:
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1.0))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid METRICS_FLUSH_INTERVAL value, falling back to 1.0", exc_info=True)
+    METRICS_FLUSH_INTERVAL = 1.0
+
+try:
+    METRICS_LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", 0.5))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid METRICS_LOOP_LAG_INTERVAL value, falling back to 0.5", exc_info=True)
+    METRICS_LOOP_LAG_INTERVAL = 0.5
+
+# In-process tracing: a TRACING_SAMPLE_RATE fraction of requests records spans into a ring
+# buffer of the last TRACING_BUFFER_SIZE traces. TRACING_EXPORT_DIR additionally receives
+# them as OTLP/JSON lines. Both switches below are explicit opt-ins, independent of DEBUG:
+# TRACING_DEBUG_ENDPOINT serves the buffer at GET /debug/traces to requests carrying
+# "X-Debug-Token: <TRACING_DEBUG_TOKEN>" (never without a token); with
+# TRACING_TRUST_TRACEPARENT the sampled flag of a W3C traceparent header overrides the rate,
+# which lets any client force its requests to be traced.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+TRACING_DEBUG_ENDPOINT = os.getenv("TRACING_DEBUG_ENDPOINT", "false").strip().lower() in ("1", "true", "yes", "on")
+TRACING_DEBUG_TOKEN = os.getenv("TRACING_DEBUG_TOKEN", "")
+TRACING_TRUST_TRACEPARENT = os.getenv("TRACING_TRUST_TRACEPARENT", "false").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+    "on",
+)
+TRACING_EXPORT_DIR = os.getenv("TRACING_EXPORT_DIR", "")
+
+try:
+    TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", 0.01))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid TRACING_SAMPLE_RATE value, falling back to 0.01", exc_info=True)
+    TRACING_SAMPLE_RATE = 0.01
+
+try:
+    TRACING_BUFFER_SIZE = int(os.getenv("TRACING_BUFFER_SIZE", 256))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid TRACING_BUFFER_SIZE value, falling back to 256", exc_info=True)
+    TRACING_BUFFER_SIZE = 256
+
+try:
+    TRACING_MAX_SPANS_PER_TRACE = int(os.getenv("TRACING_MAX_SPANS_PER_TRACE", 512))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid TRACING_MAX_SPANS_PER_TRACE value, falling back to 512", exc_info=True)
+    TRACING_MAX_SPANS_PER_TRACE = 512
+
+try:
+    TRACING_EXPORT_INTERVAL = float(os.getenv("TRACING_EXPORT_INTERVAL", 1.0))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid TRACING_EXPORT_INTERVAL value, falling back to 1.0", exc_info=True)
+    TRACING_EXPORT_INTERVAL = 1.0
+
+# Size at which the export file is rotated (one previous file, "<name>.1", is kept)
+try:
+    TRACING_EXPORT_MAX_BYTES = int(os.getenv("TRACING_EXPORT_MAX_BYTES", 64 * 1024 * 1024))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid TRACING_EXPORT_MAX_BYTES value, falling back to 67108864", exc_info=True)
+    TRACING_EXPORT_MAX_BYTES = 64 * 1024 * 1024
+
+# On-demand request profiling (off unless PROFILING_ENABLED). A request is profiled when it
+# carries "X-Profile: <PROFILING_TOKEN>" or is picked at PROFILING_SAMPLE_RATE; its
+# sampled stacks are written to PROFILING_DIR as speedscope JSON or collapsed stacks.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR", "/tmp/nta_user_svc_profiles")
+PROFILING_FORMAT = os.getenv("PROFILING_FORMAT", "speedscope").strip().lower()
+
+try:
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0.0))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PROFILING_SAMPLE_RATE value, falling back to 0.0", exc_info=True)
+    PROFILING_SAMPLE_RATE = 0.0
+
+try:
+    PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", 0.01))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PROFILING_INTERVAL value, falling back to 0.01", exc_info=True)
+    PROFILING_INTERVAL = 0.01
+
+# Caps keeping profiling from affecting other traffic: requests profiled at once per worker,
+# sampling time per request, and the files (oldest removed first) and bytes kept in PROFILING_DIR
+try:
+    PROFILING_MAX_CONCURRENT = int(os.getenv("PROFILING_MAX_CONCURRENT", 1))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PROFILING_MAX_CONCURRENT value, falling back to 1", exc_info=True)
+    PROFILING_MAX_CONCURRENT = 1
+
+try:
+    PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", 30.0))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PROFILING_MAX_SECONDS value, falling back to 30.0", exc_info=True)
+    PROFILING_MAX_SECONDS = 30.0
+
+try:
+    PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", 100))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PROFILING_MAX_FILES value, falling back to 100", exc_info=True)
+    PROFILING_MAX_FILES = 100
+
+try:
+    PROFILING_MAX_BYTES = int(os.getenv("PROFILING_MAX_BYTES", 50 * 1024 * 1024))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PROFILING_MAX_BYTES value, falling back to 52428800", exc_info=True)
+    PROFILING_MAX_BYTES = 50 * 1024 * 1024
+
 try:
     PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", 12))
 except (TypeError, ValueError) as e:
@@ -14,6 +203,41 @@ except (TypeError, ValueError) as e:
     logging.error("Invalid PASSWORD_HASH_ROUNDS value, falling back to 12", exc_info=True)
     PASSWORD_HASH_ROUNDS = 12
 
+# Profile responses are encoded once by cached pydantic serializers (and other JSON
+# responses with orjson, when installed) instead of FastAPI's response_model pass
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").strip().lower() in ("1", "true", "yes", "on")
+
+# Response compression (zstd and brotli need the optional "compression" extra; gzip is always
+# available). COMPRESSION_ENCODINGS lists the codings in server preference order.
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+COMPRESSION_ENCODINGS = [
+    e.strip().lower() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()
+]
+
+try:
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid COMPRESSION_MIN_SIZE value, falling back to 1024", exc_info=True)
+    COMPRESSION_MIN_SIZE = 1024
+
+try:
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid COMPRESSION_GZIP_LEVEL value, falling back to 6", exc_info=True)
+    COMPRESSION_GZIP_LEVEL = 6
+
+try:
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid COMPRESSION_BROTLI_QUALITY value, falling back to 4", exc_info=True)
+    COMPRESSION_BROTLI_QUALITY = 4
+
+try:
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid COMPRESSION_ZSTD_LEVEL value, falling back to 3", exc_info=True)
+    COMPRESSION_ZSTD_LEVEL = 3
+
 # JWT configuration: load from environment and fail fast if secret not present
 JWT_SECRET = os.getenv("JWT_SECRET")
 if not JWT_SECRET:
@@ -42,3 +266,198 @@ try:
 except (TypeError, ValueError) as e:
     logging.error("Invalid MAX_PHOTO_SIZE_BYTES value, falling back to 1048576", exc_info=True)
     MAX_PHOTO_SIZE_BYTES = 1048576
+
+# Allowance on top of MAX_PHOTO_SIZE_BYTES for multipart framing of an upload request body
+try:
+    UPLOAD_BODY_OVERHEAD_BYTES = int(os.getenv("UPLOAD_BODY_OVERHEAD_BYTES", 16384))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid UPLOAD_BODY_OVERHEAD_BYTES value, falling back to 16384", exc_info=True)
+    UPLOAD_BODY_OVERHEAD_BYTES = 16384
+
+# Pixel limits checked from the image header before any decode (decompression-bomb guard)
+try:
+    PHOTO_MAX_WIDTH = int(os.getenv("PHOTO_MAX_WIDTH", 8192))
+    PHOTO_MAX_HEIGHT = int(os.getenv("PHOTO_MAX_HEIGHT", 8192))
+    PHOTO_MAX_PIXELS = int(os.getenv("PHOTO_MAX_PIXELS", 25000000))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_MAX_WIDTH/HEIGHT/PIXELS value, falling back to 8192x8192 / 25000000", exc_info=True)
+    PHOTO_MAX_WIDTH = 8192
+    PHOTO_MAX_HEIGHT = 8192
+    PHOTO_MAX_PIXELS = 25000000
+
+# Bounded pools used by the async photo upload path: Pillow verification processes and
+# file write/fsync threads. PHOTO_VERIFY_WORKERS=0 verifies on the I/O threads instead.
+try:
+    PHOTO_VERIFY_WORKERS = int(os.getenv("PHOTO_VERIFY_WORKERS", 2))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_VERIFY_WORKERS value, falling back to 2", exc_info=True)
+    PHOTO_VERIFY_WORKERS = 2
+
+try:
+    PHOTO_IO_WORKERS = int(os.getenv("PHOTO_IO_WORKERS", 4))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_IO_WORKERS value, falling back to 4", exc_info=True)
+    PHOTO_IO_WORKERS = 4
+
+# Crash safety of stored photos: "none" (no fsync), "per-file" (fsync file + directory on
+# every upload) or "grouped" (fsyncs of concurrent uploads batched within a short window)
+PHOTO_DURABILITY = os.getenv("PHOTO_DURABILITY", "per-file").strip().lower()
+if PHOTO_DURABILITY not in ("none", "per-file", "grouped"):
+    logging.error("Invalid PHOTO_DURABILITY value %r, falling back to per-file", PHOTO_DURABILITY)
+    PHOTO_DURABILITY = "per-file"
+
+try:
+    PHOTO_DURABILITY_GROUP_WINDOW_MS = float(os.getenv("PHOTO_DURABILITY_GROUP_WINDOW_MS", 2))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_DURABILITY_GROUP_WINDOW_MS value, falling back to 2", exc_info=True)
+    PHOTO_DURABILITY_GROUP_WINDOW_MS = 2.0
+
+# Per-user photo directory layout for new uploads: 1 = "{user_id}/", 2 = "ab/cd/{user_id}/"
+# (sharded by sha256(user_id)). Existing files are moved by nta_user_svc_migrate_photo_layout.
+try:
+    PHOTO_STORAGE_LAYOUT = int(os.getenv("PHOTO_STORAGE_LAYOUT", 1))
+    if PHOTO_STORAGE_LAYOUT not in (1, 2):
+        raise ValueError("layout must be 1 or 2")
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_STORAGE_LAYOUT value, falling back to 1", exc_info=True)
+    PHOTO_STORAGE_LAYOUT = 1
+
+# Where stored photos live: "local" (files under PROFILE_PHOTO_DIR) or "s3" (an
+# S3-compatible object store; PROFILE_PHOTO_DIR is then only used to stage uploads)
+PHOTO_STORAGE_BACKEND = os.getenv("PHOTO_STORAGE_BACKEND", "local").strip().lower()
+if PHOTO_STORAGE_BACKEND not in ("local", "s3"):
+    logging.error("Invalid PHOTO_STORAGE_BACKEND value %r, falling back to local", PHOTO_STORAGE_BACKEND)
+    PHOTO_STORAGE_BACKEND = "local"
+
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID", "")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY", "")
+S3_KEY_PREFIX = os.getenv("S3_KEY_PREFIX", "")
+
+try:
+    S3_MAX_CONNECTIONS = int(os.getenv("S3_MAX_CONNECTIONS", 10))
+    S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+    S3_MULTIPART_PART_SIZE = int(os.getenv("S3_MULTIPART_PART_SIZE", 8 * 1024 * 1024))
+    S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", 4))
+    S3_TIMEOUT = float(os.getenv("S3_TIMEOUT", 10))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid S3_* pool/multipart value, falling back to defaults", exc_info=True)
+    S3_MAX_CONNECTIONS = 10
+    S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    S3_MULTIPART_PART_SIZE = 8 * 1024 * 1024
+    S3_UPLOAD_CONCURRENCY = 4
+    S3_TIMEOUT = 10.0
+
+# Store photos by SHA-256 of their content so identical uploads share one file
+PHOTO_DEDUP_ENABLED = os.getenv("PHOTO_DEDUP_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+
+# Photo files are removed after commit through the photo_deletion_outbox table, drained
+# by a background worker in batches; failed removals are retried with backoff.
+PHOTO_DELETION_WORKER_ENABLED = os.getenv("PHOTO_DELETION_WORKER_ENABLED", "true").strip().lower() in (
+    "1", "true", "yes", "on"
+)
+
+try:
+    PHOTO_DELETION_BATCH_SIZE = int(os.getenv("PHOTO_DELETION_BATCH_SIZE", 100))
+    PHOTO_DELETION_MAX_ATTEMPTS = int(os.getenv("PHOTO_DELETION_MAX_ATTEMPTS", 5))
+    PHOTO_DELETION_POLL_SECONDS = float(os.getenv("PHOTO_DELETION_POLL_SECONDS", 30))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_DELETION_* value, falling back to defaults", exc_info=True)
+    PHOTO_DELETION_BATCH_SIZE = 100
+    PHOTO_DELETION_MAX_ATTEMPTS = 5
+    PHOTO_DELETION_POLL_SECONDS = 30.0
+
+# An upload reusing stored identical content reserves it until its profile commit; an
+# upload that never commits (e.g. the process died) gives the reservation up after this
+try:
+    PHOTO_RESERVATION_SECONDS = float(os.getenv("PHOTO_RESERVATION_SECONDS", 3600))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_RESERVATION_SECONDS value, falling back to 3600", exc_info=True)
+    PHOTO_RESERVATION_SECONDS = 3600.0
+
+# Orphan photo garbage collection (nta_user_svc_photo_gc): minimum file age, deletions
+# per second (0 = unlimited) and entries sorted in memory at a time
+try:
+    PHOTO_GC_GRACE_SECONDS = float(os.getenv("PHOTO_GC_GRACE_SECONDS", 86400))
+    PHOTO_GC_DELETE_RATE = float(os.getenv("PHOTO_GC_DELETE_RATE", 50))
+    PHOTO_GC_CHUNK_SIZE = int(os.getenv("PHOTO_GC_CHUNK_SIZE", 100000))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_GC_* value, falling back to defaults", exc_info=True)
+    PHOTO_GC_GRACE_SECONDS = 86400.0
+    PHOTO_GC_DELETE_RATE = 50.0
+    PHOTO_GC_CHUNK_SIZE = 100000
+
+# Profile photo size variants (longest edge in pixels), e.g. "48,128,256"
+try:
+    PHOTO_VARIANT_SIZES = sorted(
+        {int(s) for s in os.getenv("PHOTO_VARIANT_SIZES", "48,128,256").split(",") if s.strip()}
+    )
+    if any(size <= 0 for size in PHOTO_VARIANT_SIZES):
+        raise ValueError("variant sizes must be positive")
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_VARIANT_SIZES value, falling back to 48,128,256", exc_info=True)
+    PHOTO_VARIANT_SIZES = [48, 128, 256]
+
+# Generate all variants at upload time instead of lazily on first request
+PHOTO_VARIANTS_EAGER = os.getenv("PHOTO_VARIANTS_EAGER", "false").strip().lower() in ("1", "true", "yes", "on")
+
+# Transcoded alternates of uploaded photos ("avif", "webp"); empty disables transcoding
+PHOTO_TRANSCODE_FORMATS = [
+    fmt
+    for fmt in (s.strip().lower() for s in os.getenv("PHOTO_TRANSCODE_FORMATS", "").split(","))
+    if fmt
+]
+if any(fmt not in ("avif", "webp") for fmt in PHOTO_TRANSCODE_FORMATS):
+    logging.error("Invalid PHOTO_TRANSCODE_FORMATS value %r, ignoring unknown formats", PHOTO_TRANSCODE_FORMATS)
+    PHOTO_TRANSCODE_FORMATS = [fmt for fmt in PHOTO_TRANSCODE_FORMATS if fmt in ("avif", "webp")]
+
+try:
+    PHOTO_TRANSCODE_QUALITY = int(os.getenv("PHOTO_TRANSCODE_QUALITY", 75))
+    if not 1 <= PHOTO_TRANSCODE_QUALITY <= 100:
+        raise ValueError("quality must be between 1 and 100")
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_TRANSCODE_QUALITY value, falling back to 75", exc_info=True)
+    PHOTO_TRANSCODE_QUALITY = 75
+
+# Photo delivery: optionally let the fronting proxy serve the bytes.
+# "" (serve natively), "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd)
+PHOTO_OFFLOAD_MODE = os.getenv("PHOTO_OFFLOAD_MODE", "").strip().lower()
+if PHOTO_OFFLOAD_MODE not in ("", "x-accel-redirect", "x-sendfile"):
+    logging.error("Invalid PHOTO_OFFLOAD_MODE value %r, falling back to native delivery", PHOTO_OFFLOAD_MODE)
+    PHOTO_OFFLOAD_MODE = ""
+
+# Blurhash placeholder computed at upload and returned with profiles ("XxY" components)
+PHOTO_PLACEHOLDER_ENABLED = os.getenv("PHOTO_PLACEHOLDER_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+try:
+    PHOTO_BLURHASH_X_COMPONENTS, PHOTO_BLURHASH_Y_COMPONENTS = (
+        int(c) for c in os.getenv("PHOTO_BLURHASH_COMPONENTS", "4x3").lower().split("x")
+    )
+    if not (1 <= PHOTO_BLURHASH_X_COMPONENTS <= 9 and 1 <= PHOTO_BLURHASH_Y_COMPONENTS <= 9):
+        raise ValueError("blurhash components must be between 1 and 9")
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_BLURHASH_COMPONENTS value, falling back to 4x3", exc_info=True)
+    PHOTO_BLURHASH_X_COMPONENTS, PHOTO_BLURHASH_Y_COMPONENTS = 4, 3
+
+# In-memory LRU cache of served photo bytes (0 disables) and the largest file it holds
+try:
+    PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", 0))
+    PHOTO_CACHE_MAX_FILE_BYTES = int(os.getenv("PHOTO_CACHE_MAX_FILE_BYTES", 262144))
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_CACHE_* value, disabling the photo cache", exc_info=True)
+    PHOTO_CACHE_MAX_BYTES = 0
+    PHOTO_CACHE_MAX_FILE_BYTES = 262144
+
+# Signed photo URLs: HMAC key (defaults to one derived from JWT_SECRET) and lifetime
+PHOTO_URL_SIGNING_KEY = os.getenv("PHOTO_URL_SIGNING_KEY", "")
+try:
+    PHOTO_URL_TTL_SECONDS = int(os.getenv("PHOTO_URL_TTL_SECONDS", 300))
+    if PHOTO_URL_TTL_SECONDS <= 0:
+        raise ValueError("ttl must be positive")
+except (TypeError, ValueError) as e:
+    logging.error("Invalid PHOTO_URL_TTL_SECONDS value, falling back to 300", exc_info=True)
+    PHOTO_URL_TTL_SECONDS = 300
+
+# Internal nginx location mapped onto PROFILE_PHOTO_DIR (used by x-accel-redirect only)
+PHOTO_OFFLOAD_PREFIX = os.getenv("PHOTO_OFFLOAD_PREFIX", "/_protected/profile_photos")
@@ -2,7 +2,7 @@ import logging
 from typing import Generator
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker, Session
+from sqlalchemy.orm import sessionmaker, Session
 
 from nta_user_svc.config import DATABASE_URL
 
@@ -24,19 +24,19 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def get_db() -> Generator[Session, None, None]:
     """
     FastAPI dependency that yields a SQLAlchemy Session.
-    Uses scoped_session so the session factory is thread-safe in production/tests.
-    Ensures proper cleanup and logs exceptions.
+    The session is closed explicitly rather than through a scoped_session registry: FastAPI
+    runs the setup and teardown of sync dependencies on different threadpool threads, so a
+    thread-local remove() would miss the request's session and leak its pooled connection.
+    Logs exceptions.
     """
-    session_factory = scoped_session(SessionLocal)
-    db: Session = session_factory()
+    db: Session = SessionLocal()
     try:
         yield db
     except Exception as e:
         logger.error(e, exc_info=True)
         raise
     finally:
-        # remove() ensures the scoped session registry is cleared for this thread
         try:
-            session_factory.remove()
+            db.close()
         except Exception as e:
-            logger.error("Error while removing scoped session", exc_info=True)
+            logger.error("Error while closing database session", exc_info=True)
@@ -1,20 +1,174 @@
+import argparse
+import gc
 import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, List, Optional
 
 import uvicorn
+import nta_user_svc.config as config
 from nta_user_svc.app import app
-from nta_user_svc.config import SERVICE_PORT
+from nta_user_svc.metrics import prepare_multiprocess_dir
 
 
 # Set up logging for the application
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# A worker exiting sooner than this after being forked is treated as a startup failure
+_MIN_WORKER_LIFETIME = 1.0
 
-def main():
-    service_port = int(SERVICE_PORT)
-    uvicorn.run(app, host="0.0.0.0", port=service_port)
+
+def build_config(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    loop: Optional[str] = None,
+    http: Optional[str] = None,
+    backlog: Optional[int] = None,
+    keep_alive: Optional[int] = None,
+    limit_concurrency: Optional[int] = None,
+) -> uvicorn.Config:
+    """uvicorn settings from the SERVER_* configuration; arguments override single values."""
+    limit = int(config.SERVER_LIMIT_CONCURRENCY if limit_concurrency is None else limit_concurrency)
+    return uvicorn.Config(
+        app,
+        host=host or config.SERVER_HOST,
+        port=int(config.SERVICE_PORT if port is None else port),
+        loop=loop or config.SERVER_LOOP,
+        http=http or config.SERVER_HTTP,
+        backlog=int(config.SERVER_BACKLOG if backlog is None else backlog),
+        timeout_keep_alive=int(config.SERVER_KEEP_ALIVE if keep_alive is None else keep_alive),
+        limit_concurrency=limit if limit > 0 else None,
+    )
+
+
+def _freeze_heap() -> None:
+    """Move everything allocated so far (the imported app) out of the collector's reach.
+
+    Frozen objects are never traversed by the garbage collector, so forked workers do
+    not dirty - and thereby copy - the pages they share with the parent, and full
+    collections in every process get cheaper.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def _after_fork() -> None:
+    # connections pooled by the parent must not be shared with the children
+    from nta_user_svc.database import engine
+
+    engine.dispose(close=False)
+
+
+def _run_worker(uv_config: uvicorn.Config, sock: socket.socket) -> None:
+    """Child process body: serve the inherited socket, then exit without returning to the supervisor."""
+    code = 1
+    try:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, signal.SIG_DFL)
+        _after_fork()
+        uvicorn.Server(uv_config).run(sockets=[sock])
+        code = 0
+    except BaseException:
+        logger.error("Worker %d failed", os.getpid(), exc_info=True)
+    finally:
+        os._exit(code)
+
+
+def serve_workers(uv_config: uvicorn.Config, workers: int) -> int:
+    """Pre-fork supervisor: bind once, fork ``workers`` children sharing the socket.
+
+    The app is imported (preloaded) and the heap frozen before forking, so children
+    share its memory copy-on-write. Workers that die are replaced; one that exits right
+    after starting aborts the whole server instead of restarting in a loop. SIGINT and
+    SIGTERM are forwarded to the workers for a graceful shutdown. Returns the exit code.
+    """
+    sock = uv_config.bind_socket()
+    _freeze_heap()
+
+    children: Dict[int, float] = {}
+    stopping: List[bool] = [False]
+
+    def _spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(uv_config, sock)
+        children[pid] = time.monotonic()
+
+    def _stop(signum, frame) -> None:
+        stopping[0] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    logger.info("Starting %d workers (pid %d)", workers, os.getpid())
+    for _ in range(workers):
+        _spawn()
+
+    exit_code = 0
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping[0]:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - started < _MIN_WORKER_LIFETIME:
+            logger.error("Worker %d exited during startup (code %d); shutting down", pid, code)
+            exit_code = 1
+            _stop(signal.SIGTERM, None)
+            continue
+        logger.warning("Worker %d exited (code %d); starting a replacement", pid, code)
+        _spawn()
+
+    sock.close()
+    return exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the user service")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default SERVER_WORKERS)")
+    parser.add_argument("--loop", choices=["auto", "asyncio", "uvloop"], default=None)
+    parser.add_argument("--http", choices=["auto", "h11", "httptools"], default=None)
+    parser.add_argument("--backlog", type=int, default=None)
+    parser.add_argument("--keep-alive", type=int, default=None, help="keep-alive timeout in seconds")
+    parser.add_argument("--limit-concurrency", type=int, default=None, help="0 means unlimited")
+    args = parser.parse_args(argv)
+
+    uv_config = build_config(
+        host=args.host,
+        port=args.port,
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        keep_alive=args.keep_alive,
+        limit_concurrency=args.limit_concurrency,
+    )
+    if config.DEBUG:
+        logger.warning("Debug mode is on (APP_ENV=%s); set APP_ENV=production in deployments", config.APP_ENV)
+
+    # metrics snapshots of a previous run must not be merged into this run's
+    prepare_multiprocess_dir()
+
+    workers = int(config.SERVER_WORKERS if args.workers is None else args.workers)
+    if workers > 1:
+        return serve_workers(uv_config, workers)
+
+    _freeze_heap()
+    uvicorn.Server(uv_config).run()
+    return 0
 
 
 if __name__ == "__main__":
     # Entry point for the application
-    main()
\ No newline at end of file
+    raise SystemExit(main())
@@ -0,0 +1,23 @@
+from .registry import CONTENT_TYPE, Counter, Gauge, Histogram, MetricsRegistry
+from .instruments import (
+    REGISTRY,
+    instrument_engine,
+    prepare_multiprocess_dir,
+    render_metrics,
+    start_metrics,
+    stop_metrics,
+)
+
+__all__ = [
+    "CONTENT_TYPE",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "REGISTRY",
+    "instrument_engine",
+    "prepare_multiprocess_dir",
+    "render_metrics",
+    "start_metrics",
+    "stop_metrics",
+]
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import nta_user_svc.config as config
+from nta_user_svc.metrics.registry import MetricsRegistry, clear_snapshots, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by method, route template and status code.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, by method and route template.", ["method", "route"]
+)
+DB_QUERIES = REGISTRY.counter("db_queries_total", "SQL statements executed, by operation.", ["operation"])
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time, by operation.",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+_BCRYPT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+PASSWORD_HASH_DURATION = REGISTRY.histogram(
+    "password_hash_duration_seconds", "Time spent in hash_password.", buckets=_BCRYPT_BUCKETS
+)
+PASSWORD_VERIFY_DURATION = REGISTRY.histogram(
+    "password_verify_duration_seconds", "Time spent in verify_password.", buckets=_BCRYPT_BUCKETS
+)
+PHOTO_UPLOAD_BYTES = REGISTRY.histogram(
+    "photo_upload_bytes",
+    "Size of stored photo uploads.",
+    buckets=(16 * 1024, 64 * 1024, 256 * 1024, 512 * 1024, 1024**2, 2 * 1024**2, 5 * 1024**2, 10 * 1024**2),
+)
+PHOTO_UPLOAD_DURATION = REGISTRY.histogram(
+    "photo_upload_duration_seconds",
+    "Time to receive, verify and store a photo upload, by result.",
+    ["result"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "Delay of the event loop in running a scheduled callback.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+EVENT_LOOP_LAG_LAST = REGISTRY.gauge(
+    "event_loop_lag_last_seconds", "Most recent event loop lag sample (max across workers).", aggregate="max"
+)
+
+
+# ---- database ------------------------------------------------------------------------
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("nta_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("nta_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    operation = _operation(statement)
+    DB_QUERIES.labels(operation).inc()
+    DB_QUERY_DURATION.labels(operation).observe(elapsed)
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("nta_query_started"):
+        conn.info["nta_query_started"].pop()
+    DB_QUERIES.labels("ERROR").inc()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every statement executed through ``engine`` (idempotent)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ---- values owned by other components, read when scraped -------------------------------
+
+
+def _collect_db_pool():
+    from nta_user_svc.database import engine
+
+    pool = engine.pool
+    if not hasattr(pool, "size") or not hasattr(pool, "checkedout"):
+        return []
+    return [
+        ("db_pool_size", "gauge", "Configured size of the DB connection pool.", [({}, pool.size())]),
+        ("db_pool_checked_out", "gauge", "DB connections currently checked out.", [({}, pool.checkedout())]),
+        ("db_pool_checked_in", "gauge", "Idle DB connections held by the pool.", [({}, pool.checkedin())]),
+        ("db_pool_overflow", "gauge", "DB connections open beyond the pool size.", [({}, max(0, pool.overflow()))]),
+    ]
+
+
+def _collect_photo_cache():
+    from nta_user_svc.storage.photo_cache import get_photo_cache
+
+    cache = get_photo_cache()
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        ("photo_cache_hits_total", "counter", "Photo cache hits.", [({}, stats["hits"])]),
+        ("photo_cache_misses_total", "counter", "Photo cache misses.", [({}, stats["misses"])]),
+        ("photo_cache_evictions_total", "counter", "Photos evicted from the cache.", [({}, stats["evictions"])]),
+        ("photo_cache_entries", "gauge", "Photos held in the cache.", [({}, stats["entries"])]),
+        ("photo_cache_bytes", "gauge", "Bytes held in the photo cache.", [({}, stats["bytes"])]),
+    ]
+
+
+def _collect_compression():
+    from nta_user_svc.middleware.compression import get_compression_stats
+
+    stats = get_compression_stats().stats()
+    encodings = stats["encodings"]
+
+    def per_encoding(field):
+        return [({"encoding": name}, entry[field]) for name, entry in encodings.items()]
+
+    return [
+        ("compression_responses_total", "counter", "Compressed responses.", per_encoding("responses")),
+        ("compression_bytes_in_total", "counter", "Response bytes before compression.", per_encoding("bytes_in")),
+        ("compression_bytes_out_total", "counter", "Response bytes after compression.", per_encoding("bytes_out")),
+        ("compression_cpu_seconds_total", "counter", "CPU time spent compressing.", per_encoding("cpu_seconds")),
+        (
+            "compression_skipped_total",
+            "counter",
+            "Responses left uncompressed, by reason.",
+            [({"reason": reason}, count) for reason, count in stats["skipped"].items()],
+        ),
+    ]
+
+
+def _collect_threadpool():
+    from nta_user_svc.threadpool import get_threadpool_stats
+
+    stats = get_threadpool_stats().stats()
+    return [
+        ("threadpool_capacity", "gauge", "Sync handler threadpool capacity.", [({}, stats["capacity"])]),
+        ("threadpool_running", "gauge", "Sync handlers running on a thread.", [({}, stats["running"])]),
+        ("threadpool_queued", "gauge", "Sync handlers waiting for a thread.", [({}, stats["queued"])]),
+        ("threadpool_waits_total", "counter", "Threadpool slots taken.", [({}, stats["wait_count"])]),
+        (
+            "threadpool_wait_seconds_total",
+            "counter",
+            "Total time spent waiting for a threadpool slot.",
+            [({}, stats["wait_seconds_total"])],
+        ),
+    ]
+
+
+def _collect_profiling():
+    from nta_user_svc.profiling import get_profiling_stats
+
+    stats = get_profiling_stats()
+    return [
+        (
+            "profiling_events_total",
+            "counter",
+            "Request profiling: requests profiled, skipped at the concurrency cap, files written, evicted and failed.",
+            [({"event": event}, count) for event, count in stats.items()],
+        )
+    ]
+
+
+for _collector in (
+    _collect_db_pool,
+    _collect_photo_cache,
+    _collect_compression,
+    _collect_threadpool,
+    _collect_profiling,
+):
+    REGISTRY.add_collector(_collector)
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of this process, or of all workers in multi-worker mode."""
+    return REGISTRY.render(config.METRICS_MULTIPROC_DIR or None)
+
+
+# ---- background tasks ------------------------------------------------------------------
+
+
+class LoopLagMonitor:
+    """Event-loop task measuring how late a sleep of METRICS_LOOP_LAG_INTERVAL wakes up."""
+
+    def __init__(self, interval: Optional[float] = None):
+        self._interval = float(config.METRICS_LOOP_LAG_INTERVAL if interval is None else interval)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self._interval
+            await asyncio.sleep(self._interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+class SnapshotWriter(threading.Thread):
+    """Writes this worker's snapshot to METRICS_MULTIPROC_DIR every METRICS_FLUSH_INTERVAL."""
+
+    def __init__(self, directory: str, interval: float):
+        super().__init__(name="metrics-snapshot", daemon=True)
+        self._directory = directory
+        self._interval = interval
+        self._stop_event = threading.Event()
+
+    def flush(self) -> None:
+        try:
+            write_snapshot(self._directory, REGISTRY.snapshot())
+        except Exception as e:
+            logger.error("Failed to write metrics snapshot", exc_info=True)
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=5)
+        self.flush()
+
+
+_lag_monitor: Optional[LoopLagMonitor] = None
+_writer: Optional[SnapshotWriter] = None
+
+
+def start_metrics() -> None:
+    """Start the loop-lag monitor and, in multi-worker mode, the snapshot writer; needs a running loop."""
+    global _lag_monitor, _writer
+    if not config.METRICS_ENABLED:
+        return
+    if _lag_monitor is None:
+        _lag_monitor = LoopLagMonitor()
+        _lag_monitor.start()
+    if config.METRICS_MULTIPROC_DIR and _writer is None:
+        _writer = SnapshotWriter(config.METRICS_MULTIPROC_DIR, float(config.METRICS_FLUSH_INTERVAL))
+        _writer.start()
+
+
+async def stop_metrics() -> None:
+    global _lag_monitor, _writer
+    monitor, _lag_monitor = _lag_monitor, None
+    writer, _writer = _writer, None
+    if monitor is not None:
+        await monitor.stop()
+    if writer is not None:
+        writer.stop()
+
+
+def prepare_multiprocess_dir() -> None:
+    """Clear snapshots left by a previous run; called by the launcher before forking workers."""
+    if config.METRICS_MULTIPROC_DIR:
+        clear_snapshots(config.METRICS_MULTIPROC_DIR)
@@ -0,0 +1,368 @@
+"""Minimal Prometheus-compatible metrics: counters, gauges and histograms with labels.
+
+Every labelled series has its own lock, so concurrent requests only contend when they
+update the same series, and an update is a lock acquire plus an addition. The
+registry renders the Prometheus text exposition format (version 0.0.4).
+
+Multi-worker mode: with a shared directory configured, each process periodically writes
+a snapshot of its series to ``<dir>/<pid>.json`` and a scrape, served by any worker,
+merges every snapshot. Counters and histograms of exited workers are kept so totals
+never go backwards; gauges only count live processes.
+"""
+import json
+import math
+import os
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Snapshot of one metric family: kind, help, aggregation of gauges across processes
+# ("sum" or "max"), label names, histogram buckets and {json label values: value}
+Snapshot = Dict[str, Dict[str, Any]]
+
+
+class _Series:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def snapshot(self) -> float:
+        return self.value
+
+
+class _HistogramSeries:
+    __slots__ = ("_lock", "_upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Sequence[float]):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        # one slot per bucket plus +Inf; not cumulative until rendered
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> List[float]:
+        with self._lock:
+            return [*self.counts, self.sum]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), aggregate: str = "sum"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.aggregate = aggregate
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _new_series(self):
+        return _Series()
+
+    def labels(self, *values: Any, **kwargs: Any):
+        """The series of one label combination, created on first use."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            items = list(self._series.items())
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "aggregate": self.aggregate,
+            "labelnames": list(self.labelnames),
+            "series": {json.dumps(list(key)): series.snapshot() for key, series in items},
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Holds the metrics of a process and renders or shares their values.
+
+    Collectors are callables invoked on every snapshot that return a list of
+    ``(name, kind, help, [(labels dict, value), ...])`` families, for values owned by
+    other components (cache and pool statistics) and read only when scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, list]]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), aggregate: str = "sum") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, list]]]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        """Drop every recorded series (tests)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+    def snapshot(self) -> Snapshot:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        data = {metric.name: metric.snapshot() for metric in metrics}
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.error("Metrics collector %r failed", collector, exc_info=True)
+                continue
+            for name, kind, documentation, samples in families:
+                data[name] = {
+                    "kind": kind,
+                    "help": documentation,
+                    "aggregate": "sum",
+                    "labelnames": sorted({label for labels, _ in samples for label in labels}),
+                    "series": {},
+                }
+                family = data[name]
+                for labels, value in samples:
+                    key = json.dumps([str(labels.get(label, "")) for label in family["labelnames"]])
+                    family["series"][key] = float(value)
+        return data
+
+    def render(self, directory: Optional[str] = None) -> str:
+        """Text exposition of this process, merged with every snapshot in ``directory``."""
+        snapshot = self.snapshot()
+        if directory:
+            # This process's live series replace its own (older) file; only the
+            # SnapshotWriter writes it, so a scrape never races the writer on disk.
+            others = read_snapshots(directory, exclude_pid=os.getpid())
+            snapshot = merge_snapshots([(True, snapshot), *others])
+        return render_snapshot(snapshot)
+
+
+# Serializes the snapshot writes of this process so an older snapshot never replaces a newer one
+_write_lock = threading.Lock()
+
+
+def write_snapshot(directory: str, snapshot: Snapshot, pid: Optional[int] = None) -> None:
+    """Atomically replace this process's snapshot file in the shared directory.
+
+    The data goes to a uniquely named temp file first, so readers only ever see a
+    complete snapshot and concurrent writers never share a temp path.
+    """
+    pid = os.getpid() if pid is None else pid
+    path = os.path.join(directory, f"{pid}.json")
+    with _write_lock:
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f"{pid}.", suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(snapshot, fh, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory: str, exclude_pid: Optional[int] = None) -> List[Tuple[bool, Snapshot]]:
+    """(process alive, snapshot) for every snapshot file in the directory but ``exclude_pid``'s."""
+    snapshots = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            pid = int(entry.name[: -len(".json")])
+        except ValueError:
+            continue
+        if pid == exclude_pid:
+            continue
+        try:
+            with open(entry.path, encoding="utf-8") as fh:
+                snapshots.append((_pid_alive(pid), json.load(fh)))
+        except FileNotFoundError:
+            continue
+        except (ValueError, OSError):
+            # Files are replaced atomically, so this is corruption rather than a write in progress
+            logger.warning("Skipping unreadable metrics snapshot %s", entry.path, exc_info=True)
+    return snapshots
+
+
+def clear_snapshots(directory: str) -> None:
+    """Remove the snapshot files of a previous server run (call before starting workers)."""
+    os.makedirs(directory, exist_ok=True)
+    for entry in os.scandir(directory):
+        if entry.name.endswith((".json", ".json.tmp")):
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+def merge_snapshots(snapshots: Iterable[Tuple[bool, Snapshot]]) -> Snapshot:
+    merged: Snapshot = {}
+    for alive, snapshot in snapshots:
+        for name, family in snapshot.items():
+            if family["kind"] == "gauge" and not alive:
+                continue
+            target = merged.get(name)
+            if target is None:
+                merged[name] = {**family, "series": dict(family["series"])}
+                continue
+            for key, value in family["series"].items():
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = value
+                elif family["kind"] == "histogram":
+                    target["series"][key] = [a + b for a, b in zip(current, value)]
+                elif family["kind"] == "gauge" and family.get("aggregate") == "max":
+                    target["series"][key] = max(current, value)
+                else:
+                    target["series"][key] = current + value
+    return merged
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_snapshot(snapshot: Snapshot) -> str:
+    lines = []
+    for name in sorted(snapshot):
+        family = snapshot[name]
+        names = family["labelnames"]
+        lines.append(f"# HELP {name} {_escape(family['help'])}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for key in sorted(family["series"]):
+            values = json.loads(key)
+            value = family["series"][key]
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_label_text(names, values)} {_format_value(value)}")
+                continue
+            *counts, total = value
+            cumulative = 0
+            for bound, count in zip([*family["buckets"], math.inf], counts):
+                cumulative += count
+                le = _format_value(bound) if math.isinf(bound) else repr(float(bound))
+                lines.append(f"{name}_bucket{_label_text(names, values, ('le', le))} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_label_text(names, values)} {_format_value(total)}")
+            lines.append(f"{name}_count{_label_text(names, values)} {_format_value(cumulative)}")
+    return "\n".join(lines) + "\n"
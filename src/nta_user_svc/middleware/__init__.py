@@ -0,0 +1,7 @@
+from .upload_limit import UploadLimitMiddleware
+from .compression import CompressionMiddleware, get_compression_stats
+from .metrics import MetricsMiddleware
+from .tracing import TracingMiddleware
+from .profiling import ProfilingMiddleware
+
+__all__ = ["UploadLimitMiddleware", "CompressionMiddleware", "get_compression_stats", "MetricsMiddleware", "TracingMiddleware", "ProfilingMiddleware"]
@@ -0,0 +1,386 @@
+import time
+import zlib
+import logging
+import threading
+import importlib
+import importlib.util
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+# Optional dependencies (the "compression" extra); only looked up here and imported by the
+# codec on first use, to keep them out of the service's import time
+_HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+_HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+# Content that is already compressed gains nothing from another pass
+_INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "font/woff")
+_INCOMPRESSIBLE_TYPES = {
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+    "application/zstd",
+    "application/x-brotli",
+    "application/octet-stream",
+    "application/pdf",
+}
+# Responses that must not carry a (different) body encoding
+_UNCOMPRESSED_STATUSES = {204, 206, 304}
+_POOL_SIZE = 8
+
+
+class _Stream:
+    """Incremental compressor of one streamed response body."""
+
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes], close=None):
+        self.compress = compress
+        self.finish = finish
+        self.close = close or (lambda: None)
+
+
+class _Codec:
+    name = ""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def stream(self) -> _Stream:
+        raise NotImplementedError
+
+
+class _GzipCodec(_Codec):
+    """gzip through zlib; every stream starts from a copy of one initialised template."""
+
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._template = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        c = self._template.copy()
+        return c.compress(data) + c.flush()
+
+    def stream(self) -> _Stream:
+        c = self._template.copy()
+        # sync-flush each chunk so streamed responses keep reaching the client promptly
+        return _Stream(lambda chunk: c.compress(chunk) + c.flush(zlib.Z_SYNC_FLUSH), c.flush)
+
+
+class _BrotliCodec(_Codec):
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._brotli = importlib.import_module("brotli")
+        self._quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.compress(data, quality=self._quality)
+
+    def stream(self) -> _Stream:
+        c = self._brotli.Compressor(quality=self._quality)
+        return _Stream(lambda chunk: c.process(chunk) + c.flush(), c.finish)
+
+
+class _ZstdCodec(_Codec):
+    """zstd with a pool of compression contexts reused across responses.
+
+    A ZstdCompressor holds a native context; it is returned to the pool once its
+    response is finished, so at most one response uses a context at a time.
+    """
+
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self._zstd = importlib.import_module("zstandard")
+        self._level = level
+        self._pool: Deque = deque()
+
+    def _acquire(self):
+        try:
+            return self._pool.pop()
+        except IndexError:
+            return self._zstd.ZstdCompressor(level=self._level)
+
+    def _release(self, cctx) -> None:
+        if len(self._pool) < _POOL_SIZE:
+            self._pool.append(cctx)
+
+    def compress(self, data: bytes) -> bytes:
+        cctx = self._acquire()
+        try:
+            return cctx.compress(data)
+        finally:
+            self._release(cctx)
+
+    def stream(self) -> _Stream:
+        cctx = self._acquire()
+        c = cctx.compressobj()
+
+        def _finish() -> bytes:
+            data = c.flush()
+            self._release(cctx)
+            return data
+
+        return _Stream(lambda chunk: c.compress(chunk) + c.flush(self._zstd.COMPRESSOBJ_FLUSH_BLOCK), _finish)
+
+
+def available_encodings() -> List[str]:
+    """Encodings of COMPRESSION_ENCODINGS whose library is installed, in preference order."""
+    installed = {"gzip": True, "br": _HAS_BROTLI, "zstd": _HAS_ZSTD}
+    return [name for name in config.COMPRESSION_ENCODINGS if installed.get(name)]
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: Iterable[str]) -> Optional[str]:
+    """Pick the content coding for an Accept-Encoding header, or None for identity.
+
+    The highest q-value wins; ties go to the earlier entry of ``supported``. ``*`` matches
+    every coding not listed explicitly, and q=0 excludes a coding.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for name in supported:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressionStats:
+    """Thread-safe counters of compressed responses, bytes in/out and CPU time per encoding."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encodings: Dict[str, Dict[str, float]] = {}
+        self._skipped: Dict[str, int] = {}
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float, responses: int = 0) -> None:
+        with self._lock:
+            entry = self._encodings.setdefault(
+                encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+            )
+            entry["responses"] += responses
+            entry["bytes_in"] += bytes_in
+            entry["bytes_out"] += bytes_out
+            entry["cpu_seconds"] += cpu_seconds
+
+    def skip(self, reason: str) -> None:
+        with self._lock:
+            self._skipped[reason] = self._skipped.get(reason, 0) + 1
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per encoding: responses, bytes_in, bytes_out, ratio (in/out) and cpu_seconds;
+        plus the number of responses left uncompressed by reason."""
+        with self._lock:
+            encodings = {}
+            for name, entry in self._encodings.items():
+                ratio = entry["bytes_in"] / entry["bytes_out"] if entry["bytes_out"] else 0.0
+                encodings[name] = {**entry, "ratio": ratio}
+            return {"encodings": encodings, "skipped": dict(self._skipped)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._encodings.clear()
+            self._skipped.clear()
+
+
+_stats = CompressionStats()
+
+
+def get_compression_stats() -> CompressionStats:
+    return _stats
+
+
+def _make_codec(name: str) -> _Codec:
+    if name == "zstd":
+        return _ZstdCodec(int(config.COMPRESSION_ZSTD_LEVEL))
+    if name == "br":
+        return _BrotliCodec(int(config.COMPRESSION_BROTLI_QUALITY))
+    return _GzipCodec(int(config.COMPRESSION_GZIP_LEVEL))
+
+
+def _incompressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type in _INCOMPRESSIBLE_TYPES or media_type.startswith(_INCOMPRESSIBLE_PREFIXES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with zstd, brotli or gzip per Accept-Encoding.
+
+    Left uncompressed: bodies below ``minimum_size`` (COMPRESSION_MIN_SIZE), images and
+    other already-compressed content types, responses that already carry a
+    Content-Encoding, and 204/206/304 responses. Photos are therefore never touched,
+    and file responses keep their zero-copy path. Single-message bodies are compressed
+    in one call; streamed bodies incrementally, flushing each chunk. Compression
+    contexts are reused where the library allows it (zstd contexts are pooled, gzip
+    streams are copied from an initialised template). Ratios and CPU time are recorded
+    in CompressionStats (get_compression_stats).
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self._codecs: Dict[Tuple[str, int, int, int], _Codec] = {}
+
+    def _codec(self, name: str) -> _Codec:
+        # keyed on the levels too, so settings changed at runtime (tests) take effect
+        key = (name, config.COMPRESSION_GZIP_LEVEL, config.COMPRESSION_BROTLI_QUALITY, config.COMPRESSION_ZSTD_LEVEL)
+        codec = self._codecs.get(key)
+        if codec is None:
+            codec = self._codecs[key] = _make_codec(name)
+        return codec
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        minimum_size = int(config.COMPRESSION_MIN_SIZE if self.minimum_size is None else self.minimum_size)
+        responder = _CompressingResponder(send, self._codec(encoding), minimum_size)
+        try:
+            await self.app(scope, receive, responder.send)
+        finally:
+            responder.close()
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, codec: _Codec, minimum_size: int):
+        self._send = send
+        self._codec = codec
+        self._minimum_size = minimum_size
+        self._start: Optional[Message] = None
+        self._stream: Optional[_Stream] = None
+        self._passthrough = False
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._cpu = 0.0
+
+    def _skip_reason(self, message: Message) -> Optional[str]:
+        headers = Headers(raw=self._start["headers"])
+        if self._start["status"] in _UNCOMPRESSED_STATUSES or self._start["status"] < 200:
+            return "status"
+        if "content-encoding" in headers:
+            return "encoded"
+        if _incompressible(headers.get("content-type", "")):
+            return "content_type"
+        if message.get("more_body", False):
+            declared = headers.get("content-length")
+            if declared is not None and declared.isdigit() and int(declared) < self._minimum_size:
+                return "small"
+        elif len(message.get("body", b"")) < self._minimum_size:
+            return "small"
+        return None
+
+    async def send(self, message: Message) -> None:
+        if self._passthrough:
+            await self._send(message)
+            return
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self._start = message
+            return
+        if message_type != "http.response.body":
+            # e.g. zero-copy sends: leave the response alone
+            await self._begin_passthrough(message, None)
+            return
+
+        if self._stream is None:
+            reason = self._skip_reason(message)
+            if reason is not None:
+                await self._begin_passthrough(message, reason)
+                return
+            await self._begin_compressed(message)
+            return
+
+        await self._send_chunk(message)
+
+    async def _begin_passthrough(self, message: Message, reason: Optional[str]) -> None:
+        self._passthrough = True
+        if reason:
+            _stats.skip(reason)
+        if self._start is not None:
+            start, self._start = self._start, None
+            await self._send(start)
+        await self._send(message)
+
+    def _prepare_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=list(self._start["headers"]))
+        headers["content-encoding"] = self._codec.name
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # the encoded body is a different representation of the same resource
+            headers["etag"] = f"W/{etag}"
+        return headers
+
+    async def _begin_compressed(self, message: Message) -> None:
+        body = message.get("body", b"")
+        headers = self._prepare_headers()
+        start = {**self._start, "headers": headers.raw}
+        self._start = None
+
+        if not message.get("more_body", False):
+            cpu = time.thread_time()
+            compressed = self._codec.compress(body)
+            _stats.record(self._codec.name, len(body), len(compressed), time.thread_time() - cpu, responses=1)
+            headers["content-length"] = str(len(compressed))
+            self._passthrough = True
+            await self._send(start)
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+            return
+
+        del headers["content-length"]
+        self._stream = self._codec.stream()
+        await self._send(start)
+        await self._send_chunk(message)
+
+    async def _send_chunk(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        cpu = time.thread_time()
+        data = self._stream.compress(body) if body else b""
+        if not more_body:
+            data += self._stream.finish()
+        self._cpu += time.thread_time() - cpu
+        self._bytes_in += len(body)
+        self._bytes_out += len(data)
+        if not more_body:
+            self._record_stream()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _record_stream(self) -> None:
+        _stats.record(self._codec.name, self._bytes_in, self._bytes_out, self._cpu, responses=1)
+        self._stream = None
+        self._passthrough = True
+
+    def close(self) -> None:
+        if self._stream is not None:
+            # the response was aborted mid-stream; keep what was compressed
+            _stats.record(self._codec.name, self._bytes_in, self._bytes_out, self._cpu)
+            self._stream.close()
+            self._stream = None
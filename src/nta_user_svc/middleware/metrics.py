@@ -0,0 +1,44 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import nta_user_svc.config as config
+from nta_user_svc.metrics.instruments import HTTP_REQUEST_DURATION, HTTP_REQUESTS
+
+# label for requests that matched no route, so unknown paths cannot explode the label set
+_UNMATCHED = "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts by status and latency per route template.
+
+    The route label is the matched route's path template (``/api/profiles/{user_id}``),
+    which FastAPI leaves in ``scope["route"]``; the duration runs until the response
+    body has been sent.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or _UNMATCHED
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, route_path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route_path, status_code).inc()
@@ -0,0 +1,61 @@
+import hmac
+import os
+import random
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import nta_user_svc.config as config
+from nta_user_svc.profiling import start_request_profile
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_FILE_HEADER = "X-Profile-File"
+
+
+def _authorized(scope: Scope) -> bool:
+    token = config.PROFILING_TOKEN
+    if not token:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            return hmac.compare_digest(value, token.encode("latin-1"))
+    return False
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests on demand (PROFILING_ENABLED).
+
+    A request is profiled when its X-Profile header equals PROFILING_TOKEN, or at random
+    with probability PROFILING_SAMPLE_RATE; a wrong token is ignored, not rejected.
+    Requests asking by header get the profile's file name back in X-Profile-File. Beyond
+    PROFILING_MAX_CONCURRENT profiled requests, requests are served unprofiled.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.PROFILING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        requested = _authorized(scope)
+        rate = float(config.PROFILING_SAMPLE_RATE)
+        if not requested and not (rate > 0 and random.random() < rate):
+            await self.app(scope, receive, send)
+            return
+        profiler = start_request_profile(scope["method"], scope["path"])
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if requested and message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_FILE_HEADER] = os.path.basename(profiler.path)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper if requested else send)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            profiler.finish(f"{scope['method']} {route}" if route else None)
@@ -0,0 +1,76 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from nta_user_svc.tracing import STATUS_ERROR, STATUS_UNSET, Span, attach, detach, end_trace, start_trace
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of sampled requests.
+
+    The span is named after the matched route template once the app has run. Reading the
+    request body is recorded as an ``http.receive_body`` span: for uploads that is the
+    transfer plus Starlette's multipart parsing, which happen together before the handler
+    runs. Sampled responses carry the trace id in X-Trace-Id so a slow request can be looked
+    up at /debug/traces.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent,
+            **{"http.method": scope["method"], "url.path": scope["path"]},
+        )
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        body_span = None
+        body_bytes = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal body_span, body_bytes
+            if body_span is None:
+                body_span = Span(root.trace, "http.receive_body", root.span_id)
+            message = await receive()
+            if message["type"] == "http.request":
+                body_bytes += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body_span.set_attribute("http.request.body.size", body_bytes)
+                    body_span.end()
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                MutableHeaders(scope=message)[TRACE_ID_HEADER] = root.trace.trace_id
+            await send(message)
+
+        token = attach(root)
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except BaseException as e:
+            root.record_exception(e)
+            raise
+        finally:
+            detach(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)
+            if root.attributes.get("http.status_code", 500) >= 500 and root.status == STATUS_UNSET:
+                root.status = STATUS_ERROR
+            end_trace(root)
@@ -0,0 +1,155 @@
+import re
+import json
+import logging
+from typing import Optional, Pattern
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import nta_user_svc.config as config
+from nta_user_svc.storage.files import sniff_image_extension
+
+logger = logging.getLogger(__name__)
+
+# POST /api/profiles/{user_id}/photo/upload
+_DEFAULT_PATH_REGEX = re.compile(r"^/api/profiles/\d+/photo/upload$")
+# Bytes of the file part buffered before giving up on sniffing its signature
+_SNIFF_WINDOW = 16 * 1024
+
+
+class _UploadRejected(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _multipart_boundary(scope: Scope) -> Optional[bytes]:
+    for name, value in scope.get("headers", []):
+        if name == b"content-type":
+            match = re.search(rb'boundary="?([^";]+)"?', value)
+            return match.group(1) if match else None
+    return None
+
+
+def _file_part_prefix(buffer: bytes, boundary: bytes) -> Optional[bytes]:
+    """Return the first bytes of the first file part in a multipart prefix, if complete."""
+    start = 0
+    delimiter = b"--" + boundary
+    while True:
+        part = buffer.find(delimiter, start)
+        if part < 0:
+            return None
+        headers_end = buffer.find(b"\r\n\r\n", part)
+        if headers_end < 0:
+            return None
+        headers = buffer[part:headers_end]
+        content_start = headers_end + 4
+        if b"filename=" in headers:
+            return buffer[content_start:content_start + 12]
+        start = content_start
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware rejecting oversize or non-image photo uploads while they stream in.
+
+    For requests whose path matches ``path_regex``:
+
+    - a ``Content-Length`` above the limit is answered with 413 before any body is read;
+    - the body is counted as it is received and the request is aborted with 413 as soon as
+      the limit is crossed, so chunked or lying clients cannot push more than the limit;
+    - the signature of the uploaded file is sniffed from the first multipart chunk(s) and a
+      non-JPEG/PNG/WEBP payload is rejected with 400 before the rest is read.
+
+    The limit is MAX_PHOTO_SIZE_BYTES plus UPLOAD_BODY_OVERHEAD_BYTES for multipart framing.
+    """
+
+    def __init__(self, app: ASGIApp, path_regex: Pattern[str] = _DEFAULT_PATH_REGEX) -> None:
+        self.app = app
+        self.path_regex = path_regex
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("method") != "POST" or not self.path_regex.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        limit = int(config.MAX_PHOTO_SIZE_BYTES) + int(config.UPLOAD_BODY_OVERHEAD_BYTES)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    await self._reject(send, 400, "invalid content-length")
+                    return
+                if declared > limit:
+                    await self._reject(send, 413, "file too large")
+                    return
+
+        boundary = _multipart_boundary(scope)
+        received = 0
+        prefix = b""
+        sniffed = boundary is None
+        rejection: Optional[_UploadRejected] = None
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, prefix, sniffed, rejection
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > limit:
+                rejection = _UploadRejected(413, "file too large")
+                raise rejection
+
+            if not sniffed:
+                prefix += chunk
+                head = _file_part_prefix(prefix, boundary)
+                if head is not None and len(head) >= 12:
+                    sniffed = True
+                    prefix = b""
+                    if sniff_image_extension(head) is None:
+                        rejection = _UploadRejected(400, "unsupported image type")
+                        raise rejection
+                elif len(prefix) > _SNIFF_WINDOW or not message.get("more_body", False):
+                    # let the regular validation in save_profile_photo decide
+                    sniffed = True
+                    prefix = b""
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            if rejection is not None:
+                # the app turned our abort into its own error response: replace it
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send, rejection.status_code, rejection.detail)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _UploadRejected as e:
+            if not response_started:
+                await self._reject(send, e.status_code, e.detail)
+
+    @staticmethod
+    async def _reject(send: Send, status_code: int, detail: str) -> None:
+        logger.error("Rejected photo upload: %s", detail)
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -5,5 +5,7 @@ from ..database import get_db
 # application imports can do: from nta_user_svc.models import User, Profile
 from .user import User
 from .profile import Profile
+from .photo_blob import PhotoBlob
+from .photo_deletion import PhotoDeletion
 
-__all__ = ["Base", "get_db", "User", "Profile"]
+__all__ = ["Base", "get_db", "User", "Profile", "PhotoBlob", "PhotoDeletion"]
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, func
+
+from .base import Base
+
+
+class PhotoBlob(Base):
+    """Reference count for a content-addressed profile photo stored once on disk."""
+
+    __tablename__ = "photo_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(1024), nullable=False, unique=True)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    created_at = Column(DateTime(), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<PhotoBlob(sha256={self.sha256}, ref_count={self.ref_count})>"
@@ -0,0 +1,26 @@
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, false, func
+
+from .base import Base
+
+
+class PhotoDeletion(Base):
+    """Outbox entry for a stored photo whose files are to be removed after commit.
+
+    An entry with ``releases_reference`` is an upload's reservation of a content-addressed
+    photo: the upload's commit deletes it, and if the upload never commits it becomes due
+    at ``next_attempt_at`` and drops the reservation's reference before the usual removal.
+    """
+
+    __tablename__ = "photo_deletion_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String(1024), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime(), nullable=True, index=True)
+    last_error = Column(String(255), nullable=True)
+    releases_reference = Column(Boolean, nullable=False, default=False, server_default=false())
+
+    created_at = Column(DateTime(), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<PhotoDeletion(id={self.id}, path={self.path}, attempts={self.attempts})>"
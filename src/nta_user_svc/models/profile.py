@@ -16,7 +16,16 @@ class Profile(Base):
     hobby = Column(String(255), nullable=True)
     occupation = Column(String(255), nullable=True)
     location = Column(String(255), nullable=True)
-    profile_photo_path = Column(String(1024), nullable=True)
+    # indexed for the exact-path reference checks of orphan photo collection
+    profile_photo_path = Column(String(1024), nullable=True, index=True)
+    # Metadata of the stored photo, recorded at upload so serving needs no file probes
+    photo_width = Column(Integer, nullable=True)
+    photo_height = Column(Integer, nullable=True)
+    photo_size = Column(Integer, nullable=True)
+    photo_mime_type = Column(String(50), nullable=True)
+    photo_sha256 = Column(String(64), nullable=True)
+    # Blurhash of the photo, returned with the profile so clients can render a preview
+    photo_placeholder = Column(String(200), nullable=True)
 
     created_at = Column(DateTime(), server_default=func.now())
     updated_at = Column(DateTime(), server_default=func.now(), onupdate=func.now())
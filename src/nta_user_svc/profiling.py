@@ -0,0 +1,245 @@
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+FORMAT_SPEEDSCOPE = "speedscope"
+FORMAT_COLLAPSED = "collapsed"
+_EXTENSIONS = {FORMAT_SPEEDSCOPE: ".speedscope.json", FORMAT_COLLAPSED: ".collapsed.txt"}
+
+# innermost frames of threads that are blocked waiting for work or I/O readiness; such
+# samples say nothing about where a request spends its time and are left out
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+# (function, file, first line) of a code object; stacks are tuples of these, outermost first
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+_lock = threading.Lock()
+_active: Set[int] = set()
+_sequence = itertools.count(1)
+_stats: Counter = Counter()
+
+
+def _frame_key(code) -> Frame:
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+class RequestProfiler(threading.Thread):
+    """Samples the stacks of the process's busy threads until stopped, then writes them.
+
+    Every ``interval`` seconds the stack of each thread that is not idle is recorded with
+    the thread's name as its root frame: the event loop, request threadpool and photo pool
+    threads all show up, so sync handlers, async handlers and offloaded work are covered.
+    Threads are not attributed to requests; concurrent requests appear in the same
+    profile. Sampling stops after ``max_seconds``. The file is written from this thread
+    once the request has finished, never from the event loop.
+    """
+
+    def __init__(self, path: str, fmt: str, interval: float, max_seconds: float, name: str):
+        super().__init__(name="request-profiler", daemon=True)
+        self.path = path
+        self.name_label = name
+        self._format = fmt
+        self._interval = max(0.001, interval)
+        self._max_seconds = max_seconds
+        self._stop_event = threading.Event()
+        self._stacks: Dict[Stack, Stack] = {}
+        self.samples: List[Tuple[float, List[Stack]]] = []
+        self.duration = 0.0
+
+    def finish(self, name: Optional[str] = None) -> None:
+        """Stop sampling; the profile is written in the background."""
+        if name:
+            self.name_label = name
+        self._stop_event.set()
+
+    def _sample(self, skip: Set[int], thread_names: Dict[int, str]) -> List[Stack]:
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident in skip or _is_idle(frame):
+                continue
+            frames = [(f"thread {thread_names.get(ident, ident)}", "", 0)]
+            path = []
+            while frame is not None:
+                path.append(_frame_key(frame.f_code))
+                frame = frame.f_back
+            frames.extend(reversed(path))
+            stack = tuple(frames)
+            # identical stacks share one tuple, which keeps long profiles small
+            stacks.append(self._stacks.setdefault(stack, stack))
+        return stacks
+
+    def run(self) -> None:
+        started = time.perf_counter()
+        deadline = started + self._max_seconds
+        try:
+            while not self._stop_event.wait(self._interval):
+                now = time.perf_counter()
+                if now > deadline:
+                    break
+                with _lock:
+                    skip = set(_active)
+                thread_names = {t.ident: t.name for t in threading.enumerate()}
+                self.samples.append((now - started, self._sample(skip, thread_names)))
+            self._stop_event.wait()
+            self.duration = time.perf_counter() - started
+            write_profile(self)
+        except Exception as e:
+            with _lock:
+                _stats["failed"] += 1
+            logger.error("Failed to profile %s", self.name_label, exc_info=True)
+        finally:
+            with _lock:
+                _active.discard(threading.get_ident())
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, as read by flamegraph.pl and speedscope."""
+        counts = Counter(stack for _, stacks in self.samples for stack in stacks)
+        lines = []
+        for stack, count in counts.most_common():
+            names = [stack[0][0]] + [f"{func} ({_short_path(file)}:{line})" for func, file, line in stack[1:]]
+            lines.append(f"{';'.join(name.replace(';', ':') for name in names)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict:
+        """A speedscope "sampled" profile; each sample weighs one sampling interval."""
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        samples = []
+        for _, stacks in self.samples:
+            for stack in stacks:
+                indices = []
+                for frame in stack:
+                    index = frame_index.get(frame)
+                    if index is None:
+                        index = frame_index[frame] = len(frames)
+                        func, file, line = frame
+                        frames.append({"name": func, "file": file, "line": line} if file else {"name": func})
+                    indices.append(index)
+                samples.append(indices)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name_label,
+            "exporter": "nta_user_svc",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name_label,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(self.duration, 6),
+                    "samples": samples,
+                    "weights": [self._interval] * len(samples),
+                }
+            ],
+        }
+
+
+def _short_path(path: str) -> str:
+    # package-relative where possible: ".../site-packages/starlette/routing.py" -> "starlette/routing.py"
+    parts = path.replace("\\", "/").split("/")
+    return "/".join(parts[-2:])
+
+
+def write_profile(profiler: RequestProfiler) -> None:
+    """Write a finished profile, then evict the oldest files beyond the output caps."""
+    if profiler._format == FORMAT_COLLAPSED:
+        data = profiler.collapsed()
+    else:
+        data = json.dumps(profiler.speedscope(), separators=(",", ":"))
+    directory = os.path.dirname(profiler.path)
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{profiler.path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(data)
+    os.replace(tmp, profiler.path)
+    with _lock:
+        _stats["written"] += 1
+    enforce_output_caps(directory)
+
+
+def enforce_output_caps(directory: str, max_files: Optional[int] = None, max_bytes: Optional[int] = None) -> int:
+    """Delete the oldest profiles until at most PROFILING_MAX_FILES files and
+    PROFILING_MAX_BYTES bytes remain; returns how many were removed."""
+    max_files = int(config.PROFILING_MAX_FILES if max_files is None else max_files)
+    max_bytes = int(config.PROFILING_MAX_BYTES if max_bytes is None else max_bytes)
+    with _lock:
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(tuple(_EXTENSIONS.values())):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        while entries and (len(entries) > max_files or total > max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        _stats["evicted"] += removed
+        return removed
+
+
+def _slug(method: str, path: str) -> str:
+    return f"{method}-{re.sub(r'[^A-Za-z0-9]+', '_', path).strip('_')[:60] or 'root'}"
+
+
+def start_request_profile(method: str, path: str) -> Optional[RequestProfiler]:
+    """Start profiling a request, or return None when PROFILING_MAX_CONCURRENT are running."""
+    fmt = config.PROFILING_FORMAT if config.PROFILING_FORMAT in _EXTENSIONS else FORMAT_SPEEDSCOPE
+    with _lock:
+        if len(_active) >= max(1, int(config.PROFILING_MAX_CONCURRENT)):
+            _stats["skipped_busy"] += 1
+            return None
+        filename = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_sequence)}-{_slug(method, path)}{_EXTENSIONS[fmt]}"
+        )
+        profiler = RequestProfiler(
+            os.path.join(config.PROFILING_DIR, filename),
+            fmt,
+            float(config.PROFILING_INTERVAL),
+            float(config.PROFILING_MAX_SECONDS),
+            f"{method} {path}",
+        )
+        profiler.start()
+        _active.add(profiler.ident)
+        _stats["profiled"] += 1
+    return profiler
+
+
+def get_profiling_stats() -> Dict[str, int]:
+    """Counts of profiled requests, requests skipped at the concurrency cap, files written,
+    files evicted by the output caps and failed profiles."""
+    with _lock:
+        return {key: _stats[key] for key in ("profiled", "skipped_busy", "written", "evicted", "failed")}
+
+
+def reset_profiling_stats() -> None:
+    with _lock:
+        _stats.clear()
@@ -1,5 +1,8 @@
 from .users import users_router
 from .auth import auth_router
 from .photos import photos_router
+from .health import health_router
+from .metrics import metrics_router
+from .debug import debug_router
 
-__all__ = ["users_router", "auth_router", "photos_router"]
+__all__ = ["users_router", "auth_router", "photos_router", "health_router", "metrics_router", "debug_router"]
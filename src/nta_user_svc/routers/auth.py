@@ -12,6 +12,7 @@ from nta_user_svc.models.base import get_db
 from nta_user_svc.models import User, Profile
 from nta_user_svc.security.passwords import verify_password, validate_password_strength, hash_password
 from nta_user_svc.security import create_access_token, get_current_user
+from nta_user_svc.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +43,7 @@ class UserOut(BaseModel):
 
 
 @auth_router.post("/auth/login", response_model=Token)
+@traced("auth.login")
 def login(user_credentials: UserLogin, db: Session = Depends(get_db)) -> Token:
     """Authenticate user and issue JWT access token."""
     # TODO: Integrate rate-limiting here to prevent brute-force attacks.
@@ -79,6 +81,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)) -> Token:
 
 
 @auth_router.get("/auth/me")
+@traced("auth.read_current_user")
 def read_current_user(current_user: User = Depends(get_current_user)) -> Dict[str, Any]:
     """Return basic information about the authenticated user."""
     try:
@@ -93,6 +96,7 @@ def read_current_user(current_user: User = Depends(get_current_user)) -> Dict[st
     response_model=UserOut,
     status_code=status.HTTP_201_CREATED,
 )
+@traced("auth.register_user")
 def register_user(user_in: UserCreate, db: Session = Depends(get_db)) -> User:
     """Register a new user and create an associated Profile in the same transaction."""
     try:
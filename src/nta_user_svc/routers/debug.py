@@ -0,0 +1,44 @@
+import hmac
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+
+import nta_user_svc.config as config
+from nta_user_svc.tracing import get_trace_buffer, summarize, to_otlp
+
+
+def _require_debug_endpoint(x_debug_token: Optional[str] = Header(None)) -> None:
+    """Answer 404 unless TRACING_DEBUG_ENDPOINT is on and the request carries TRACING_DEBUG_TOKEN."""
+    token = config.TRACING_DEBUG_TOKEN
+    if (
+        not config.TRACING_DEBUG_ENDPOINT
+        or not token
+        or not x_debug_token
+        or not hmac.compare_digest(x_debug_token.encode("utf-8"), token.encode("utf-8"))
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+# spans carry SQL statements and URL paths: every route requires the debug token
+debug_router = APIRouter(tags=["debug"], dependencies=[Depends(_require_debug_endpoint)])
+
+
+@debug_router.get("/debug/traces", include_in_schema=False)
+def list_traces(
+    limit: int = Query(20, ge=1, le=1000),
+    min_duration_ms: float = Query(0.0, ge=0),
+    name: Optional[str] = Query(None),
+) -> Dict[str, Any]:
+    """Recent sampled traces, newest first, with their spans' offsets and durations."""
+    buffer = get_trace_buffer()
+    traces = buffer.recent(limit=limit, min_duration_ms=min_duration_ms, name=name)
+    return {**buffer.stats(), "traces": [summarize(trace) for trace in traces]}
+
+
+@debug_router.get("/debug/traces/{trace_id}", include_in_schema=False)
+def get_trace(trace_id: str) -> Dict[str, Any]:
+    """One buffered trace as an OTLP/JSON export request, ready for any OTLP-aware viewer."""
+    trace = get_trace_buffer().find(trace_id.lower())
+    if trace is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace not found")
+    return to_otlp([trace])
@@ -0,0 +1,22 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from nta_user_svc.warmup import is_ready, warmup_timings
+
+health_router = APIRouter(tags=["health"])
+
+
+@health_router.get("/health/live")
+async def liveness() -> Dict[str, Any]:
+    """The process is up and serving; says nothing about warm-up."""
+    return {"status": "ok"}
+
+
+@health_router.get("/health/ready")
+async def readiness():
+    """200 once the startup warm-up has finished, 503 until then."""
+    if not is_ready():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return {"status": "ready", "warmup_seconds": warmup_timings()}
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import Response
+
+import nta_user_svc.config as config
+from nta_user_svc.metrics import CONTENT_TYPE, render_metrics
+
+metrics_router = APIRouter(tags=["metrics"])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Prometheus text exposition; merges all workers when METRICS_MULTIPROC_DIR is set."""
+    if not config.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
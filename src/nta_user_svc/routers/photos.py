@@ -1,18 +1,38 @@
 import logging
 import mimetypes
+import os
+import stat
+import time
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy import select
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from nta_user_svc.models import Profile
 from nta_user_svc.models.base import get_db
 from nta_user_svc.security.jwt import get_current_user
+from nta_user_svc.security.photo_urls import sign_photo_path, verify_photo_signature
+from nta_user_svc.services import photo_blob_service, photo_outbox_service
 import nta_user_svc.storage.files as storage_files
+import nta_user_svc.storage.transcode as storage_transcode
+import nta_user_svc.storage.variants as storage_variants
+from nta_user_svc.storage.backends import get_storage_backend
+from nta_user_svc.storage.delivery import (
+    PhotoFileResponse,
+    build_memory_response,
+    build_offload_response,
+    etag_matches,
+)
+from nta_user_svc.storage.files import StoredPhoto
+from nta_user_svc.storage.photo_cache import CachedPhoto, get_photo_cache, photo_cache_key
 import nta_user_svc.config as config
+from nta_user_svc.metrics.instruments import PHOTO_UPLOAD_BYTES, PHOTO_UPLOAD_DURATION
+from nta_user_svc.tracing import traced
 
 logger = logging.getLogger(__name__)
 photos_router = APIRouter()
@@ -22,19 +42,35 @@ _MIME_FALLBACK: Dict[str, str] = {
     ".jpeg": "image/jpeg",
     ".png": "image/png",
     ".webp": "image/webp",
+    ".avif": "image/avif",
 }
+_NO_STORE = "no-cache, no-store, must-revalidate"
 
 
 @photos_router.get("/profiles/{user_id}/photo")
+@traced("photos.get_profile_photo")
 def get_profile_photo(
     user_id: int,
+    request: Request,
+    size: Optional[int] = Query(None, ge=1),
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
-) -> FileResponse:
+) -> Response:
     """Serve the profile photo for a given user_id.
 
     Access control: only the user themself (current_user.id == user_id) can access.
-    Returns FileResponse with appropriate Content-Type and Cache-Control headers.
+    ``size`` selects the smallest configured variant whose longest edge covers it; variants
+    are generated on first request and memoized on disk. Larger sizes get the original.
+    When transcoded alternates exist, the best format listed in ``Accept`` is served.
+    With PHOTO_OFFLOAD_MODE set, returns an empty response carrying X-Accel-Redirect or
+    X-Sendfile so the fronting proxy streams the file. Otherwise returns a
+    PhotoFileResponse (zero-copy when the server supports it, honours Range requests).
+    With a non-local storage backend the original is streamed from the backend instead.
+    With PHOTO_CACHE_MAX_BYTES set, small photos are served from an in-memory LRU cache
+    keyed by the stored path, requested size and Accept preferences, skipping the disk.
+    When the original is served and its metadata is recorded on the profile row,
+    Content-Type, Content-Length and ETag come from the row: the file is opened, never
+    stat'ed, and a matching If-None-Match is answered with 304.
     """
     try:
         # Fetch profile
@@ -62,36 +98,352 @@ def get_profile_photo(
         if not profile.profile_photo_path:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
 
-        # Resolve full path safely
+        return _serve_photo(request, profile.profile_photo_path, size, _NO_STORE, profile)
+
+    except HTTPException:
+        # Re-raise known HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@photos_router.post("/profiles/{user_id}/photo/url")
+@traced("photos.create_signed_photo_url")
+def create_signed_photo_url(
+    user_id: int,
+    request: Request,
+    size: Optional[int] = Query(None, ge=1),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Mint a short-lived signed URL for the profile photo of ``user_id``.
+
+    Access control is the same as for get_profile_photo. The URL carries the stored path,
+    the requested ``size`` and an expiry (PHOTO_URL_TTL_SECONDS), signed with HMAC-SHA256;
+    anyone holding it can fetch the photo from get_signed_photo until it expires.
+    """
+    try:
         try:
-            full_path: Path = storage_files.get_full_file_path(profile.profile_photo_path)
+            if int(current_user.id) != int(user_id):
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(e, exc_info=True)
-            # Treat any path resolution error as not found to avoid leaking info
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
-        if not full_path.exists() or not full_path.is_file():
+        try:
+            stmt = select(Profile.profile_photo_path).where(Profile.user_id == user_id)
+            photo_path = db.execute(stmt).scalars().first()
+        except Exception as e:
+            logger.error(e, exc_info=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+        if not photo_path:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
 
-        # Determine MIME type
-        mime_type, _ = mimetypes.guess_type(str(full_path))
-        if not mime_type:
-            mime_type = _MIME_FALLBACK.get(full_path.suffix.lower(), "application/octet-stream")
+        params = sign_photo_path(photo_path, size)
+        url = request.url_for("get_signed_photo", photo_path=photo_path).include_query_params(**params)
+        return {"url": str(url), "expires_at": params["expires"]}
 
-        headers = {"Cache-Control": "no-cache, no-store, must-revalidate"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+
+
+@photos_router.get("/photos/{photo_path:path}", name="get_signed_photo")
+@traced("photos.get_signed_photo")
+def get_signed_photo(
+    photo_path: str,
+    request: Request,
+    expires: int = Query(...),
+    sig: str = Query(...),
+    size: Optional[int] = Query(None, ge=1),
+) -> Response:
+    """Serve a photo through a URL minted by create_signed_photo_url.
 
-        return FileResponse(path=str(full_path), media_type=mime_type, headers=headers)
+    Only the HMAC and expiry are checked: no JWT is decoded and the database is never
+    touched, so photo traffic scales independently of it. Responses may be cached
+    privately until the URL expires; delivery is otherwise that of get_profile_photo.
+    """
+    try:
+        if not verify_photo_signature(photo_path, size, expires, sig):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired photo URL")
+        max_age = max(0, int(expires - time.time()))
+        return _serve_photo(request, photo_path, size, f"private, max-age={max_age}")
 
     except HTTPException:
-        # Re-raise known HTTP exceptions
         raise
     except Exception as e:
         logger.error(e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
 
+@traced("photos.serve_photo")
+def _serve_photo(
+    request: Request,
+    photo_path: str,
+    size: Optional[int],
+    cache_control: str,
+    profile: Optional[Profile] = None,
+) -> Response:
+    """Serve a stored photo, its size variant or transcoded alternate (see get_profile_photo).
+
+    ``profile`` supplies recorded metadata of the original when the caller has loaded it.
+    """
+    backend = get_storage_backend()
+    if not backend.is_local:
+        return _stream_from_backend(backend, photo_path, cache_control, profile)
+
+    headers = {"Cache-Control": cache_control}
+    if config.PHOTO_TRANSCODE_FORMATS:
+        headers["Vary"] = "Accept"
+    # If-Range validation is not implemented; serving the full body is always correct
+    range_header = None if request.headers.get("if-range") else request.headers.get("range")
+    if_none_match = request.headers.get("if-none-match")
+
+    served_path = photo_path
+    variant_size = storage_variants.select_variant_size(size)
+
+    # The proxy reads the file itself in offload mode, so there is nothing to cache
+    cache = None if config.PHOTO_OFFLOAD_MODE else get_photo_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = photo_cache_key(
+            served_path, variant_size, storage_transcode.accept_signature(request.headers.get("accept"), served_path)
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if cached.etag:
+                headers["ETag"] = cached.etag
+                if etag_matches(if_none_match, cached.etag):
+                    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return build_memory_response(cached.data, cached.media_type, cached.mtime, headers, range_header)
+
+    if variant_size is not None:
+        try:
+            served_path = storage_variants.get_or_create_variant(photo_path, variant_size)
+        except FileNotFoundError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+        except Exception as e:
+            # Fall back to the original rather than failing the request
+            logger.error("Failed to produce %spx variant for %s", variant_size, served_path, exc_info=True)
+
+    try:
+        served_path = storage_transcode.negotiate_alternate(served_path, request.headers.get("accept"))
+    except Exception as e:
+        logger.error("Format negotiation failed for %s", served_path, exc_info=True)
+
+    # Variants and alternates have no recorded metadata; the original does once uploaded
+    # (or backfilled) after the metadata columns were added
+    from_row = served_path == photo_path and profile is not None and _has_photo_metadata(profile)
+    etag = None
+    if from_row:
+        etag = f'"{profile.photo_sha256}"'
+        headers["ETag"] = etag
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Resolve full path safely
+    try:
+        full_path: Path = storage_files.get_full_file_path(
+            served_path, check_moved=not from_row or bool(config.PHOTO_OFFLOAD_MODE)
+        )
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        # Treat any path resolution error as not found to avoid leaking info
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+
+    # Determine MIME type
+    if from_row:
+        mime_type = profile.photo_mime_type
+    else:
+        mime_type, _ = mimetypes.guess_type(str(full_path))
+        if not mime_type:
+            mime_type = _MIME_FALLBACK.get(full_path.suffix.lower(), "application/octet-stream")
+
+    if config.PHOTO_OFFLOAD_MODE:
+        # The proxy resolves and streams the file; do not touch the disk here
+        return build_offload_response(served_path, full_path, mime_type, headers)
+
+    if from_row:
+        # Opening the file is the only system call; a missing file still yields 404
+        fd = _open_photo(served_path, full_path)
+        if cache is not None and cache.cacheable(profile.photo_size):
+            with os.fdopen(fd, "rb") as f:
+                data = f.read()
+            cache.put(cache_key, CachedPhoto(served_path, data, mime_type, None, etag))
+            return build_memory_response(data, mime_type, None, headers, range_header)
+        return PhotoFileResponse(
+            full_path,
+            media_type=mime_type,
+            headers=headers,
+            range_header=range_header,
+            size=profile.photo_size,
+            fd=fd,
+        )
+
+    # A single stat replaces exists()/is_file() and feeds Content-Length
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+
+    if cache is not None and cache.cacheable(stat_result.st_size):
+        try:
+            data = full_path.read_bytes()
+        except OSError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+        cache.put(cache_key, CachedPhoto(served_path, data, mime_type, stat_result.st_mtime))
+        return build_memory_response(data, mime_type, stat_result.st_mtime, headers, range_header)
+
+    return PhotoFileResponse(
+        full_path,
+        stat_result=stat_result,
+        media_type=mime_type,
+        headers=headers,
+        range_header=range_header,
+    )
+
+
+def _has_photo_metadata(profile: Profile) -> bool:
+    return profile.photo_size is not None and bool(profile.photo_mime_type) and bool(profile.photo_sha256)
+
+
+def _open_photo(relative_path: str, full_path: Path) -> int:
+    """Open a stored photo for reading, raising 404 when it is missing.
+
+    A flat-layout path is retried at its sharded location, where the layout migration
+    may have moved it; the probe only costs syscalls when the first open fails.
+    """
+    try:
+        return os.open(full_path, os.O_RDONLY)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+    try:
+        return os.open(storage_files.get_full_file_path(relative_path), os.O_RDONLY)
+    except (OSError, ValueError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+
+
+def _stream_from_backend(backend, relative_path: str, cache_control: str, profile: Optional[Profile] = None) -> Response:
+    """Stream a photo held by a non-local storage backend (variants/alternates are local-only).
+
+    Recorded metadata saves the HEAD request otherwise needed for Content-Length.
+    """
+    headers = {"Cache-Control": cache_control}
+    try:
+        if profile is not None and _has_photo_metadata(profile):
+            size, mime_type = profile.photo_size, profile.photo_mime_type
+            headers["ETag"] = f'"{profile.photo_sha256}"'
+        else:
+            size = backend.stat(relative_path).size
+            mime_type = mimetypes.guess_type(relative_path)[0] or _MIME_FALLBACK.get(
+                Path(relative_path).suffix.lower(), "application/octet-stream"
+            )
+        chunks = backend.stream(relative_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile photo not found")
+    headers["Content-Length"] = str(size)
+    # StreamingResponse iterates a sync iterator on the threadpool; the background close
+    # runs even when the client disconnected first, returning the backend's connection
+    close = getattr(chunks, "close", None)
+    return StreamingResponse(
+        chunks, media_type=mime_type, headers=headers, background=BackgroundTask(close) if close else None
+    )
+
+
+@traced("photos.get_profile")
+def _get_profile(db: Session, user_id: int) -> Optional[Profile]:
+    # read only: a missing profile is created by the commit, so failed uploads leave none
+    stmt = select(Profile).where(Profile.user_id == user_id)
+    return db.execute(stmt).scalars().first()
+
+
+@traced("photos.reserve_photo")
+def _reserve_photo(bind, relative_path: str) -> int:
+    """Reserve a content-addressed photo in a short transaction of its own, committed
+    before the upload decides whether the existing file can be reused; the request's
+    session stays untouched until the profile commit."""
+    with Session(bind=bind) as session:
+        reservation_id = photo_outbox_service.reserve_photo(session, relative_path)
+        session.commit()
+    return reservation_id
+
+
+def _release_reservation(db: Session, reservation_id: int, relative_path: str) -> None:
+    # the upload did not go through: give the reference back, queueing removal if it was the last
+    try:
+        photo_outbox_service.release_photo_reservation(db, reservation_id, relative_path)
+        db.commit()
+    except Exception as e:
+        logger.error("Failed to release reservation of %s", relative_path, exc_info=True)
+        try:
+            db.rollback()
+        except Exception:
+            logger.error("Rollback failed after releasing a reservation", exc_info=True)
+
+
+@traced("photos.commit_new_photo")
+def _commit_new_photo(
+    db: Session,
+    user_id: int,
+    profile: Optional[Profile],
+    stored: StoredPhoto,
+    reservation_id: Optional[int] = None,
+) -> Profile:
+    """Point the (possibly new) profile at the new photo, record its metadata and commit.
+    Reference counts change, and removal of a no longer referenced old photo is queued, in
+    the same transaction. A reservation (see _reserve_photo) becomes the profile's reference."""
+    if profile is None:
+        profile = Profile(user_id=user_id)
+    old_photo = profile.profile_photo_path
+    new_relative = stored.relative_path
+    if reservation_id is not None or new_relative != old_photo:
+        if reservation_id is None or not photo_outbox_service.confirm_photo_reservation(db, reservation_id):
+            photo_blob_service.acquire_photo_reference(db, new_relative)
+        if old_photo and photo_blob_service.release_photo_reference(db, old_photo):
+            photo_outbox_service.enqueue_photo_deletion(db, old_photo)
+    profile.profile_photo_path = new_relative
+    profile.photo_width = stored.width
+    profile.photo_height = stored.height
+    profile.photo_size = stored.size
+    profile.photo_mime_type = stored.mime_type
+    profile.photo_sha256 = stored.content_hash
+    profile.photo_placeholder = stored.placeholder
+    db.add(profile)
+    db.commit()
+    db.refresh(profile)
+    return profile
+
+
+def _rollback_new_photo(
+    db: Session, old_photo: Optional[str], new_relative: str, reservation_id: Optional[int] = None
+) -> None:
+    try:
+        db.rollback()
+    except Exception:
+        logger.error("Rollback failed after DB commit error", exc_info=True)
+    if reservation_id is not None:
+        _release_reservation(db, reservation_id, new_relative)
+        return
+    # try to cleanup newly saved file, unless identical content is referenced elsewhere
+    try:
+        if new_relative != old_photo and not photo_blob_service.is_photo_referenced(db, new_relative):
+            storage_files.remove_profile_photo(new_relative)
+    except Exception as e2:
+        logger.error("Failed to cleanup newly saved file after DB error", exc_info=True)
+
+
 @photos_router.post("/profiles/{user_id}/photo/upload")
-def upload_profile_photo(
+@traced("photos.upload_profile_photo")
+async def upload_profile_photo(
     user_id: int,
     file: UploadFile = File(...),
     current_user=Depends(get_current_user),
@@ -103,7 +455,12 @@ def upload_profile_photo(
     - Save new file to disk first.
     - Attempt to update DB and commit.
     - If DB update fails, remove newly saved file and rollback.
-    - If DB update succeeds, attempt to remove old file (log failures but do not abort).
+    - Removal of the old file is queued in the same transaction and carried out by the
+      photo deletion worker after commit, off the request path.
+
+    The handler is async: blocking DB work runs on the request threadpool in short steps,
+    while image verification and file writes run in the dedicated photo pools, so upload
+    bursts do not hold request threads during CPU and disk waits.
     """
     try:
         # Authorization: only the owner may upload (admins not implemented in User model)
@@ -116,63 +473,47 @@ def upload_profile_photo(
             logger.error(e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
-        # Fetch or create profile
+        # Fetch the profile; a new one is only created together with the photo
         try:
-            stmt = select(Profile).where(Profile.user_id == user_id)
-            profile = db.execute(stmt).scalars().first()
+            profile = await run_in_threadpool(_get_profile, db, user_id)
         except Exception as e:
             logger.error(e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
-        if not profile:
-            # create profile record
-            try:
-                profile = Profile(user_id=user_id)
-                db.add(profile)
-                db.flush()
-            except Exception as e:
-                logger.error(e, exc_info=True)
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+        old_photo = profile.profile_photo_path if profile is not None else None
+        reservation = []
 
-        old_photo = profile.profile_photo_path
+        def reserve(relative_path: str) -> None:
+            reservation.append((_reserve_photo(db.get_bind(), relative_path), relative_path))
 
         # Save new file first
+        save_started = time.perf_counter()
         try:
-            new_relative = storage_files.save_profile_photo(file, user_id)
+            stored = await storage_files.save_profile_photo_async(file, user_id, reserve=reserve)
         except ValueError as ve:
             logger.error(ve, exc_info=True)
+            if reservation:
+                await run_in_threadpool(_release_reservation, db, *reservation[0])
+            PHOTO_UPLOAD_DURATION.labels("rejected").observe(time.perf_counter() - save_started)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
         except Exception as e:
             logger.error(e, exc_info=True)
+            if reservation:
+                await run_in_threadpool(_release_reservation, db, *reservation[0])
+            PHOTO_UPLOAD_DURATION.labels("error").observe(time.perf_counter() - save_started)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save uploaded file")
+        PHOTO_UPLOAD_DURATION.labels("stored").observe(time.perf_counter() - save_started)
+        PHOTO_UPLOAD_BYTES.observe(stored.size)
+        reservation_id = reservation[0][0] if reservation else None
 
         # Attempt to update DB and commit
         try:
-            profile.profile_photo_path = new_relative
-            db.add(profile)
-            db.commit()
-            db.refresh(profile)
+            profile = await run_in_threadpool(_commit_new_photo, db, user_id, profile, stored, reservation_id)
         except Exception as e:
             logger.error(e, exc_info=True)
-            # try to cleanup newly saved file
-            try:
-                storage_files.remove_file(new_relative)
-            except Exception as e2:
-                logger.error("Failed to cleanup newly saved file after DB error", exc_info=True)
-            try:
-                db.rollback()
-            except Exception:
-                logger.error("Rollback failed after DB commit error", exc_info=True)
+            await run_in_threadpool(_rollback_new_photo, db, old_photo, stored.relative_path, reservation_id)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
 
-        # DB commit succeeded. attempt to remove old file if present and different
-        if old_photo and old_photo != profile.profile_photo_path:
-            try:
-                storage_files.remove_file(old_photo)
-            except Exception as e:
-                # Log but do not raise; orphaned files can be cleaned later
-                logger.error("Failed to remove old profile photo: %s", old_photo, exc_info=True)
-
         # Return success with updated path
         return {"profile_photo_path": profile.profile_photo_path}
 
@@ -0,0 +1,49 @@
+import logging
+from typing import Any, Type
+
+from fastapi.responses import JSONResponse, Response
+
+import nta_user_svc.config as config
+from nta_user_svc.schemas.serializers import dump_json
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # optional dependency (the "fast-json" extra)
+    orjson = None
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson, several times faster than the stdlib encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def default_response_class() -> Type[Response]:
+    """Response class for endpoints returning plain data: ORJSONResponse when
+    FAST_JSON_RESPONSES is on and orjson is installed, JSONResponse otherwise."""
+    if config.FAST_JSON_RESPONSES and orjson is not None:
+        return ORJSONResponse
+    return JSONResponse
+
+
+class SerializedJSONResponse(Response):
+    """A response whose body is JSON that has already been encoded."""
+
+    media_type = "application/json"
+
+
+def model_response(schema: Any, obj: Any, status_code: int = 200) -> Any:
+    """Return ``obj`` as a ``schema`` response.
+
+    With FAST_JSON_RESPONSES the object is validated once and encoded by the cached
+    serializer of ``schema``; the returned Response bypasses FastAPI's response_model
+    pass, which would validate and encode it a second time. The route keeps declaring
+    ``response_model`` for the OpenAPI schema. Otherwise the validated model is returned
+    and FastAPI serializes it as before.
+    """
+    if not config.FAST_JSON_RESPONSES:
+        return schema.model_validate(obj)
+    return SerializedJSONResponse(dump_json(schema, obj), status_code=status_code)
@@ -14,6 +14,8 @@ from nta_user_svc.schemas.profile import (
     ProfilePublic,
 )
 from nta_user_svc.models import User
+from nta_user_svc.routers.responses import model_response
+from nta_user_svc.tracing import traced
 
 logger = logging.getLogger(__name__)
 users_router = APIRouter()
@@ -29,6 +31,7 @@ def get_profile_service(db: Session = Depends(get_db)) -> ProfileService:
     status_code=status.HTTP_201_CREATED,
     response_model=ProfileOut,
 )
+@traced("users.create_profile")
 def create_profile(
     profile_in: ProfileCreate,
     current_user: User = Depends(get_current_user),
@@ -63,7 +66,7 @@ def create_profile(
         # Ensure email field is present on returned object for ProfileOut
         try:
             setattr(profile, "email", current_user.email)
-            return ProfileOut.model_validate(profile)
+            return model_response(ProfileOut, profile, status_code=status.HTTP_201_CREATED)
         except Exception as e:
             logger.error(e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
@@ -79,6 +82,7 @@ def create_profile(
     "/users/me/profile",
     response_model=ProfileOut,
 )
+@traced("users.get_own_profile")
 def get_own_profile(
     current_user: User = Depends(get_current_user),
     profile_service: ProfileService = Depends(get_profile_service),
@@ -96,7 +100,7 @@ def get_own_profile(
         try:
             # Ensure returned profile includes the user's email
             setattr(profile, "email", current_user.email)
-            return ProfileOut.model_validate(profile)
+            return model_response(ProfileOut, profile)
         except Exception as e:
             logger.error(e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
@@ -112,6 +116,7 @@ def get_own_profile(
     "/profiles/{user_id}",
     response_model=ProfilePublic,
 )
+@traced("users.get_public_profile")
 def get_public_profile(
     user_id: int,
     current_user: User = Depends(get_current_user),
@@ -129,7 +134,7 @@ def get_public_profile(
 
         try:
             # For public profile, do not include email. ProfilePublic excludes email by schema.
-            return ProfilePublic.model_validate(profile)
+            return model_response(ProfilePublic, profile)
         except Exception as e:
             logger.error(e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
@@ -145,6 +150,7 @@ def get_public_profile(
     "/profiles/me",
     response_model=ProfileOut,
 )
+@traced("users.update_own_profile")
 def update_own_profile(
     profile_in: ProfileUpdate,
     current_user: User = Depends(get_current_user),
@@ -169,7 +175,7 @@ def update_own_profile(
 
         try:
             setattr(updated, "email", current_user.email)
-            return ProfileOut.model_validate(updated)
+            return model_response(ProfileOut, updated)
         except Exception as e:
             logger.error(e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
@@ -185,6 +191,7 @@ def update_own_profile(
     "/profiles/me",
     status_code=status.HTTP_204_NO_CONTENT,
 )
+@traced("users.delete_own_profile")
 def delete_own_profile(
     current_user: User = Depends(get_current_user),
     profile_service: ProfileService = Depends(get_profile_service),
@@ -68,6 +68,10 @@ class ProfileOut(ProfileBase):
     user_id: int
     email: EmailStr
     profile_photo_path: Optional[str] = None
+    # Blurhash preview and dimensions of the photo, so clients can render before fetching it
+    photo_placeholder: Optional[str] = None
+    photo_width: Optional[int] = None
+    photo_height: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -78,6 +82,10 @@ class ProfilePublic(ProfileBase):
     id: int
     user_id: int
     profile_photo_path: Optional[str] = None
+    # Blurhash preview and dimensions of the photo, so clients can render before fetching it
+    photo_placeholder: Optional[str] = None
+    photo_width: Optional[int] = None
+    photo_height: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
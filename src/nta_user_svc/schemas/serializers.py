@@ -0,0 +1,24 @@
+from functools import lru_cache
+from typing import Any
+
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """Return the TypeAdapter of ``tp`` (a schema class or e.g. ``List[ProfilePublic]``).
+
+    Building an adapter compiles its validator and serializer; cached, that happens once
+    per type for the life of the process.
+    """
+    return TypeAdapter(tp)
+
+
+def dump_json(tp: Any, obj: Any) -> bytes:
+    """Validate ``obj`` (an ORM object, dict or schema instance) as ``tp`` and encode it as JSON.
+
+    A single validation pass followed by pydantic-core's JSON serializer, producing the
+    same document FastAPI's response_model path does.
+    """
+    adapter = type_adapter(tp)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
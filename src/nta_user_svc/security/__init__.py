@@ -1,5 +1,6 @@
 from .passwords import hash_password, verify_password, validate_password_strength
 from .jwt import create_access_token, verify_token, oauth2_scheme, get_current_user
+from .photo_urls import sign_photo_path, verify_photo_signature
 
 __all__ = [
     "hash_password",
@@ -9,4 +10,6 @@ __all__ = [
     "verify_token",
     "oauth2_scheme",
     "get_current_user",
+    "sign_photo_path",
+    "verify_photo_signature",
 ]
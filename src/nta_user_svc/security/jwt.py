@@ -5,6 +5,7 @@ import logging
 import jwt as pyjwt
 
 import nta_user_svc.config as config
+from nta_user_svc.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +51,7 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
         raise
 
 
+@traced("security.verify_token")
 def verify_token(token: str) -> Dict[str, Any]:
     """Verify and decode a JWT token.
 
@@ -78,6 +80,7 @@ def verify_token(token: str) -> Dict[str, Any]:
         raise
 
 
+@traced("security.get_current_user")
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     """FastAPI dependency to retrieve the current user from a JWT token.
 
@@ -1,18 +1,24 @@
 from typing import Optional
+import time
 import logging
 
-import bcrypt
-
 from nta_user_svc.config import PASSWORD_HASH_ROUNDS
+from nta_user_svc.metrics.instruments import PASSWORD_HASH_DURATION, PASSWORD_VERIFY_DURATION
+from nta_user_svc.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
+@traced("security.hash_password")
 def hash_password(plain_password: str) -> str:
     """Hash a plain-text password using bcrypt and return the hashed password string.
 
     Each call uses a unique salt generated by bcrypt.gensalt.
     """
+    # bcrypt is imported on first use to keep it out of the service's import time
+    import bcrypt
+
+    started = time.perf_counter()
     try:
         if not isinstance(plain_password, str):
             raise TypeError("Password must be a string.")
@@ -24,14 +30,20 @@ def hash_password(plain_password: str) -> str:
         logger.error(e, exc_info=True)
         # Propagate exception so callers are aware hashing failed
         raise
+    finally:
+        PASSWORD_HASH_DURATION.observe(time.perf_counter() - started)
 
 
+@traced("security.verify_password")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain-text password against a bcrypt hashed password.
 
     Returns True if the password matches the hash, False otherwise.
     In case of invalid input or internal error, returns False and logs the error.
     """
+    import bcrypt
+
+    started = time.perf_counter()
     try:
         if not isinstance(plain_password, str) or not isinstance(hashed_password, str):
             return False
@@ -39,6 +51,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     except Exception as e:
         logger.error(e, exc_info=True)
         return False
+    finally:
+        PASSWORD_VERIFY_DURATION.observe(time.perf_counter() - started)
 
 
 def validate_password_strength(password: str) -> Optional[str]:
@@ -1,4 +1,29 @@
 from .profile_photo_service import init_profile_photo_cleanup_listeners
 from .profile_service import ProfileService
+from .photo_blob_service import acquire_photo_reference, release_photo_reference, is_photo_referenced
+from .photo_outbox_service import (
+    enqueue_photo_deletion,
+    cancel_photo_deletions,
+    reserve_photo,
+    confirm_photo_reservation,
+    release_photo_reservation,
+    drain_photo_deletions,
+    start_photo_deletion_worker,
+    stop_photo_deletion_worker,
+)
 
-__all__ = ["init_profile_photo_cleanup_listeners", "ProfileService"]
+__all__ = [
+    "init_profile_photo_cleanup_listeners",
+    "ProfileService",
+    "acquire_photo_reference",
+    "release_photo_reference",
+    "is_photo_referenced",
+    "enqueue_photo_deletion",
+    "cancel_photo_deletions",
+    "reserve_photo",
+    "confirm_photo_reservation",
+    "release_photo_reservation",
+    "drain_photo_deletions",
+    "start_photo_deletion_worker",
+    "stop_photo_deletion_worker",
+]
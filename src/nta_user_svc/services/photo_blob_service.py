@@ -0,0 +1,83 @@
+import logging
+from typing import Union
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from nta_user_svc.models import PhotoBlob
+from nta_user_svc.storage.files import content_address_of
+
+logger = logging.getLogger(__name__)
+
+_blobs = PhotoBlob.__table__
+
+
+def acquire_photo_reference(db: Session, relative_path: str) -> None:
+    """Add one reference to a content-addressed photo within the caller's transaction.
+
+    Per-user (non content-addressed) paths are not reference counted and are ignored.
+    """
+    digest = content_address_of(relative_path)
+    if digest is None:
+        return
+
+    try:
+        result = db.execute(
+            update(_blobs).where(_blobs.c.sha256 == digest).values(ref_count=_blobs.c.ref_count + 1)
+        )
+        if result.rowcount:
+            return
+
+        try:
+            # SAVEPOINT so a concurrent first insert does not abort the caller's transaction
+            with db.begin_nested():
+                db.execute(insert(_blobs).values(sha256=digest, path=relative_path, ref_count=1))
+        except IntegrityError:
+            db.execute(
+                update(_blobs).where(_blobs.c.sha256 == digest).values(ref_count=_blobs.c.ref_count + 1)
+            )
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def release_photo_reference(db: Union[Session, Connection], relative_path: str) -> bool:
+    """Drop one reference to a stored photo within the caller's transaction.
+
+    Returns True when no references remain and the files may be removed. Per-user paths
+    and content-addressed paths without a row are always unreferenced. Accepts a Session
+    or, from mapper event listeners, the flush Connection.
+    """
+    digest = content_address_of(relative_path)
+    if digest is None:
+        return True
+
+    try:
+        db.execute(
+            update(_blobs)
+            .where(_blobs.c.sha256 == digest, _blobs.c.ref_count > 0)
+            .values(ref_count=_blobs.c.ref_count - 1)
+        )
+        remaining = db.execute(select(_blobs.c.ref_count).where(_blobs.c.sha256 == digest)).scalar()
+        if remaining:
+            return False
+        db.execute(delete(_blobs).where(_blobs.c.sha256 == digest, _blobs.c.ref_count <= 0))
+        return True
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def is_photo_referenced(db: Session, relative_path: str) -> bool:
+    """Return True when a content-addressed photo is still referenced by some profile."""
+    digest = content_address_of(relative_path)
+    if digest is None:
+        return False
+    try:
+        remaining = db.execute(select(_blobs.c.ref_count).where(_blobs.c.sha256 == digest)).scalar()
+        return bool(remaining)
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
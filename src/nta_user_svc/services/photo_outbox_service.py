@@ -0,0 +1,271 @@
+import logging
+import threading
+import datetime
+from typing import Optional, Union
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+import nta_user_svc.config as config
+from nta_user_svc.models import PhotoDeletion
+from nta_user_svc.services.photo_blob_service import (
+    acquire_photo_reference,
+    is_photo_referenced,
+    release_photo_reference,
+)
+
+logger = logging.getLogger(__name__)
+
+_outbox = PhotoDeletion.__table__
+
+# Session.info flag set when a transaction queued deletions, so its commit wakes the worker
+PENDING_DELETIONS_KEY = "photo_deletions_pending"
+
+# Longest wait between retries of a failing removal
+_MAX_BACKOFF_SECONDS = 300
+
+
+def _utcnow() -> datetime.datetime:
+    # naive UTC, matching the DateTime() columns
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_photo_deletion(db: Union[Session, Connection], relative_path: str, session: Optional[Session] = None) -> None:
+    """Queue removal of a stored photo's files within the caller's transaction.
+
+    Nothing touches the file system here: the files are removed by the deletion worker
+    once the transaction commits, and never if it rolls back. Accepts a Session or, from
+    mapper event listeners, the flush Connection together with its owning ``session``.
+    """
+    try:
+        db.execute(insert(_outbox).values(path=relative_path, attempts=0))
+        owner = db if isinstance(db, Session) else session
+        if owner is not None:
+            owner.info[PENDING_DELETIONS_KEY] = True
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def cancel_photo_deletions(db: Session, relative_path: str) -> int:
+    """Drop queued removals of a stored photo within the caller's transaction.
+
+    Used when identical content is uploaded again: once this commits, a drain that has
+    not yet claimed the entry leaves the files alone. Other uploads' reservations are
+    kept. Returns the number of entries dropped.
+    """
+    try:
+        return db.execute(
+            delete(_outbox).where(_outbox.c.path == relative_path, _outbox.c.releases_reference.is_(False))
+        ).rowcount
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def reserve_photo(db: Session, relative_path: str) -> int:
+    """Reserve a content-addressed photo for an upload within the caller's transaction.
+
+    Takes a reference, drops queued removals and records the reservation, due after
+    PHOTO_RESERVATION_SECONDS. Commit it before checking whether the stored file can be
+    reused. The upload's profile commit confirms the reservation; an upload that never
+    commits has the reference dropped by the drain once the reservation is due.
+    Returns the reservation id.
+    """
+    try:
+        acquire_photo_reference(db, relative_path)
+        cancel_photo_deletions(db, relative_path)
+        due = _utcnow() + datetime.timedelta(seconds=float(config.PHOTO_RESERVATION_SECONDS))
+        return db.execute(
+            insert(_outbox).values(path=relative_path, attempts=0, next_attempt_at=due, releases_reference=True)
+        ).inserted_primary_key[0]
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def confirm_photo_reservation(db: Session, reservation_id: int) -> bool:
+    """Keep a reservation's reference for good, within the caller's transaction.
+
+    Returns False when the reservation already expired and its reference was dropped;
+    the caller must then take a reference itself.
+    """
+    try:
+        return bool(
+            db.execute(
+                delete(_outbox).where(_outbox.c.id == reservation_id, _outbox.c.releases_reference.is_(True))
+            ).rowcount
+        )
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def release_photo_reservation(db: Session, reservation_id: int, relative_path: str) -> None:
+    """Give up a reservation within the caller's transaction; its photo's removal is queued
+    when that was the last reference."""
+    if not confirm_photo_reservation(db, reservation_id):
+        return
+    if release_photo_reference(db, relative_path):
+        enqueue_photo_deletion(db, relative_path)
+
+
+def _remove_photo(relative_path: str) -> None:
+    # local import: storage is only needed by whoever drains the outbox
+    from nta_user_svc.storage import files as storage_files
+
+    storage_files.remove_profile_photo(relative_path)
+
+
+def drain_photo_deletions(db: Session, batch_size: Optional[int] = None) -> int:
+    """Remove the files of every due outbox entry, one batch per transaction.
+
+    An expired upload reservation first drops its reference. Entries whose content-addressed photo was referenced again since being queued are
+    dropped without touching the files. Failed removals stay queued with an exponential
+    backoff until PHOTO_DELETION_MAX_ATTEMPTS is reached, after which they are kept for
+    inspection but no longer retried. Returns the number of photos removed.
+    """
+    batch_size = max(1, int(batch_size or config.PHOTO_DELETION_BATCH_SIZE))
+    removed = 0
+    while True:
+        now = _utcnow()
+        rows = db.execute(
+            select(_outbox.c.id, _outbox.c.path, _outbox.c.attempts, _outbox.c.releases_reference)
+            .where(
+                _outbox.c.attempts < int(config.PHOTO_DELETION_MAX_ATTEMPTS),
+                or_(_outbox.c.next_attempt_at.is_(None), _outbox.c.next_attempt_at <= now),
+            )
+            .order_by(_outbox.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            db.commit()
+            return removed
+
+        for row in rows:
+            # Claim the entry before touching the files: an upload reusing the photo drops
+            # it in its own transaction (cancel_photo_deletions), so only one side proceeds
+            savepoint = db.begin_nested()
+            if not db.execute(delete(_outbox).where(_outbox.c.id == row.id)).rowcount:
+                savepoint.commit()
+                continue
+            if row.releases_reference:
+                release_photo_reference(db, row.path)
+            if is_photo_referenced(db, row.path):
+                savepoint.commit()
+                continue
+            try:
+                _remove_photo(row.path)
+            except Exception as e:
+                savepoint.rollback()
+                attempts = row.attempts + 1
+                logger.error("Failed to remove photo %s (attempt %s)", row.path, attempts, exc_info=True)
+                db.execute(
+                    update(_outbox)
+                    .where(_outbox.c.id == row.id)
+                    .values(
+                        attempts=attempts,
+                        next_attempt_at=now + datetime.timedelta(seconds=min(2 ** attempts, _MAX_BACKOFF_SECONDS)),
+                        last_error=str(e)[:255],
+                    )
+                )
+                continue
+            savepoint.commit()
+            removed += 1
+
+        db.commit()
+
+
+class PhotoDeletionWorker:
+    """Background thread draining the deletion outbox.
+
+    It wakes when a transaction that queued deletions commits (see notify) and otherwise
+    every PHOTO_DELETION_POLL_SECONDS to pick up retries and entries left by a previous
+    process. Each database is drained through the engine its commit used.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None):
+        self._engines = set()
+        if engine is not None:
+            self._engines.add(engine)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="photo-deletion", daemon=True)
+        self._thread.start()
+
+    def notify(self, engine: Engine) -> None:
+        with self._lock:
+            self._engines.add(engine)
+        self._wakeup.set()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            # cleared before draining so a commit landing mid-drain triggers another pass
+            self._wakeup.clear()
+            with self._lock:
+                engines = list(self._engines)
+            for engine in engines:
+                try:
+                    with Session(bind=engine) as db:
+                        drain_photo_deletions(db)
+                except Exception as e:
+                    logger.error("Failed to drain photo deletion outbox", exc_info=True)
+            self._wakeup.wait(float(config.PHOTO_DELETION_POLL_SECONDS))
+
+
+_worker_lock = threading.Lock()
+_worker: Optional[PhotoDeletionWorker] = None
+
+
+def start_photo_deletion_worker(engine: Optional[Engine] = None) -> Optional[PhotoDeletionWorker]:
+    """Start the process-wide deletion worker unless disabled by PHOTO_DELETION_WORKER_ENABLED."""
+    global _worker
+    if not config.PHOTO_DELETION_WORKER_ENABLED:
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = PhotoDeletionWorker(engine)
+            _worker.start()
+        return _worker
+
+
+def stop_photo_deletion_worker() -> None:
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.stop()
+
+
+def notify_photo_deletions(engine: Engine) -> None:
+    """Wake the deletion worker for ``engine``; queued entries wait for the next poll otherwise."""
+    worker = _worker
+    if worker is not None:
+        worker.notify(engine)
+
+
+def _after_commit(session: Session) -> None:
+    if session.info.pop(PENDING_DELETIONS_KEY, False):
+        try:
+            notify_photo_deletions(session.get_bind())
+        except Exception as e:
+            logger.error("Failed to notify photo deletion worker", exc_info=True)
+
+
+def _after_rollback(session: Session) -> None:
+    # the queued rows were rolled back with the transaction
+    session.info.pop(PENDING_DELETIONS_KEY, None)
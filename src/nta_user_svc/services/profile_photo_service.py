@@ -2,6 +2,7 @@ import logging
 from typing import Callable
 
 from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 
 logger = logging.getLogger(__name__)
 
@@ -9,23 +10,32 @@ _listeners_registered = False
 
 
 def _cleanup_profile_photo_on_delete(mapper, connection, target) -> None:
-    """SQLAlchemy before_delete listener to remove profile photo file from storage.
+    """SQLAlchemy before_delete listener queueing removal of the profile photo files.
+
+    Content-addressed photos shared with other profiles only lose a reference; their
+    files are queued once no references remain. The files are removed by the deletion
+    worker after the transaction commits, so the flush does no file-system work and a
+    rolled-back delete keeps its photo.
 
     This intentionally catches and logs all exceptions to avoid interfering with the
     database deletion transaction (prioritize DB consistency).
     """
     try:
         # local import to avoid circular imports
-        from nta_user_svc.storage import files as storage_files
+        from nta_user_svc.services.photo_blob_service import release_photo_reference
+        from nta_user_svc.services.photo_outbox_service import enqueue_photo_deletion
 
         path = getattr(target, "profile_photo_path", None)
         if not path:
             return
 
+        if not release_photo_reference(connection, path):
+            return
+
         try:
-            storage_files.remove_file(path)
+            enqueue_photo_deletion(connection, path, session=object_session(target))
         except Exception as e:
-            logger.error("Failed to remove profile photo during delete: %s", path, exc_info=True)
+            logger.error("Failed to queue profile photo removal during delete: %s", path, exc_info=True)
             # swallow the exception to not block DB delete
     except Exception as e:
         logger.error("Unexpected error in cleanup listener", exc_info=True)
@@ -44,9 +54,13 @@ def init_profile_photo_cleanup_listeners() -> None:
     try:
         # local import to avoid import cycles at package import time
         from nta_user_svc.models import Profile
+        from nta_user_svc.services.photo_outbox_service import _after_commit, _after_rollback
 
         # Register the before_delete listener for Profile
         event.listen(Profile, "before_delete", _cleanup_profile_photo_on_delete)
+        # Wake the deletion worker once a transaction that queued removals commits
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
         _listeners_registered = True
     except Exception as e:
         logger.error("Failed to initialize profile photo cleanup listeners", exc_info=True)
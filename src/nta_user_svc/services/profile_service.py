@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session, selectinload
 
 from nta_user_svc.models import Profile, User
 from nta_user_svc.schemas.profile import ProfileCreate, ProfileUpdate
+from nta_user_svc.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,7 @@ class ProfileService:
     def __init__(self, db: Session) -> None:
         self.db = db
 
+    @traced("ProfileService.get_profile_by_user_id")
     def get_profile_by_user_id(self, user_id: int) -> Optional[Profile]:
         try:
             stmt = (
@@ -36,6 +38,7 @@ class ProfileService:
             logger.error(e, exc_info=True)
             raise
 
+    @traced("ProfileService.create_profile")
     def create_profile(self, user_id: int, profile_in: ProfileCreate) -> Profile:
         try:
             user = self.db.get(User, user_id)
@@ -63,6 +66,7 @@ class ProfileService:
             logger.error(e, exc_info=True)
             raise
 
+    @traced("ProfileService.update_profile")
     def update_profile(self, profile: Profile, profile_update: ProfileUpdate) -> Profile:
         try:
             data = profile_update.model_dump(exclude_none=True)
@@ -80,6 +84,7 @@ class ProfileService:
             logger.error(e, exc_info=True)
             raise
 
+    @traced("ProfileService.delete_profile")
     def delete_profile(self, profile: Profile) -> None:
         try:
             self.db.delete(profile)
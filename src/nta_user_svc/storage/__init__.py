@@ -1,3 +1,3 @@
-from .files import save_profile_photo, remove_file, get_full_file_path
+from .files import save_profile_photo, remove_file, remove_profile_photo, get_full_file_path
 
-__all__ = ["save_profile_photo", "remove_file", "get_full_file_path"]
+__all__ = ["save_profile_photo", "remove_file", "remove_profile_photo", "get_full_file_path"]
@@ -0,0 +1,74 @@
+import logging
+import threading
+from typing import Optional
+
+import nta_user_svc.config as config
+from nta_user_svc.storage.backends.base import ObjectStat, StorageBackend
+from nta_user_svc.storage.backends.local import LocalStorageBackend
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_backend: Optional[StorageBackend] = None
+
+
+def create_storage_backend() -> StorageBackend:
+    """Build the backend selected by PHOTO_STORAGE_BACKEND."""
+    if config.PHOTO_STORAGE_BACKEND == "s3":
+        from nta_user_svc.storage.backends.s3 import S3StorageBackend
+
+        return S3StorageBackend(
+            endpoint_url=config.S3_ENDPOINT_URL,
+            bucket=config.S3_BUCKET,
+            access_key_id=config.S3_ACCESS_KEY_ID,
+            secret_access_key=config.S3_SECRET_ACCESS_KEY,
+            region=config.S3_REGION,
+            key_prefix=config.S3_KEY_PREFIX,
+            max_connections=config.S3_MAX_CONNECTIONS,
+            multipart_threshold=config.S3_MULTIPART_THRESHOLD,
+            part_size=config.S3_MULTIPART_PART_SIZE,
+            upload_concurrency=config.S3_UPLOAD_CONCURRENCY,
+            timeout=config.S3_TIMEOUT,
+        )
+    return LocalStorageBackend()
+
+
+def get_storage_backend() -> StorageBackend:
+    """Return the process-wide photo storage backend, creating it on first use."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = create_storage_backend()
+        return _backend
+
+
+def close_storage_backend() -> None:
+    """Close the backend's pooled connections; it is recreated lazily on next use."""
+    global _backend
+    with _lock:
+        if _backend is not None:
+            try:
+                _backend.close()
+            except Exception:
+                logger.error("Failed to close photo storage backend", exc_info=True)
+        _backend = None
+
+
+def __getattr__(name: str):
+    # the S3 client (http.client, xml parsing, SigV4) is only imported when it is used
+    if name == "S3StorageBackend":
+        from nta_user_svc.storage.backends.s3 import S3StorageBackend
+
+        return S3StorageBackend
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    "ObjectStat",
+    "StorageBackend",
+    "LocalStorageBackend",
+    "S3StorageBackend",
+    "create_storage_backend",
+    "get_storage_backend",
+    "close_storage_backend",
+]
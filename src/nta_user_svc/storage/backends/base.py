@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Union
+
+
+class ObjectStat(NamedTuple):
+    size: int
+    mtime: float  # seconds since the epoch
+    content_type: Optional[str] = None
+
+
+class StorageBackend(ABC):
+    """Where stored profile photos live, addressed by their relative path ("key").
+
+    Missing objects raise FileNotFoundError from get/stream/stat; delete of a missing
+    object is not an error. Implementations must be safe to use from several threads.
+    """
+
+    #: True when keys map onto files under PROFILE_PHOTO_DIR, which enables features that
+    #: need a local path (size variants, transcoded alternates, proxy offload, sendfile).
+    is_local: bool = False
+
+    @abstractmethod
+    def put(self, key: str, data: Union[bytes, BinaryIO], content_type: Optional[str] = None) -> None:
+        """Store ``data`` (bytes or a readable binary file object) under ``key``."""
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> None:
+        """Store the contents of the local file at ``path`` under ``key``."""
+        with open(path, "rb") as f:
+            self.put(key, f, content_type)
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Return the whole object."""
+
+    @abstractmethod
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the object in chunks of at most ``chunk_size`` bytes."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the object; missing objects are ignored."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Return True when the object exists."""
+
+    @abstractmethod
+    def stat(self, key: str) -> ObjectStat:
+        """Return size, modification time and (when known) content type of the object."""
+
+    def close(self) -> None:
+        """Release pooled resources; the backend may be used again afterwards."""
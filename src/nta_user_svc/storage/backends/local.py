@@ -0,0 +1,72 @@
+import os
+import uuid
+import shutil
+import logging
+from typing import BinaryIO, Iterator, Optional, Union
+
+from nta_user_svc.storage.backends.base import ObjectStat, StorageBackend
+from nta_user_svc.storage.files import get_full_file_path, remove_file
+
+logger = logging.getLogger(__name__)
+
+
+class LocalStorageBackend(StorageBackend):
+    """Objects are files under PROFILE_PHOTO_DIR; keys are paths relative to it."""
+
+    is_local = True
+
+    def put(self, key: str, data: Union[bytes, BinaryIO], content_type: Optional[str] = None) -> None:
+        dest = get_full_file_path(key)
+        try:
+            dest.parent.mkdir(mode=0o700, parents=True)
+        except FileExistsError:
+            pass
+        tmp_path = dest.with_name(f"{dest.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    f.write(data)
+                else:
+                    shutil.copyfileobj(data, f, 64 * 1024)
+            os.replace(tmp_path, dest)
+        except Exception:
+            try:
+                tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+            raise
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> None:
+        if os.path.realpath(path) == str(get_full_file_path(key)):
+            return
+        super().put_file(key, path, content_type)
+
+    def get(self, key: str) -> bytes:
+        return get_full_file_path(key).read_bytes()
+
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        # opened eagerly so a missing file raises before the first chunk is requested
+        f = open(get_full_file_path(key), "rb")
+
+        def _chunks() -> Iterator[bytes]:
+            with f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        return _chunks()
+
+    def delete(self, key: str) -> None:
+        remove_file(key)
+
+    def exists(self, key: str) -> bool:
+        try:
+            return get_full_file_path(key).is_file()
+        except ValueError:
+            return False
+
+    def stat(self, key: str) -> ObjectStat:
+        st = os.stat(get_full_file_path(key))
+        return ObjectStat(size=st.st_size, mtime=st.st_mtime)
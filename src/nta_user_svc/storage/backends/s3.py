@@ -0,0 +1,351 @@
+import os
+import hmac
+import queue
+import hashlib
+import logging
+import datetime
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+
+from nta_user_svc.storage.backends.base import ObjectStat, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+# Errors after which a pooled keep-alive connection is assumed stale and the request retried once
+_RETRYABLE = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class _ConnectionPool:
+    """Bounded pool of keep-alive HTTP(S) connections to one endpoint.
+
+    At most ``maxsize`` connections exist at a time; acquire() blocks while all are in use.
+    """
+
+    def __init__(self, scheme: str, host: str, port: Optional[int], maxsize: int, timeout: float):
+        self._cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, maxsize))
+
+    def acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return a connection and whether it was reused from the pool."""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        try:
+            return self._cls(self._host, self._port, timeout=self._timeout), False
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: http.client.HTTPConnection, reuse: bool = True) -> None:
+        if reuse:
+            self._idle.put(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _ResponseStream:
+    """Iterator over a response body that holds its pooled connection until exhausted or closed.
+
+    Unlike a generator's ``finally``, close() also releases the connection when no chunk
+    was ever requested, e.g. when the client disconnected before a StreamingResponse
+    started iterating. Dropping the last reference closes it too.
+    """
+
+    def __init__(self, pool: _ConnectionPool, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse, chunk_size: int):
+        self._pool = pool
+        self._conn: Optional[http.client.HTTPConnection] = conn
+        self._resp = resp
+        self._chunk_size = chunk_size
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> "_ResponseStream":
+        return self
+
+    def __next__(self) -> bytes:
+        if self._conn is None:
+            raise StopIteration
+        try:
+            chunk = self._resp.read(self._chunk_size)
+        except Exception:
+            self._release(reuse=False)
+            raise
+        if not chunk:
+            self._release(reuse=not self._resp.will_close)
+            raise StopIteration
+        return chunk
+
+    def close(self) -> None:
+        # a partially read response cannot be reused for the next request
+        self._release(reuse=False)
+
+    def __del__(self) -> None:
+        self.close()
+
+    def _release(self, reuse: bool) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, reuse=reuse)
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+class S3StorageBackend(StorageBackend):
+    """S3-compatible object store over plain HTTP(S) with AWS Signature Version 4.
+
+    Requests use path-style addressing (``{endpoint}/{bucket}/{key}``), which every
+    S3-compatible server supports. Connections are kept alive in a bounded pool shared by
+    all threads. Files larger than ``multipart_threshold`` are uploaded as a multipart
+    upload whose parts are sent concurrently, ``upload_concurrency`` at a time.
+    """
+
+    is_local = False
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key_id: str,
+        secret_access_key: str,
+        region: str = "us-east-1",
+        key_prefix: str = "",
+        max_connections: int = 10,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        part_size: int = 8 * 1024 * 1024,
+        upload_concurrency: int = 4,
+        timeout: float = 10.0,
+    ):
+        parts = urlsplit(endpoint_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("invalid object store endpoint URL")
+        if not bucket:
+            raise ValueError("object store bucket must be set")
+        self._host_header = parts.netloc
+        self._base_path = parts.path.rstrip("/")
+        self._bucket = bucket
+        self._access_key_id = access_key_id
+        self._secret_access_key = secret_access_key
+        self._region = region
+        self._key_prefix = key_prefix.strip("/") + "/" if key_prefix.strip("/") else ""
+        self._multipart_threshold = max(1, int(multipart_threshold))
+        self._part_size = max(1, int(part_size))
+        self._upload_concurrency = max(1, int(upload_concurrency))
+        self._pool = _ConnectionPool(parts.scheme, parts.hostname, parts.port, max_connections, timeout)
+
+    # -- request plumbing -------------------------------------------------
+
+    def _object_path(self, key: str) -> str:
+        return f"{self._base_path}/{_uri_encode(self._bucket)}/{_uri_encode(self._key_prefix + key, safe='-_.~/')}"
+
+    def _sign(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str], payload_hash: str) -> None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        headers["Host"] = self._host_header
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = payload_hash
+
+        signed = sorted(name.lower() for name in headers)
+        lowered = {name.lower(): str(value).strip() for name, value in headers.items()}
+        canonical_headers = "".join(f"{name}:{lowered[name]}\n" for name in signed)
+        signed_headers = ";".join(signed)
+        canonical_query = "&".join(
+            f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items())
+        )
+        canonical_request = "\n".join(
+            [method, path, canonical_query, canonical_headers, signed_headers, payload_hash]
+        )
+        scope = f"{date}/{self._region}/s3/aws4_request"
+        string_to_sign = "\n".join(
+            ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()]
+        )
+        key = ("AWS4" + self._secret_access_key).encode()
+        for part in (date, self._region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key_id}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+
+    def _open(
+        self,
+        method: str,
+        key: str,
+        query: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        body: bytes = b"",
+    ) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a signed request and return the pooled connection with its unread response."""
+        query = query or {}
+        path = self._object_path(key)
+        url = path + ("?" + "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items())) if query else "")
+        payload_hash = hashlib.sha256(body).hexdigest() if body else _EMPTY_SHA256
+
+        for attempt in (1, 2):
+            request_headers = dict(headers or {})
+            request_headers["Content-Length"] = str(len(body))
+            self._sign(method, path, query, request_headers, payload_hash)
+            conn, reused = self._pool.acquire()
+            try:
+                conn.request(method, url, body=body, headers=request_headers)
+                return conn, conn.getresponse()
+            except _RETRYABLE:
+                self._pool.release(conn, reuse=False)
+                if not reused or attempt == 2:
+                    raise
+            except Exception:
+                self._pool.release(conn, reuse=False)
+                raise
+        raise OSError("object store request failed")  # pragma: no cover
+
+    def _request(self, method: str, key: str, **kwargs) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        conn, resp = self._open(method, key, **kwargs)
+        try:
+            data = resp.read()
+        except Exception:
+            self._pool.release(conn, reuse=False)
+            raise
+        self._pool.release(conn, reuse=not resp.will_close)
+        return resp.status, resp.headers, data
+
+    @staticmethod
+    def _raise_for_status(status: int, key: str) -> None:
+        if status == 404:
+            raise FileNotFoundError(key)
+        if status >= 300:
+            raise OSError(f"object store request failed with status {status}")
+
+    # -- StorageBackend ---------------------------------------------------
+
+    def put(self, key: str, data: Union[bytes, BinaryIO], content_type: Optional[str] = None) -> None:
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = data.read()
+        headers = {"Content-Type": content_type} if content_type else {}
+        status, _, _ = self._request("PUT", key, headers=headers, body=bytes(data))
+        self._raise_for_status(status, key)
+
+    def put_file(self, key: str, path: str, content_type: Optional[str] = None) -> None:
+        size = os.path.getsize(path)
+        if size <= self._multipart_threshold:
+            super().put_file(key, path, content_type)
+            return
+        self._multipart_upload(key, path, size, content_type)
+
+    def _multipart_upload(self, key: str, path: str, size: int, content_type: Optional[str]) -> None:
+        headers = {"Content-Type": content_type} if content_type else {}
+        status, _, data = self._request("POST", key, query={"uploads": ""}, headers=headers)
+        self._raise_for_status(status, key)
+        upload_id = _xml_text(data, "UploadId")
+        if not upload_id:
+            raise OSError("object store returned no multipart upload id")
+
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            def _upload_part(number: int) -> Tuple[int, str]:
+                offset = (number - 1) * self._part_size
+                chunk = os.pread(fd, min(self._part_size, size - offset), offset)
+                part_status, part_headers, _ = self._request(
+                    "PUT", key, query={"partNumber": str(number), "uploadId": upload_id}, body=chunk
+                )
+                self._raise_for_status(part_status, key)
+                return number, part_headers.get("ETag", "")
+
+            part_count = (size + self._part_size - 1) // self._part_size
+            with ThreadPoolExecutor(max_workers=min(self._upload_concurrency, part_count)) as executor:
+                etags: List[Tuple[int, str]] = list(executor.map(_upload_part, range(1, part_count + 1)))
+
+            body = "<CompleteMultipartUpload>" + "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in etags
+            ) + "</CompleteMultipartUpload>"
+            status, _, data = self._request("POST", key, query={"uploadId": upload_id}, body=body.encode())
+            # S3 can report a failed completion with a 200 status and an <Error> body
+            if status >= 300 or b"<Error>" in data:
+                raise OSError(f"object store multipart completion failed with status {status}")
+        except Exception:
+            try:
+                self._request("DELETE", key, query={"uploadId": upload_id})
+            except Exception:
+                logger.error("Failed to abort multipart upload of %s", key, exc_info=True)
+            raise
+        finally:
+            os.close(fd)
+
+    def get(self, key: str) -> bytes:
+        status, _, data = self._request("GET", key)
+        self._raise_for_status(status, key)
+        return data
+
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        conn, resp = self._open("GET", key)
+        if resp.status >= 300:
+            try:
+                resp.read()
+                self._pool.release(conn, reuse=not resp.will_close)
+            except Exception:
+                self._pool.release(conn, reuse=False)
+            self._raise_for_status(resp.status, key)
+
+        return _ResponseStream(self._pool, conn, resp, chunk_size)
+
+    def delete(self, key: str) -> None:
+        status, _, _ = self._request("DELETE", key)
+        if status != 404:
+            self._raise_for_status(status, key)
+
+    def exists(self, key: str) -> bool:
+        status, _, _ = self._request("HEAD", key)
+        if status == 404:
+            return False
+        self._raise_for_status(status, key)
+        return True
+
+    def stat(self, key: str) -> ObjectStat:
+        status, headers, _ = self._request("HEAD", key)
+        self._raise_for_status(status, key)
+        try:
+            mtime = parsedate_to_datetime(headers["Last-Modified"]).timestamp()
+        except Exception:
+            mtime = 0.0
+        return ObjectStat(
+            size=int(headers.get("Content-Length", 0)),
+            mtime=mtime,
+            content_type=headers.get("Content-Type"),
+        )
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+def _xml_text(data: bytes, tag: str) -> Optional[str]:
+    """Return the text of the first element named ``tag`` in an S3 XML response."""
+    try:
+        root = ElementTree.fromstring(data)
+    except ElementTree.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag == tag or element.tag.endswith("}" + tag):
+            return element.text
+    return None
@@ -0,0 +1,233 @@
+import os
+import logging
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+# ASGI extension that lets the server hand a file descriptor to os.sendfile()
+# https://asgi.readthedocs.io/en/latest/extensions.html#zero-copy-send
+_ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+OFFLOAD_X_ACCEL_REDIRECT = "x-accel-redirect"
+OFFLOAD_X_SENDFILE = "x-sendfile"
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header cannot be satisfied for the given file size."""
+
+
+def parse_range_header(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range: bytes=...`` header.
+
+    Returns an inclusive ``(start, end)`` tuple, or None when the header is absent,
+    malformed, or asks for multiple ranges (the full body is a valid answer to those).
+    Raises RangeNotSatisfiable when the range lies entirely outside the file.
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec or "," in spec:
+        return None
+
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        first_pos = int(first) if first.strip() else None
+        last_pos = int(last) if last.strip() else None
+    except ValueError:
+        return None
+
+    if first_pos is None:
+        # suffix range: the last N bytes
+        if last_pos is None:
+            return None
+        if last_pos <= 0:
+            raise RangeNotSatisfiable("empty suffix range")
+        start = max(file_size - last_pos, 0)
+        end = file_size - 1
+    else:
+        start = first_pos
+        if last_pos is not None and last_pos < start:
+            return None
+        if start >= file_size:
+            raise RangeNotSatisfiable(f"range start {start} beyond size {file_size}")
+        end = file_size - 1 if last_pos is None else min(last_pos, file_size - 1)
+
+    if file_size == 0:
+        raise RangeNotSatisfiable("empty file")
+    return start, end
+
+
+class PhotoFileResponse(Response):
+    """File response with single-range support that avoids copying bytes through Python.
+
+    When the ASGI server advertises the ``http.response.zerocopysend`` extension the
+    open file descriptor is handed to the server, which transmits it with os.sendfile().
+    Otherwise the file is read with os.pread() in a worker thread in fixed-size chunks.
+
+    Either ``stat_result`` or ``size`` must be given. With ``size`` (known from the
+    Profile row) no stat is needed and Last-Modified is omitted; ``fd`` passes a file
+    descriptor the caller already opened, which the response then owns and closes.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: os.PathLike,
+        stat_result: Optional[os.stat_result] = None,
+        media_type: str = "application/octet-stream",
+        headers: Optional[Mapping[str, str]] = None,
+        range_header: Optional[str] = None,
+        size: Optional[int] = None,
+        fd: Optional[int] = None,
+    ) -> None:
+        if stat_result is None and size is None:
+            raise ValueError("stat_result or size is required")
+        self.path = str(path)
+        self.media_type = media_type
+        self.background = None
+        self.stat_result = stat_result
+        self.fd = fd
+        self.status_code = 200
+        self.init_headers(headers)
+        self.headers.setdefault("accept-ranges", "bytes")
+        if stat_result is not None:
+            self.headers.setdefault("last-modified", formatdate(stat_result.st_mtime, usegmt=True))
+            size = stat_result.st_size
+        self.start, self.end = 0, size - 1
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            self.start, self.end = 0, -1
+            return
+
+        if byte_range is not None:
+            self.start, self.end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {self.start}-{self.end}/{size}"
+        self.headers["content-length"] = str(self.end - self.start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        fd, self.fd = self.fd, None
+        count = self.end - self.start + 1
+        if count <= 0 or scope.get("method", "GET").upper() == "HEAD":
+            if fd is not None:
+                os.close(fd)
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if fd is None:
+            fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if _ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": _ZEROCOPY_EXTENSION,
+                        "file": fd,
+                        "offset": self.start,
+                        "count": count,
+                        "more_body": False,
+                    }
+                )
+                return
+
+            offset = self.start
+            remaining = count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(os.pread, fd, min(self.chunk_size, remaining), offset)
+                if not chunk:
+                    # file truncated underneath us; end the body rather than hang
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+
+def build_memory_response(
+    data: bytes,
+    media_type: str,
+    mtime: Optional[float],
+    headers: Optional[Mapping[str, str]] = None,
+    range_header: Optional[str] = None,
+) -> Response:
+    """Serve photo bytes already held in memory, with the same Range handling as PhotoFileResponse.
+
+    Last-Modified is omitted when ``mtime`` is unknown.
+    """
+    out = dict(headers or {})
+    out.setdefault("accept-ranges", "bytes")
+    if mtime is not None:
+        out.setdefault("last-modified", formatdate(mtime, usegmt=True))
+    size = len(data)
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except RangeNotSatisfiable:
+        out["content-range"] = f"bytes */{size}"
+        return Response(status_code=416, media_type=media_type, headers=out)
+    if byte_range is None:
+        return Response(content=data, media_type=media_type, headers=out)
+    start, end = byte_range
+    out["content-range"] = f"bytes {start}-{end}/{size}"
+    return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=out)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag`` (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def build_offload_response(relative_path: str, full_path: Path, media_type: str, headers: Dict[str, str]) -> Response:
+    """Return an empty response instructing the fronting proxy to serve the file.
+
+    ``x-accel-redirect`` (nginx) points at an internal location under PHOTO_OFFLOAD_PREFIX
+    that maps onto PROFILE_PHOTO_DIR; ``x-sendfile`` (Apache/lighttpd) carries the absolute path.
+    Both are derived from ``full_path``, which follows a file the layout migration moved
+    before its stored ``relative_path`` was rewritten.
+    """
+    mode = config.PHOTO_OFFLOAD_MODE
+    out = dict(headers)
+    if mode == OFFLOAD_X_ACCEL_REDIRECT:
+        prefix = config.PHOTO_OFFLOAD_PREFIX.rstrip("/")
+        try:
+            served = full_path.relative_to(Path(config.PROFILE_PHOTO_DIR).expanduser().resolve()).as_posix()
+        except ValueError:
+            served = relative_path.lstrip("/")
+        out["X-Accel-Redirect"] = f"{prefix}/{quote(served)}"
+    elif mode == OFFLOAD_X_SENDFILE:
+        out["X-Sendfile"] = str(full_path)
+    else:
+        raise ValueError(f"unsupported photo offload mode: {mode}")
+    return Response(status_code=200, media_type=media_type, headers=out)
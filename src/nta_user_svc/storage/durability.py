@@ -0,0 +1,137 @@
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_NONE = "none"
+DURABILITY_PER_FILE = "per-file"
+DURABILITY_GROUPED = "grouped"
+
+
+def fsync_path(path: Path) -> None:
+    """fsync a file or directory by path."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dirs(directories: Iterable[Path]) -> None:
+    for directory in directories:
+        try:
+            fsync_path(directory)
+        except OSError as e:
+            # some platforms/filesystems refuse fsync on directories; the rename is still atomic
+            logger.debug("Directory fsync failed for %s: %s", directory, e)
+
+
+class _Publish:
+    __slots__ = ("tmp_path", "dest_path", "dirs", "error")
+
+    def __init__(self, tmp_path: Path, dest_path: Path, dirs: List[Path]):
+        self.tmp_path = tmp_path
+        self.dest_path = dest_path
+        self.dirs = dirs
+        self.error: Optional[BaseException] = None
+
+
+class _Group:
+    def __init__(self):
+        self.entries: List[_Publish] = []
+        self.done = threading.Event()
+
+
+class GroupCommitter:
+    """Batches the directory fsyncs of concurrent photo publishes.
+
+    Each publisher fsyncs its own file data first, in parallel with the others. The first
+    one to finish becomes the group leader and waits ``window`` seconds for others to
+    join; it then renames every file of the group into place and fsyncs each distinct
+    directory once before releasing all members. Every member observes the same ordering
+    as a per-file publish (data, rename, directory), while the renames of a burst share
+    one round of directory flushes.
+    """
+
+    def __init__(self, window: float):
+        self._window = max(0.0, window)
+        self._lock = threading.Lock()
+        self._open: Optional[_Group] = None
+
+    def publish(self, tmp_path: Path, dest_path: Path, dirs: List[Path]) -> None:
+        fsync_path(tmp_path)
+        entry = _Publish(tmp_path, dest_path, dirs)
+        with self._lock:
+            group = self._open
+            leader = group is None
+            if leader:
+                group = self._open = _Group()
+            group.entries.append(entry)
+
+        if leader:
+            if self._window:
+                time.sleep(self._window)
+            with self._lock:
+                self._open = None
+            self._commit(group)
+        else:
+            group.done.wait()
+
+        if entry.error is not None:
+            raise entry.error
+
+    @staticmethod
+    def _commit(group: _Group) -> None:
+        try:
+            for entry in group.entries:
+                try:
+                    os.replace(entry.tmp_path, entry.dest_path)
+                except BaseException as e:
+                    entry.error = e
+            directories = {d for entry in group.entries if entry.error is None for d in entry.dirs}
+            _fsync_dirs(sorted(directories))
+        finally:
+            group.done.set()
+
+
+_committer_lock = threading.Lock()
+_committer: Optional[GroupCommitter] = None
+
+
+def _get_committer() -> GroupCommitter:
+    global _committer
+    with _committer_lock:
+        if _committer is None:
+            _committer = GroupCommitter(float(config.PHOTO_DURABILITY_GROUP_WINDOW_MS) / 1000.0)
+        return _committer
+
+
+def durable_replace(tmp_path: Path, dest_path: Path, dirs: Optional[List[Path]] = None) -> None:
+    """Atomically move ``tmp_path`` to ``dest_path`` with the PHOTO_DURABILITY guarantees.
+
+    - none:     rename only; a crash may lose or truncate recently written photos.
+    - per-file: fsync the file, rename, fsync the destination directory (and ``dirs``).
+    - grouped:  the same steps, batched with concurrent publishes (see GroupCommitter).
+
+    ``dirs`` lists further directories whose entries changed, e.g. parents of newly
+    created directories.
+    """
+    mode = config.PHOTO_DURABILITY
+    if mode == DURABILITY_NONE:
+        os.replace(tmp_path, dest_path)
+        return
+
+    directories = [dest_path.parent] + [d for d in (dirs or []) if d != dest_path.parent]
+    if mode == DURABILITY_GROUPED:
+        _get_committer().publish(tmp_path, dest_path, directories)
+        return
+
+    fsync_path(tmp_path)
+    os.replace(tmp_path, dest_path)
+    _fsync_dirs(directories)
@@ -0,0 +1,80 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_lock = threading.RLock()
+_cpu_executor: Optional[Executor] = None
+_io_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_cpu_executor() -> Executor:
+    """Return the bounded pool used for image decoding/verification.
+
+    A process pool of PHOTO_VERIFY_WORKERS processes keeps Pillow's CPU work off the GIL of
+    the serving process. PHOTO_VERIFY_WORKERS=0 falls back to the I/O thread pool, for
+    platforms where worker processes are undesirable.
+    """
+    global _cpu_executor
+    with _lock:
+        if _cpu_executor is None:
+            workers = int(config.PHOTO_VERIFY_WORKERS)
+            if workers <= 0:
+                return get_io_executor()
+            # spawn: the serving process is multi-threaded, which makes fork unsafe
+            _cpu_executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _cpu_executor
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool dedicated to photo file writes and fsync."""
+    global _io_executor
+    with _lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(
+                max_workers=max(1, int(config.PHOTO_IO_WORKERS)), thread_name_prefix="photo-io"
+            )
+        return _io_executor
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any) -> T:
+    """Run a picklable module-level function in the verification pool."""
+    return await asyncio.wrap_future(get_cpu_executor().submit(func, *args))
+
+
+async def run_io_bound(func: Callable[..., T], *args: Any) -> T:
+    """Run a blocking file-system function in the photo I/O pool.
+
+    The caller's context variables (the current trace span) are visible to ``func``, as
+    with asyncio.to_thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_io_executor(), partial(context.run, func, *args))
+
+
+def shutdown_executors() -> None:
+    """Shut down both pools; they are recreated lazily on next use."""
+    global _cpu_executor, _io_executor
+    with _lock:
+        for executor in (_cpu_executor, _io_executor):
+            if executor is None:
+                continue
+            try:
+                executor.shutdown(wait=True, cancel_futures=True)
+            except Exception:
+                logger.error("Failed to shut down photo executor", exc_info=True)
+        _cpu_executor = None
+        _io_executor = None
@@ -1,14 +1,21 @@
-import io
 import os
+import re
+import asyncio
 import uuid
+import hashlib
 import logging
+import mimetypes
 from pathlib import Path
-from typing import Union
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple, Union
 
 from fastapi import UploadFile
-from PIL import Image, UnidentifiedImageError
 
 import nta_user_svc.config as config
+from nta_user_svc.storage.durability import durable_replace
+from nta_user_svc.storage.image_header import ImageHeader, check_image_limits, inspect_image_file
+from nta_user_svc.storage.photo_cache import invalidate_photo
+from nta_user_svc.storage.placeholder import compute_placeholder
+from nta_user_svc.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +26,83 @@ _PIL_FORMAT_MAP = {
     "PNG": ".png",
     "WEBP": ".webp",
 }
+_EXTENSION_MIME = {
+    ".jpg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+# Extensions a stored original can have
+PHOTO_EXTENSIONS = tuple(_EXTENSION_MIME)
+
+_CHUNK_SIZE = 64 * 1024
+# Uploads are spooled here before validation completes, then moved into place
+_INCOMING_DIR = ".incoming"
+
+# Content-addressed originals: "sha256/ab/cd/abcd...{ext}"
+_CONTENT_ADDRESS_PREFIX = "sha256"
+_CONTENT_ADDRESS_RE = re.compile(r"^sha256/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[a-z]+$")
+
+
+# Per-user directory layouts. The layout of a stored path is recorded in its shape:
+#   LAYOUT_FLAT:    "{user_id}/{name}"
+#   LAYOUT_SHARDED: "ab/cd/{user_id}/{name}", ab/cd taken from sha256(user_id)
+LAYOUT_FLAT = 1
+LAYOUT_SHARDED = 2
+_FLAT_PATH_RE = re.compile(r"^(\d+)/([^/]+)$")
+_SHARDED_PATH_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/(\d+)/([^/]+)$")
+
+
+class StoredPhoto(NamedTuple):
+    """A stored profile photo and the metadata recorded on its Profile row."""
+
+    relative_path: str
+    width: int
+    height: int
+    size: int  # bytes
+    mime_type: str
+    content_hash: str  # SHA-256 hex digest of the file contents
+    placeholder: Optional[str] = None  # blurhash, when PHOTO_PLACEHOLDER_ENABLED
+
+
+def user_photo_dir(user_id: int, layout: Optional[int] = None) -> str:
+    """Return the relative directory holding a user's photos in the given (or configured) layout."""
+    user = str(int(user_id))
+    if (layout or config.PHOTO_STORAGE_LAYOUT) == LAYOUT_SHARDED:
+        shard = hashlib.sha256(user.encode("ascii")).hexdigest()
+        return f"{shard[:2]}/{shard[2:4]}/{user}"
+    return user
+
+
+def photo_layout_of(relative_filepath: Optional[str]) -> Optional[int]:
+    """Return LAYOUT_FLAT or LAYOUT_SHARDED for a per-user path, None for anything else."""
+    if not relative_filepath:
+        return None
+    if _FLAT_PATH_RE.match(relative_filepath):
+        return LAYOUT_FLAT
+    if _SHARDED_PATH_RE.match(relative_filepath):
+        return LAYOUT_SHARDED
+    return None
+
+
+def sharded_relative_path(relative_filepath: str) -> str:
+    """Map a flat-layout path ("{user_id}/{name}") onto its sharded-layout location."""
+    match = _FLAT_PATH_RE.match(relative_filepath)
+    if not match:
+        raise ValueError("not a flat-layout photo path")
+    return f"{user_photo_dir(int(match.group(1)), LAYOUT_SHARDED)}/{match.group(2)}"
+
+
+def content_addressed_path(digest: str, ext: str) -> str:
+    """Return the relative path under which content with SHA-256 ``digest`` is stored."""
+    return f"{_CONTENT_ADDRESS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def content_address_of(relative_filepath: Optional[str]) -> Optional[str]:
+    """Return the SHA-256 digest of a content-addressed path, or None for per-user paths."""
+    if not relative_filepath:
+        return None
+    match = _CONTENT_ADDRESS_RE.match(relative_filepath)
+    return match.group(1) if match else None
 
 
 def _ensure_base_dir() -> Path:
@@ -31,147 +115,549 @@ def _ensure_base_dir() -> Path:
         raise
 
 
-def save_profile_photo(file_stream: UploadFile, user_id: int) -> str:
-    """
-    Save an uploaded profile photo and return its relative path ("{user_id}/{uuid}.{ext}").
-    Performs extension, MIME and content verification and enforces size limit.
+def sniff_image_extension(header: bytes) -> Optional[str]:
+    """Return the extension matching an image signature (JPEG, PNG, WEBP), or None."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if len(header) >= 12 and header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _ensure_incoming_dir(base: Path) -> Path:
+    # Temp files live on the same filesystem as their destination so os.replace is atomic
+    incoming = base / _INCOMING_DIR
+    try:
+        incoming.mkdir(mode=0o700, exist_ok=True)
+        return incoming
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise OSError("failed to create upload directory")
+
+
+def _stream_to_file(file_obj, first_chunk: bytes, tmp_path: Path, max_bytes: int) -> Tuple[str, int]:
+    """Copy an upload to ``tmp_path`` chunk by chunk; return its SHA-256 hex digest and size.
+
+    The size limit is enforced while copying, so oversize uploads stop after at most
+    ``max_bytes`` + one chunk has been read.
     """
+    sha = hashlib.sha256()
+    written = 0
     try:
-        if file_stream is None:
-            raise ValueError("no file provided")
+        with open(tmp_path, "wb") as f:
+            chunk = first_chunk
+            while chunk:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ValueError("file too large")
+                sha.update(chunk)
+                f.write(chunk)
+                chunk = file_obj.read(_CHUNK_SIZE)
+            # fsync (if any) is left to durable_replace, according to PHOTO_DURABILITY
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise OSError("failed to write file to disk")
+    return sha.hexdigest(), written
 
-        # Validate filename and extension
-        filename = getattr(file_stream, "filename", None)
-        if not filename:
-            raise ValueError("uploaded file must have a filename")
 
-        ext = Path(filename).suffix.lower()
-        if ext == ".jpeg":
-            ext = ".jpg"
+def _validate_upload(file_stream: UploadFile) -> Tuple[str, Any]:
+    """Check filename, extension and declared MIME type; return (ext, file object)."""
+    if file_stream is None:
+        raise ValueError("no file provided")
 
-        if ext not in _ALLOWED_EXTENSIONS:
-            raise ValueError(f"unsupported file extension: {ext}")
+    # Validate filename and extension
+    filename = getattr(file_stream, "filename", None)
+    if not filename:
+        raise ValueError("uploaded file must have a filename")
 
-        # Validate content type
-        content_type = getattr(file_stream, "content_type", "")
-        if content_type not in _ALLOWED_MIME:
-            raise ValueError(f"unsupported content type: {content_type}")
+    ext = Path(filename).suffix.lower()
+    if ext == ".jpeg":
+        ext = ".jpg"
 
-        # Read at most MAX + 1 bytes to detect oversize
-        max_bytes = int(config.MAX_PHOTO_SIZE_BYTES)
-        file_obj = getattr(file_stream, "file", None)
-        if file_obj is None:
-            raise ValueError("uploaded file object is missing")
+    if ext not in _ALLOWED_EXTENSIONS:
+        raise ValueError(f"unsupported file extension: {ext}")
 
-        # Ensure we read from start
-        try:
-            file_obj.seek(0)
-        except Exception:
-            pass
+    # Validate content type
+    content_type = getattr(file_stream, "content_type", "")
+    if content_type not in _ALLOWED_MIME:
+        raise ValueError(f"unsupported content type: {content_type}")
+
+    file_obj = getattr(file_stream, "file", None)
+    if file_obj is None:
+        raise ValueError("uploaded file object is missing")
+    return ext, file_obj
+
+
+def _spool_upload(file_obj, ext: str) -> Tuple[Path, Path, str, int, ImageHeader]:
+    """Sniff the signature, stream the upload to a temp file and check its image header.
 
-        data = file_obj.read(max_bytes + 1)
-        if len(data) == 0:
-            raise ValueError("empty file")
-        if len(data) > max_bytes:
-            raise ValueError("file too large")
+    Returns (base dir, temp path, SHA-256 hex digest, size in bytes, image header).
+    The temp file is removed on error.
+    """
+    # Ensure we read from start
+    try:
+        file_obj.seek(0)
+    except Exception:
+        pass
+
+    # Reject on the file signature before anything is written
+    first_chunk = file_obj.read(_CHUNK_SIZE)
+    if len(first_chunk) == 0:
+        raise ValueError("empty file")
+    sniffed_ext = sniff_image_extension(first_chunk)
+    if sniffed_ext is None:
+        raise ValueError("invalid image content")
+    if sniffed_ext != ext:
+        raise ValueError("image format mismatch")
+
+    base = _ensure_base_dir()
+    incoming = _ensure_incoming_dir(base)
+    tmp_path = incoming / f"{uuid.uuid4().hex}.tmp"
+    try:
+        digest, size = _stream_to_file(file_obj, first_chunk, tmp_path, int(config.MAX_PHOTO_SIZE_BYTES))
 
-        # Verify image via PIL
+        # Header-only inspection: bound dimensions and reject animations before any decode
         try:
-            img = Image.open(io.BytesIO(data))
-            img_format = img.format
-            img.verify()  # verify integrity
-        except UnidentifiedImageError as e:
-            logger.error(e, exc_info=True)
-            raise ValueError("invalid image content")
-        except Exception as e:
+            header = inspect_image_file(str(tmp_path))
+        except ValueError as e:
             logger.error(e, exc_info=True)
             raise ValueError("invalid image content")
+        if _PIL_FORMAT_MAP.get(header.format) != ext:
+            raise ValueError("image format mismatch")
+        check_image_limits(header)
+    except Exception:
+        _discard_temp(tmp_path)
+        raise
+    return base, tmp_path, digest, size, header
 
-        # Map PIL format to extension and compare
-        expected_ext = _PIL_FORMAT_MAP.get(img_format)
-        if not expected_ext:
-            raise ValueError("unsupported image format")
 
-        if expected_ext != ext:
-            # allow jpg/jpeg interchange: we normalized .jpeg -> .jpg above
-            raise ValueError("image format mismatch")
+def verify_image_file(path: str) -> str:
+    """Verify image integrity with Pillow and return its format name (e.g. "PNG").
+
+    Module-level and free of shared state so it can run in the verification process pool.
+    """
+    # Pillow is imported on first use to keep it out of the service's import time
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as img:
+            img_format = img.format
+            img.verify()  # verify integrity
+        return img_format
+    except UnidentifiedImageError as e:
+        logger.error(e, exc_info=True)
+        raise ValueError("invalid image content")
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise ValueError("invalid image content")
+
+
+def _check_format(img_format: Optional[str], ext: str) -> None:
+    # Map PIL format to extension and compare
+    expected_ext = _PIL_FORMAT_MAP.get(img_format)
+    if not expected_ext:
+        raise ValueError("unsupported image format")
+
+    if expected_ext != ext:
+        # allow jpg/jpeg interchange: we normalized .jpeg -> .jpg
+        raise ValueError("image format mismatch")
 
-        # All validations passed. Prepare destination
-        base = _ensure_base_dir()
+
+def _make_dirs(directory: Path) -> List[Path]:
+    """mkdir -p with mode 0700, returning the directories actually created (outermost first).
+
+    The common case of an existing directory costs a single failed mkdir.
+    """
+    try:
+        directory.mkdir(mode=0o700)
+    except FileExistsError:
+        return []
+    except FileNotFoundError:
+        created = _make_dirs(directory.parent)
+        try:
+            directory.mkdir(mode=0o700)
+        except FileExistsError:
+            return created
+        return created + [directory]
+    return [directory]
+
+
+def _upload_destination(base: Path, digest: str, ext: str, user_id: int) -> Tuple[str, Path]:
+    """Return (relative path, absolute path) an upload is published under."""
+    if config.PHOTO_DEDUP_ENABLED:
+        relative_path = content_addressed_path(digest, ext)
+    else:
         try:
-            user_dir = base / str(int(user_id))
+            user_dir = user_photo_dir(user_id)
         except Exception:
             raise ValueError("invalid user_id")
+        relative_path = f"{user_dir}/{uuid.uuid4().hex}{ext}"
 
-        # create user directory with restrictive permissions where possible
-        try:
-            user_dir.mkdir(parents=True, exist_ok=True)
+    dest_path = (base / relative_path).resolve()
+
+    # Ensure dest_path is under base to prevent traversal
+    try:
+        dest_path.relative_to(base)
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise ValueError("invalid destination path")
+    return relative_path, dest_path
+
+
+def _stored_elsewhere(relative_path: str, dest_path: Path) -> bool:
+    """Whether identical content is already stored: on disk, or in a non-local backend,
+    where staged uploads do not stay. A reused local file's mtime is refreshed so orphan
+    collection's grace period starts over."""
+    # local import: the backends depend on this module
+    from nta_user_svc.storage.backends import get_storage_backend
+
+    backend = get_storage_backend()
+    if not backend.is_local:
+        return backend.exists(relative_path)
+    try:
+        os.utime(dest_path)
+        return dest_path.is_file()
+    except FileNotFoundError:
+        # never stored, or removed since; write it (again)
+        return False
+
+
+def _publish_upload(relative_path: str, tmp_path: Path, dest_path: Path) -> bool:
+    """Move a verified temp file into place; return whether a file was written.
+
+    With PHOTO_DEDUP_ENABLED existing identical content is reused instead.
+    """
+    dest_dir = dest_path.parent
+    if config.PHOTO_DEDUP_ENABLED and _stored_elsewhere(relative_path, dest_path):
+        # Identical content is already stored, together with its derived files
+        return False
+
+    # create destination directory with restrictive permissions where possible;
+    # chmod only when the directory is new rather than on every upload
+    try:
+        created = _make_dirs(dest_dir)
+        for directory in created:
             try:
-                user_dir.chmod(0o700)
+                directory.chmod(0o700)  # mkdir's mode is subject to the umask
             except Exception:
                 # Not fatal when chmod fails (e.g., on Windows)
                 pass
-        except Exception as e:
-            logger.error(e, exc_info=True)
-            raise OSError("failed to create user directory")
+        # the parents of new directories gained entries that must be made durable too
+        changed_dirs = [directory.parent for directory in created]
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise OSError("failed to create user directory")
 
-        unique_name = f"{uuid.uuid4().hex}{ext}"
-        relative_path = f"{user_dir.name}/{unique_name}"
-        dest_path = (user_dir / unique_name).resolve()
+    # Atomic publish of the fully written temp file (fsyncs per PHOTO_DURABILITY)
+    try:
+        with span("storage.durable_replace", durability=config.PHOTO_DURABILITY):
+            durable_replace(tmp_path, dest_path, changed_dirs)
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise OSError("failed to write file to disk")
+    return True
+
+
+def _discard_temp(tmp_path: Path) -> None:
+    # A no-op once the temp file has been published
+    try:
+        tmp_path.unlink()
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.error("Failed to remove temp upload %s", tmp_path, exc_info=True)
+
+
+@traced("storage.derive_files")
+def _derive_files(relative_path: str) -> None:
+    """Produce transcoded alternates and eager size variants of a newly stored photo."""
+    if config.PHOTO_TRANSCODE_FORMATS:
+        # local import: transcode depends on this module
+        from nta_user_svc.storage import transcode
 
-        # Ensure dest_path is under base to prevent traversal
         try:
-            dest_path.relative_to(base)
+            transcode.transcode_alternates(relative_path)
         except Exception as e:
-            logger.error(e, exc_info=True)
-            raise ValueError("invalid destination path")
+            # Not fatal: the original is always servable
+            logger.error("Failed to transcode alternates for %s", relative_path, exc_info=True)
+
+    if config.PHOTO_VARIANTS_EAGER:
+        # local import: variants depends on this module
+        from nta_user_svc.storage import variants
 
-        # Write atomically using a temp file
         try:
-            tmp_path = dest_path.with_suffix(dest_path.suffix + ".tmp")
-            with open(tmp_path, "wb") as f:
-                f.write(data)
-                f.flush()
-                os.fsync(f.fileno())
-            os.replace(tmp_path, dest_path)
+            variants.generate_variants(relative_path)
         except Exception as e:
-            logger.error(e, exc_info=True)
-            # Attempt cleanup
-            try:
-                if tmp_path.exists():
-                    tmp_path.unlink()
-            except Exception:
-                pass
-            raise OSError("failed to write file to disk")
+            # Not fatal: missing variants are generated lazily on first request
+            logger.error("Failed to pre-generate variants for %s", relative_path, exc_info=True)
+
 
-        return relative_path
+def _finish_upload(relative_path: str, written: bool) -> None:
+    """Derive local files for a newly stored photo, or hand it over to a non-local backend.
+
+    With a non-local storage backend PROFILE_PHOTO_DIR only stages the validated upload:
+    the file is put to the backend and the staged copy removed. Nothing was staged when
+    the backend already held identical content.
+    """
+    # local import: the backends depend on this module
+    from nta_user_svc.storage.backends import get_storage_backend
+
+    backend = get_storage_backend()
+    if backend.is_local:
+        if written:
+            _derive_files(relative_path)
+        return
+    if not written:
+        return
+    try:
+        backend.put_file(relative_path, str(get_full_file_path(relative_path)), mimetypes.guess_type(relative_path)[0])
+    finally:
+        remove_file(relative_path)
+
+
+def _stored_photo(
+    relative_path: str, ext: str, digest: str, size: int, header: ImageHeader, placeholder: Optional[str]
+) -> StoredPhoto:
+    return StoredPhoto(relative_path, header.width, header.height, size, _EXTENSION_MIME[ext], digest, placeholder)
+
+
+def _placeholder_args(path: Path) -> Optional[Tuple[str, int, int]]:
+    """Arguments for placeholder.compute_placeholder, or None when placeholders are disabled."""
+    if not config.PHOTO_PLACEHOLDER_ENABLED:
+        return None
+    return str(path), int(config.PHOTO_BLURHASH_X_COMPONENTS), int(config.PHOTO_BLURHASH_Y_COMPONENTS)
+
+
+def _hash_file(path: Union[str, Path]) -> Tuple[str, int]:
+    """SHA-256 hex digest and size in bytes of a file, read in chunks."""
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            sha.update(chunk)
+            size += len(chunk)
+    return sha.hexdigest(), size
+
+
+def _strip_quality() -> Optional[int]:
+    """Quality for transcode.strip_metadata, or None when originals are stored as uploaded.
+
+    Originals are stripped whenever transcoding is enabled, so that neither the stored file
+    nor the response to clients that cannot take an alternate carries the upload's EXIF.
+    """
+    if not config.PHOTO_TRANSCODE_FORMATS:
+        return None
+    return int(config.PHOTO_TRANSCODE_QUALITY)
+
+
+def _describe_stripped(tmp_path: Path) -> Tuple[str, int, ImageHeader]:
+    """Digest, size and header of a spooled upload after strip_metadata rewrote it."""
+    digest, size = _hash_file(tmp_path)
+    return digest, size, inspect_image_file(str(tmp_path))
+
+
+def describe_photo_file(path: Union[str, Path], relative_path: str) -> StoredPhoto:
+    """Compute the StoredPhoto metadata of an already stored file (used by the backfill job).
+
+    The image header is parsed and the contents are read once to hash them; the image is
+    only decoded to compute its placeholder.
+    """
+    header = inspect_image_file(str(path))
+    ext = _PIL_FORMAT_MAP.get(header.format)
+    if ext is None:
+        raise ValueError("unsupported image format")
+    digest, size = _hash_file(path)
+    args = _placeholder_args(Path(path))
+    placeholder = compute_placeholder(*args) if args else None
+    return _stored_photo(relative_path, ext, digest, size, header, placeholder)
+
+
+@traced("storage.save_profile_photo")
+def save_profile_photo(
+    file_stream: UploadFile, user_id: int, reserve: Optional[Callable[[str], None]] = None
+) -> StoredPhoto:
+    """
+    Save an uploaded profile photo and return it as a StoredPhoto: its relative path
+    ("{user_id}/{uuid}.{ext}"), dimensions, size, MIME type, SHA-256 content hash and,
+    with PHOTO_PLACEHOLDER_ENABLED, a blurhash placeholder.
+    Performs extension, MIME and content verification and enforces size limit.
+
+    The upload is streamed to a temp file in 64 KiB chunks while its size is counted and
+    its SHA-256 computed; the file signature is checked on the first chunk so wrong types
+    are rejected before anything is written. With PHOTO_TRANSCODE_FORMATS set the verified
+    upload is re-encoded without metadata (transcode.strip_metadata) before it is hashed
+    for storage.
+
+    With PHOTO_DEDUP_ENABLED the photo is stored by content ("sha256/ab/cd/{digest}.{ext}")
+    and nothing is written when identical content already exists. Callers must then track
+    references through services.photo_blob_service. ``reserve`` is called with the
+    content-addressed path before the existence check; a caller committing a reference
+    there keeps the deletion worker and orphan collection from removing a reused file
+    before the caller's own commit.
+
+    Runs entirely on the calling thread; see save_profile_photo_async for request handlers.
+    """
+    try:
+        ext, file_obj = _validate_upload(file_stream)
+        base, tmp_path, digest, size, header = _spool_upload(file_obj, ext)
+        try:
+            _check_format(verify_image_file(str(tmp_path)), ext)
+            quality = _strip_quality()
+            if quality is not None:
+                # local import: transcode depends on this module
+                from nta_user_svc.storage import transcode
+
+                transcode.strip_metadata(str(tmp_path), quality)
+                digest, size, header = _describe_stripped(tmp_path)
+            args = _placeholder_args(tmp_path)
+            placeholder = compute_placeholder(*args) if args else None
+            relative_path, dest_path = _upload_destination(base, digest, ext, user_id)
+            if reserve is not None and config.PHOTO_DEDUP_ENABLED:
+                reserve(relative_path)
+            written = _publish_upload(relative_path, tmp_path, dest_path)
+        finally:
+            _discard_temp(tmp_path)
+
+        _finish_upload(relative_path, written)
+        return _stored_photo(relative_path, ext, digest, size, header, placeholder)
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+async def save_profile_photo_async(
+    file_stream: UploadFile, user_id: int, reserve: Optional[Callable[[str], None]] = None
+) -> StoredPhoto:
+    """
+    Async variant of save_profile_photo with identical validation and result.
+
+    Pillow verification and the placeholder run concurrently in the bounded verification
+    process pool (in turn, with metadata stripping in between, when transcoding is enabled); spooling, fsync, the atomic move and derived-file generation run in the
+    bounded photo I/O thread pool.
+    The event loop and the request threadpool are never blocked on them. ``reserve`` does
+    database work and runs on the request threadpool.
+    """
+    # local imports: only needed by the async path
+    from starlette.concurrency import run_in_threadpool
+
+    from nta_user_svc.storage.executors import run_cpu_bound, run_io_bound
+
+    try:
+        ext, file_obj = _validate_upload(file_stream)
+        with span("storage.spool") as spool_span:
+            base, tmp_path, digest, size, header = await run_io_bound(_spool_upload, file_obj, ext)
+            if spool_span is not None:
+                spool_span.set_attribute("photo.size", size)
+        try:
+            args = _placeholder_args(tmp_path)
+            quality = _strip_quality()
+            with span("storage.verify", placeholder=bool(args), strip=quality is not None):
+                if args and quality is None:
+                    img_format, placeholder = await asyncio.gather(
+                        run_cpu_bound(verify_image_file, str(tmp_path)), run_cpu_bound(compute_placeholder, *args)
+                    )
+                    _check_format(img_format, ext)
+                else:
+                    # The placeholder is computed from the stripped file, so these run in turn
+                    _check_format(await run_cpu_bound(verify_image_file, str(tmp_path)), ext)
+                    if quality is not None:
+                        # local import: transcode depends on this module
+                        from nta_user_svc.storage import transcode
+
+                        await run_cpu_bound(transcode.strip_metadata, str(tmp_path), quality)
+                        digest, size, header = await run_io_bound(_describe_stripped, tmp_path)
+                    placeholder = await run_cpu_bound(compute_placeholder, *args) if args else None
+            relative_path, dest_path = _upload_destination(base, digest, ext, user_id)
+            if reserve is not None and config.PHOTO_DEDUP_ENABLED:
+                await run_in_threadpool(reserve, relative_path)
+            with span("storage.publish"):
+                written = await run_io_bound(_publish_upload, relative_path, tmp_path, dest_path)
+        finally:
+            await run_io_bound(_discard_temp, tmp_path)
+
+        with span("storage.finish", written=written):
+            await run_io_bound(_finish_upload, relative_path, written)
+        return _stored_photo(relative_path, ext, digest, size, header, placeholder)
     except Exception as e:
         logger.error(e, exc_info=True)
         raise
 
 
-def get_full_file_path(relative_filepath: str) -> Path:
+_resolved_base: Tuple[Optional[str], Optional[Path]] = (None, None)
+
+
+def _photo_base() -> Path:
+    """Resolved PROFILE_PHOTO_DIR, memoized per configured value."""
+    global _resolved_base
+    configured, base = _resolved_base
+    if configured != config.PROFILE_PHOTO_DIR or base is None:
+        configured = config.PROFILE_PHOTO_DIR
+        base = Path(configured).expanduser().resolve()
+        _resolved_base = (configured, base)
+    return base
+
+
+def get_full_file_path(relative_filepath: str, check_moved: bool = True) -> Path:
     """
     Convert a relative filepath (as stored) into an absolute Path under PROFILE_PHOTO_DIR.
-    Prevents directory traversal by resolving and ensuring the path is a child of base.
+    Prevents directory traversal by normalizing the path and ensuring it is a child of base.
+    Stored paths never contain symlinks, so the check is lexical and costs no system calls.
+
+    A flat-layout path whose file has already been moved by the layout migration resolves
+    to its sharded location, so stored values keep working while the migration runs.
+    That probe stats the file; callers that detect a missing file themselves pass
+    ``check_moved=False`` and retry with the probe only on failure.
     """
     try:
         if not relative_filepath or not isinstance(relative_filepath, str):
             raise ValueError("relative_filepath must be a non-empty string")
 
-        base = Path(config.PROFILE_PHOTO_DIR).expanduser().resolve()
-        candidate = (base / relative_filepath).resolve()
+        base = _photo_base()
+        candidate = Path(os.path.normpath(os.path.join(base, relative_filepath)))
         try:
             candidate.relative_to(base)
         except Exception as e:
             logger.error(e, exc_info=True)
             raise ValueError("invalid relative path")
+        if candidate == base:
+            raise ValueError("invalid relative path")
+
+        if check_moved and photo_layout_of(relative_filepath) == LAYOUT_FLAT and not candidate.exists():
+            sharded = base / sharded_relative_path(relative_filepath)
+            if sharded.exists():
+                return sharded
         return candidate
     except Exception as e:
         logger.error(e, exc_info=True)
         raise
 
 
+@traced("storage.remove_profile_photo")
+def remove_profile_photo(relative_filepath: str) -> None:
+    """
+    Remove a stored photo together with its transcoded alternates and size variants.
+    Failures removing derived files are logged; failure removing the original is raised.
+    With a non-local storage backend only the stored object is deleted.
+    """
+    # local imports: these modules depend on this one
+    from nta_user_svc.storage import transcode, variants
+    from nta_user_svc.storage.backends import get_storage_backend
+
+    invalidate_photo(relative_filepath)
+    backend = get_storage_backend()
+    if not backend.is_local:
+        backend.delete(relative_filepath)
+        return
+
+    remove_file(relative_filepath)
+    transcode.remove_alternates(relative_filepath)
+    variants.remove_variants(relative_filepath)
+
+
 def remove_file(relative_filepath: str) -> None:
     """
     Remove a stored file given its relative filepath.
@@ -0,0 +1,144 @@
+import os
+import struct
+import logging
+from typing import BinaryIO, NamedTuple
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on bytes scanned for JPEG/PNG/WEBP metadata before giving up
+_MAX_SCAN_BYTES = 1024 * 1024
+
+# JPEG start-of-frame markers carrying the image dimensions (excluding DHT, JPG, DAC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageHeader(NamedTuple):
+    format: str  # Pillow format name: "JPEG", "PNG" or "WEBP"
+    width: int
+    height: int
+    frames: int  # 1 for still images; > 1 (or 2 when the count is unknown) for animations
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated image header")
+    return data
+
+
+def _inspect_png(f: BinaryIO) -> ImageHeader:
+    f.seek(8)
+    length, chunk_type = struct.unpack(">I4s", _read_exact(f, 8))
+    if chunk_type != b"IHDR" or length != 13:
+        raise ValueError("invalid PNG header")
+    width, height = struct.unpack(">II", _read_exact(f, 8))
+    f.seek(length - 8 + 4, os.SEEK_CUR)  # rest of IHDR + CRC
+
+    # APNG declares acTL before the first IDAT; walk chunk headers only
+    frames = 1
+    while f.tell() < _MAX_SCAN_BYTES:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IDAT" or chunk_type == b"IEND":
+            break
+        if chunk_type == b"acTL":
+            frames = struct.unpack(">I", _read_exact(f, 4))[0]
+            break
+        f.seek(length + 4, os.SEEK_CUR)
+    return ImageHeader("PNG", width, height, max(frames, 1))
+
+
+def _inspect_jpeg(f: BinaryIO) -> ImageHeader:
+    f.seek(2)
+    frames = 1
+    while f.tell() < _MAX_SCAN_BYTES:
+        byte = _read_exact(f, 1)
+        if byte != b"\xff":
+            raise ValueError("invalid JPEG marker")
+        marker = _read_exact(f, 1)[0]
+        while marker == 0xFF:  # fill bytes
+            marker = _read_exact(f, 1)[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # markers without a length field
+        if marker == 0xD9 or marker == 0xDA:
+            break  # end of image / start of scan before any frame header
+        length = struct.unpack(">H", _read_exact(f, 2))[0]
+        if length < 2:
+            raise ValueError("invalid JPEG segment length")
+        if marker in _JPEG_SOF_MARKERS:
+            _precision, height, width = struct.unpack(">BHH", _read_exact(f, 5))
+            return ImageHeader("JPEG", width, height, frames)
+        if marker == 0xE2:
+            segment = _read_exact(f, length - 2)
+            if segment.startswith(b"MPF\x00"):
+                # Multi-Picture Format (MPO): several images in one file
+                frames = 2
+            continue
+        f.seek(length - 2, os.SEEK_CUR)
+    raise ValueError("JPEG frame header not found")
+
+
+def _inspect_webp(f: BinaryIO) -> ImageHeader:
+    f.seek(12)
+    chunk_type, length = struct.unpack("<4sI", _read_exact(f, 8))
+    if chunk_type == b"VP8X":
+        data = _read_exact(f, 10)
+        flags = data[0]
+        width = 1 + int.from_bytes(data[4:7], "little")
+        height = 1 + int.from_bytes(data[7:10], "little")
+        # animation flag; the frame count would need a walk over every ANMF chunk
+        frames = 2 if flags & 0x02 else 1
+        return ImageHeader("WEBP", width, height, frames)
+    if chunk_type == b"VP8 ":
+        data = _read_exact(f, 10)
+        if data[3:6] != b"\x9d\x01\x2a":
+            raise ValueError("invalid VP8 frame header")
+        width, height = struct.unpack("<HH", data[6:10])
+        return ImageHeader("WEBP", width & 0x3FFF, height & 0x3FFF, 1)
+    if chunk_type == b"VP8L":
+        data = _read_exact(f, 5)
+        if data[0] != 0x2F:
+            raise ValueError("invalid VP8L signature")
+        bits = int.from_bytes(data[1:5], "little")
+        return ImageHeader("WEBP", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, 1)
+    raise ValueError("unsupported WEBP chunk")
+
+
+def inspect_image_header(f: BinaryIO) -> ImageHeader:
+    """Read format, dimensions and frame count from an image stream without decoding it.
+
+    Only the container/marker structure is parsed (a few hundred bytes for typical files),
+    so the cost does not depend on the pixel count. Raises ValueError for unknown formats
+    or malformed headers.
+    """
+    f.seek(0)
+    signature = f.read(12)
+    if signature.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _inspect_png(f)
+    if signature.startswith(b"\xff\xd8\xff"):
+        return _inspect_jpeg(f)
+    if len(signature) == 12 and signature[:4] == b"RIFF" and signature[8:12] == b"WEBP":
+        return _inspect_webp(f)
+    raise ValueError("unsupported image format")
+
+
+def inspect_image_file(path: str) -> ImageHeader:
+    """inspect_image_header for a file on disk."""
+    with open(path, "rb") as f:
+        return inspect_image_header(f)
+
+
+def check_image_limits(header: ImageHeader) -> None:
+    """Enforce PHOTO_MAX_WIDTH/PHOTO_MAX_HEIGHT/PHOTO_MAX_PIXELS and reject multi-frame images."""
+    if header.width <= 0 or header.height <= 0:
+        raise ValueError("invalid image dimensions")
+    if header.width > int(config.PHOTO_MAX_WIDTH) or header.height > int(config.PHOTO_MAX_HEIGHT):
+        raise ValueError("image dimensions too large")
+    if header.width * header.height > int(config.PHOTO_MAX_PIXELS):
+        raise ValueError("image dimensions too large")
+    if header.frames > 1:
+        raise ValueError("animated images are not supported")
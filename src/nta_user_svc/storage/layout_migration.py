@@ -0,0 +1,177 @@
+"""Online, resumable migration of stored profile photos to the sharded directory layout.
+
+Profiles are walked in primary-key order in batches. For each profile whose photo still
+lives in the flat layout ("{user_id}/"), every file in that user's directory (original,
+variants, alternates) is moved into "ab/cd/{user_id}/" and the stored path is rewritten,
+guarded on the old value so a concurrent upload is never overwritten. Until a row is
+rewritten its old path keeps resolving through get_full_file_path. The last processed
+profile id is checkpointed to a state file after every batch; re-running the tool resumes
+from there, and repeating work already done is a no-op.
+"""
+import os
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+import nta_user_svc.config as config
+from nta_user_svc.models.profile import Profile
+from nta_user_svc.storage.files import (
+    LAYOUT_FLAT,
+    LAYOUT_SHARDED,
+    photo_layout_of,
+    sharded_relative_path,
+    user_photo_dir,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _load_checkpoint(state_file: Optional[str]) -> int:
+    if not state_file or not os.path.exists(state_file):
+        return 0
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_id", 0))
+    except Exception as e:
+        logger.error("Ignoring unreadable migration state file %s", state_file, exc_info=True)
+        return 0
+
+
+def _save_checkpoint(state_file: Optional[str], last_id: int) -> None:
+    if not state_file:
+        return
+    tmp_path = f"{state_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id}, f)
+    os.replace(tmp_path, state_file)
+
+
+def move_user_directory(user_id: int) -> int:
+    """Move every file of a user's flat-layout directory into its sharded directory.
+
+    Files already present at the destination are left in place (the move already
+    happened). The emptied source directory is removed when possible. Returns the number
+    of files moved.
+    """
+    base = Path(config.PROFILE_PHOTO_DIR).expanduser().resolve()
+    source_dir = base / user_photo_dir(user_id, LAYOUT_FLAT)
+    dest_dir = base / user_photo_dir(user_id, LAYOUT_SHARDED)
+    if not source_dir.is_dir():
+        return 0
+
+    try:
+        dest_dir.mkdir(mode=0o700, parents=True)
+    except FileExistsError:
+        pass
+
+    moved = 0
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False) or entry.name.endswith(".tmp"):
+                continue
+            target = dest_dir / entry.name
+            if target.exists():
+                continue
+            # same filesystem, so this is an atomic rename
+            os.rename(entry.path, target)
+            moved += 1
+    try:
+        source_dir.rmdir()
+    except OSError:
+        # not empty (e.g. an upload landed concurrently); a later run picks it up
+        pass
+    return moved
+
+
+def migrate_photo_layout(
+    session_factory: Callable[[], Session],
+    batch_size: int = 500,
+    pause: float = 0.0,
+    state_file: Optional[str] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Migrate flat-layout profile photos to the sharded layout in batches.
+
+    Returns counters: profiles scanned, profiles migrated, files moved and rows skipped
+    because their path changed while they were being migrated.
+    """
+    stats = {"scanned": 0, "migrated": 0, "files_moved": 0, "skipped": 0}
+    last_id = _load_checkpoint(state_file)
+
+    while True:
+        with session_factory() as db:
+            rows = db.execute(
+                select(Profile.id, Profile.user_id, Profile.profile_photo_path)
+                .where(Profile.id > last_id, Profile.profile_photo_path.isnot(None))
+                .order_by(Profile.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for profile_id, user_id, path in rows:
+                stats["scanned"] += 1
+                if photo_layout_of(path) != LAYOUT_FLAT:
+                    continue
+                new_path = sharded_relative_path(path)
+                if dry_run:
+                    stats["migrated"] += 1
+                    continue
+
+                stats["files_moved"] += move_user_directory(int(path.split("/", 1)[0]))
+                result = db.execute(
+                    update(Profile)
+                    .where(Profile.id == profile_id, Profile.profile_photo_path == path)
+                    .values(profile_photo_path=new_path)
+                )
+                if result.rowcount:
+                    stats["migrated"] += 1
+                else:
+                    stats["skipped"] += 1
+
+            if not dry_run:
+                db.commit()
+            last_id = rows[-1][0]
+
+        if not dry_run:
+            _save_checkpoint(state_file, last_id)
+        logger.info("Photo layout migration reached profile id %s: %s", last_id, stats)
+        if pause > 0:
+            time.sleep(pause)
+
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Move stored profile photos to the sharded directory layout.")
+    parser.add_argument("--batch-size", type=int, default=500, help="profiles per batch/transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--state-file", default=None, help="checkpoint file used to resume an interrupted run")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be migrated without changes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if config.PHOTO_STORAGE_LAYOUT != LAYOUT_SHARDED:
+        logger.warning("PHOTO_STORAGE_LAYOUT is not 2; new uploads will keep using the flat layout")
+
+    from nta_user_svc.database import SessionLocal
+
+    stats = migrate_photo_layout(
+        SessionLocal,
+        batch_size=max(1, args.batch_size),
+        pause=args.pause,
+        state_file=args.state_file,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+"""Backfill of stored photo metadata for profiles uploaded before it was recorded.
+
+Profiles that have a photo but no recorded metadata (or, with PHOTO_PLACEHOLDER_ENABLED,
+no placeholder) are walked in primary-key order in batches. For each, the stored file is
+inspected and hashed, and the width, height, size, MIME type, SHA-256 and placeholder
+are written to the row, guarded on the photo path so a concurrent upload is never
+overwritten. The selection itself skips rows
+already filled in, so an interrupted run is simply started again.
+"""
+import os
+import json
+import time
+import argparse
+import logging
+import tempfile
+from typing import Callable, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+import nta_user_svc.config as config
+from nta_user_svc.models.profile import Profile
+from nta_user_svc.storage.files import StoredPhoto, describe_photo_file, get_full_file_path
+
+logger = logging.getLogger(__name__)
+
+
+def read_photo_metadata(relative_path: str) -> StoredPhoto:
+    """Return the metadata of a stored photo from whichever storage backend holds it.
+
+    Raises FileNotFoundError when the photo does not exist.
+    """
+    # local import: the backends depend on storage.files
+    from nta_user_svc.storage.backends import get_storage_backend
+
+    backend = get_storage_backend()
+    if backend.is_local:
+        return describe_photo_file(get_full_file_path(relative_path), relative_path)
+
+    # objects are copied to a local temp file so the header parser can seek
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = os.path.join(tmp_dir, "photo")
+        with open(tmp_path, "wb") as f:
+            for chunk in backend.stream(relative_path):
+                f.write(chunk)
+        return describe_photo_file(tmp_path, relative_path)
+
+
+def backfill_photo_metadata(
+    session_factory: Callable[[], Session],
+    batch_size: int = 500,
+    pause: float = 0.0,
+    dry_run: bool = False,
+) -> dict:
+    """Record photo metadata on profiles that lack it, in batches.
+
+    Returns counters: profiles scanned, profiles updated, photos whose file is missing,
+    photos that could not be inspected, and rows skipped because their photo changed
+    while being processed.
+    """
+    stats = {"scanned": 0, "updated": 0, "missing": 0, "failed": 0, "skipped": 0}
+    last_id = 0
+    incomplete = Profile.photo_sha256.is_(None)
+    if config.PHOTO_PLACEHOLDER_ENABLED:
+        incomplete = or_(incomplete, Profile.photo_placeholder.is_(None))
+
+    while True:
+        with session_factory() as db:
+            rows = db.execute(
+                select(Profile.id, Profile.profile_photo_path)
+                .where(
+                    Profile.id > last_id,
+                    Profile.profile_photo_path.isnot(None),
+                    incomplete,
+                )
+                .order_by(Profile.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for profile_id, path in rows:
+                stats["scanned"] += 1
+                try:
+                    photo = read_photo_metadata(path)
+                except FileNotFoundError:
+                    stats["missing"] += 1
+                    continue
+                except Exception as e:
+                    logger.error("Failed to read metadata of photo %s", path, exc_info=True)
+                    stats["failed"] += 1
+                    continue
+                if dry_run:
+                    stats["updated"] += 1
+                    continue
+
+                result = db.execute(
+                    update(Profile)
+                    .where(Profile.id == profile_id, Profile.profile_photo_path == path)
+                    .values(
+                        photo_width=photo.width,
+                        photo_height=photo.height,
+                        photo_size=photo.size,
+                        photo_mime_type=photo.mime_type,
+                        photo_sha256=photo.content_hash,
+                        photo_placeholder=photo.placeholder,
+                    )
+                )
+                if result.rowcount:
+                    stats["updated"] += 1
+                else:
+                    stats["skipped"] += 1
+
+            if not dry_run:
+                db.commit()
+            last_id = rows[-1][0]
+
+        logger.info("Photo metadata backfill reached profile id %s: %s", last_id, stats)
+        if pause > 0:
+            time.sleep(pause)
+
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Record metadata of stored profile photos on their profiles.")
+    parser.add_argument("--batch-size", type=int, default=500, help="profiles per batch/transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be updated without changes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from nta_user_svc.database import SessionLocal
+
+    stats = backfill_photo_metadata(
+        SessionLocal, batch_size=max(1, args.batch_size), pause=args.pause, dry_run=args.dry_run
+    )
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set
+
+import nta_user_svc.config as config
+
+
+class CachedPhoto(NamedTuple):
+    served_path: str  # relative path of the representation that was read
+    data: bytes
+    media_type: str
+    mtime: Optional[float]  # None when served from Profile row metadata without a stat
+    etag: Optional[str] = None
+
+
+class PhotoCache:
+    """Byte-bounded LRU cache of served photo contents.
+
+    Stored paths are unique per upload, so a cached entry never goes stale: entries only
+    leave the cache through LRU eviction or when their photo is removed (invalidate).
+    Files larger than ``max_item_bytes`` are never cached. Thread-safe.
+
+    The keys of each stored photo are indexed by its path, so invalidating a photo costs
+    in proportion to its own entries rather than to the size of the cache.
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_item_bytes = max(0, int(max_item_bytes))
+        self._entries: "OrderedDict[str, CachedPhoto]" = OrderedDict()
+        # stored photo path -> keys of its cached representations
+        self._keys_by_path: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def cacheable(self, size: int) -> bool:
+        return size <= self.max_item_bytes and size <= self.max_bytes
+
+    def get(self, key: str) -> Optional[CachedPhoto]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedPhoto) -> bool:
+        """Cache ``entry``; returns False when it is too large to be cached."""
+        size = len(entry.data)
+        if not self.cacheable(size):
+            return False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.data)
+            self._entries[key] = entry
+            self._keys_by_path.setdefault(_photo_path_of(key), set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._unindex(evicted_key)
+                self._bytes -= len(evicted.data)
+                self.evictions += 1
+        return True
+
+    def _unindex(self, key: str) -> None:
+        path = _photo_path_of(key)
+        keys = self._keys_by_path.get(path)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_path[path]
+
+    def invalidate(self, relative_path: str) -> int:
+        """Drop every entry of a stored photo (all sizes and formats); returns the count."""
+        with self._lock:
+            keys = self._keys_by_path.pop(relative_path, ())
+            for key in keys:
+                self._bytes -= len(self._entries.pop(key).data)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_path.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def photo_cache_prefix(relative_path: str) -> str:
+    return f"{relative_path}|"
+
+
+def _photo_path_of(key: str) -> str:
+    """Stored photo path of a photo_cache_key (the Accept signature holds no "|")."""
+    return key.rsplit("|", 2)[0]
+
+
+def photo_cache_key(relative_path: str, variant_size: Optional[int], accept_signature: str) -> str:
+    """Key of the representation served for a stored photo, requested size and Accept header.
+
+    Everything that selects the served file is part of the key, so a hit needs no
+    file-system probe at all.
+    """
+    return f"{photo_cache_prefix(relative_path)}{variant_size or ''}|{accept_signature}"
+
+
+_lock = threading.Lock()
+_cache: Optional[PhotoCache] = None
+
+
+def get_photo_cache() -> Optional[PhotoCache]:
+    """Return the process-wide photo cache, or None when PHOTO_CACHE_MAX_BYTES is 0."""
+    global _cache
+    if int(config.PHOTO_CACHE_MAX_BYTES) <= 0:
+        return None
+    with _lock:
+        if _cache is None:
+            _cache = PhotoCache(config.PHOTO_CACHE_MAX_BYTES, config.PHOTO_CACHE_MAX_FILE_BYTES)
+        return _cache
+
+
+def reset_photo_cache() -> None:
+    """Discard the process-wide cache; it is recreated from the settings on next use."""
+    global _cache
+    with _lock:
+        _cache = None
+
+
+def invalidate_photo(relative_path: str) -> None:
+    """Drop a removed photo from the cache, if caching is enabled and it was created."""
+    cache = _cache
+    if cache is not None:
+        cache.invalidate(relative_path)
@@ -0,0 +1,321 @@
+"""Garbage collection of photo files no profile references.
+
+Files are matched to stored photos by their photo key: the file name without extension
+and without a size-variant suffix ("{uuid}" or "{sha256}"). A stored path references
+its original, size variants and transcoded alternates in any directory layout.
+
+Both sides are streamed and externally sorted by key in chunks of ``chunk_size``
+entries (each chunk is sorted in memory and spilled to a temporary file, the runs are
+then merged), so memory stays bounded regardless of the number of files or profiles.
+A single merge pass over the two sorted streams yields the files whose key is not
+referenced. Those older than the grace period are deleted, at most
+``delete_rate`` per second. Before deletion each batch of candidates is checked again
+against ``photo_blobs`` and, by the exact stored paths that would reference them,
+``profiles`` (and its files re-stat'ed), so a file that was re-referenced after the
+snapshot, e.g. by a deduplicated upload, is kept. Leftover temp files (``*.tmp``) past the grace period are
+removed as well; any other unrecognised file is left alone.
+"""
+import os
+import re
+import json
+import time
+import heapq
+import argparse
+import logging
+import tempfile
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import nta_user_svc.config as config
+from nta_user_svc.models.photo_blob import PhotoBlob
+from nta_user_svc.models.profile import Profile
+from nta_user_svc.storage.files import (
+    LAYOUT_FLAT,
+    LAYOUT_SHARDED,
+    PHOTO_EXTENSIONS,
+    content_addressed_path,
+    photo_layout_of,
+    sharded_relative_path,
+)
+
+logger = logging.getLogger(__name__)
+
+# "{uuid4 hex}" or "{sha256 hex}", optionally followed by "_{size}", then the extension
+_PHOTO_NAME_RE = re.compile(r"^([0-9a-f]{32}|[0-9a-f]{64})(?:_\d+)?\.[a-z0-9]+$")
+_TEMP_SUFFIX = ".tmp"
+# Sorts after every photo key (lowercase hex), marking temp files as never referenced
+_TEMP_KEY = "~tmp"
+# Most candidate files (and stored paths per IN query) checked again before deletion
+_RECHECK_BATCH = 500
+
+
+def photo_key(name: str) -> Optional[str]:
+    """Return the photo key of a stored file name, or None if it is not a photo file."""
+    match = _PHOTO_NAME_RE.match(name)
+    return match.group(1) if match else None
+
+
+def _sorted_runs(lines: Iterable[str], chunk_size: int) -> Iterator[str]:
+    """Sort newline-free strings with at most ``chunk_size`` of them in memory at a time."""
+    runs: List = []
+    chunk: List[str] = []
+
+    def _spill() -> None:
+        chunk.sort()
+        f = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        f.writelines(line + "\n" for line in chunk)
+        f.seek(0)
+        runs.append(f)
+        chunk.clear()
+
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            _spill()
+
+    if not runs:
+        # everything fit in one chunk: no temp files needed
+        chunk.sort()
+        yield from chunk
+        return
+
+    if chunk:
+        _spill()
+    try:
+        yield from heapq.merge(*((line.rstrip("\n") for line in f) for f in runs))
+    finally:
+        for f in runs:
+            f.close()
+
+
+def _walk_files(base: Path) -> Iterator[str]:
+    """Yield "{key}\\t{relative path}\\t{size}\\t{mtime}" for every candidate file under base."""
+    stack = [base]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if "\t" in entry.name or "\n" in entry.name:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                key = _TEMP_KEY if entry.name.endswith(_TEMP_SUFFIX) else photo_key(entry.name)
+                if key is None:
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                relative = os.path.relpath(entry.path, base)
+                yield f"{key}\t{relative}\t{st.st_size}\t{st.st_mtime}"
+
+
+def _referenced_keys(session_factory: Callable[[], Session], chunk_size: int) -> Iterator[str]:
+    """Stream the photo keys of every stored profile_photo_path, in keyset-paginated chunks."""
+    last_id = 0
+    while True:
+        with session_factory() as db:
+            rows = db.execute(
+                select(Profile.id, Profile.profile_photo_path)
+                .where(Profile.id > last_id, Profile.profile_photo_path.isnot(None))
+                .order_by(Profile.id)
+                .limit(chunk_size)
+            ).all()
+        if not rows:
+            return
+        for _, path in rows:
+            key = photo_key(path.rsplit("/", 1)[-1])
+            if key is not None:
+                yield key
+        last_id = rows[-1][0]
+
+
+def _stored_paths(key: str, relative: str) -> List[str]:
+    """Return the profile_photo_path values that would reference the file at ``relative``.
+
+    These are its original in every extension an upload can have: the content-addressed
+    path for a SHA-256 key, otherwise the file's own per-user directory in both layouts.
+    """
+    if len(key) == 64:
+        return [content_addressed_path(key, ext) for ext in PHOTO_EXTENSIONS]
+    directory = relative.rsplit("/", 1)[0] if "/" in relative else ""
+    paths = []
+    for ext in PHOTO_EXTENSIONS:
+        stored = f"{directory}/{key}{ext}"
+        layout = photo_layout_of(stored)
+        if layout == LAYOUT_FLAT:
+            paths += [stored, sharded_relative_path(stored)]
+        elif layout == LAYOUT_SHARDED:
+            user_dir = directory.rsplit("/", 1)[-1]
+            paths += [stored, f"{user_dir}/{key}{ext}"]
+    return paths
+
+
+def _still_referenced(session_factory: Callable[[], Session], candidates: Iterable[Tuple[str, str]]) -> Set[str]:
+    """Return the keys among ``(key, relative path)`` candidates that a photo_blobs row or a
+    profile references now.
+
+    Profiles are matched on the exact stored paths of each candidate (see _stored_paths)
+    with IN lookups on the profile_photo_path index.
+    """
+    paths = {}
+    for key, relative in candidates:
+        for path in _stored_paths(key, relative):
+            paths[path] = key
+    digests = {key for key in paths.values() if len(key) == 64}
+    found: Set[str] = set()
+    with session_factory() as db:
+        if digests:
+            found.update(
+                db.execute(
+                    select(PhotoBlob.sha256).where(PhotoBlob.sha256.in_(digests), PhotoBlob.ref_count > 0)
+                ).scalars()
+            )
+        stored = list(paths)
+        for start in range(0, len(stored), _RECHECK_BATCH):
+            batch = stored[start : start + _RECHECK_BATCH]
+            found.update(
+                paths[path]
+                for path in db.execute(
+                    select(Profile.profile_photo_path).where(Profile.profile_photo_path.in_(batch))
+                ).scalars()
+            )
+    return found
+
+
+class _RateLimiter:
+    """Spaces operations at least 1/rate seconds apart; rate <= 0 disables limiting."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        if not self._interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self._interval
+
+
+def collect_orphan_photos(
+    session_factory: Callable[[], Session],
+    grace_seconds: Optional[float] = None,
+    delete_rate: Optional[float] = None,
+    chunk_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> dict:
+    """Delete photo files under PROFILE_PHOTO_DIR that no profile references.
+
+    Returns counters: files scanned, files referenced, orphans found, orphans skipped
+    because they are newer than the grace period, orphans kept because they were
+    referenced again during the run, files deleted and bytes reclaimed (bytes that would
+    be reclaimed with ``dry_run``).
+    """
+    grace_seconds = float(config.PHOTO_GC_GRACE_SECONDS if grace_seconds is None else grace_seconds)
+    limiter = _RateLimiter(float(config.PHOTO_GC_DELETE_RATE if delete_rate is None else delete_rate))
+    chunk_size = max(1, int(chunk_size or config.PHOTO_GC_CHUNK_SIZE))
+    base = Path(config.PROFILE_PHOTO_DIR).expanduser().resolve()
+    cutoff = time.time() - grace_seconds
+
+    stats = {
+        "scanned": 0,
+        "referenced": 0,
+        "orphans": 0,
+        "too_recent": 0,
+        "referenced_again": 0,
+        "deleted": 0,
+        "reclaimed_bytes": 0,
+    }
+    referenced = _sorted_runs(_referenced_keys(session_factory, chunk_size), chunk_size)
+    current_ref = next(referenced, None)
+    candidates: List[Tuple[str, str, int]] = []
+
+    def _delete_candidates() -> None:
+        # the snapshot is stale by now: re-check references, then mtimes, right before unlinking
+        photos = [(key, relative) for key, relative, _ in candidates if key != _TEMP_KEY]
+        live = _still_referenced(session_factory, photos) if photos else set()
+        for key, relative, size in candidates:
+            if key in live:
+                stats["referenced_again"] += 1
+                continue
+            path = base / relative
+            try:
+                if os.stat(path, follow_symlinks=False).st_mtime > cutoff:
+                    stats["too_recent"] += 1
+                    continue
+            except FileNotFoundError:
+                continue
+            limiter.wait()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                logger.error("Failed to delete orphan photo file %s", relative, exc_info=True)
+                continue
+            stats["deleted"] += 1
+            stats["reclaimed_bytes"] += size
+        candidates.clear()
+
+    for line in _sorted_runs(_walk_files(base), chunk_size):
+        key, relative, size, mtime = line.split("\t")
+        stats["scanned"] += 1
+        while current_ref is not None and current_ref < key:
+            current_ref = next(referenced, None)
+        if current_ref == key:
+            stats["referenced"] += 1
+            continue
+
+        stats["orphans"] += 1
+        if float(mtime) > cutoff:
+            # may belong to an upload whose transaction has not committed yet
+            stats["too_recent"] += 1
+            continue
+        if dry_run:
+            stats["reclaimed_bytes"] += int(size)
+            continue
+
+        candidates.append((key, relative, int(size)))
+        if len(candidates) >= min(chunk_size, _RECHECK_BATCH):
+            _delete_candidates()
+    if candidates:
+        _delete_candidates()
+
+    logger.info("Orphan photo collection finished: %s", stats)
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Delete profile photo files no profile references.")
+    parser.add_argument("--grace-seconds", type=float, default=None, help="minimum age of deleted files")
+    parser.add_argument("--delete-rate", type=float, default=None, help="maximum deletions per second (0: unlimited)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="entries sorted in memory at a time")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from nta_user_svc.database import SessionLocal
+
+    stats = collect_orphan_photos(
+        SessionLocal,
+        grace_seconds=args.grace_seconds,
+        delete_rate=args.delete_rate,
+        chunk_size=args.chunk_size,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
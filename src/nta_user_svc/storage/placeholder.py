@@ -0,0 +1,101 @@
+"""Blurhash placeholders of profile photos (https://blurha.sh).
+
+A blurhash encodes the image as a handful of DCT components in a short base83 string
+(28 characters for the default 4x3 components) that clients decode into a blurred
+preview, so lists can render avatars before, or instead of, fetching the photo.
+"""
+import math
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+# Components only carry low frequencies: encoding a 32x32 downscale gives the same hash
+_SAMPLE_EDGE = 32
+_SRGB_TO_LINEAR = [
+    (v / 255.0) / 12.92 if v / 255.0 <= 0.04045 else ((v / 255.0 + 0.055) / 1.055) ** 2.4 for v in range(256)
+]
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exp: float) -> float:
+    return math.copysign(abs(value) ** exp, value)
+
+
+def encode_blurhash(pixels: Sequence[Tuple[int, int, int]], width: int, height: int, x_components: int, y_components: int) -> str:
+    """Encode row-major sRGB ``pixels`` of a ``width`` x ``height`` image as a blurhash."""
+    if not (1 <= x_components <= 9 and 1 <= y_components <= 9):
+        raise ValueError("blurhash components must be between 1 and 9")
+
+    linear = [(_SRGB_TO_LINEAR[r], _SRGB_TO_LINEAR[g], _SRGB_TO_LINEAR[b]) for r, g, b in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors: List[Tuple[float, float, float]] = []
+    for j in range(y_components):
+        for i in range(x_components):
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                basis_y = cos_y[j][y]
+                for x in range(width):
+                    basis = cos_x[i][x] * basis_y
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = (1 if i == 0 and j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    parts = [_encode83((x_components - 1) + (y_components - 1) * 9, 1)]
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = int(max(0, min(82, math.floor(actual_max * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+        parts.append(_encode83(quantised_max, 1))
+    else:
+        maximum = 1.0
+        parts.append(_encode83(0, 1))
+
+    parts.append(_encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4))
+    for factor in ac:
+        r, g, b = (int(max(0, min(18, math.floor(_sign_pow(c / maximum, 0.5) * 9 + 9.5)))) for c in factor)
+        parts.append(_encode83(r * 19 * 19 + g * 19 + b, 2))
+    return "".join(parts)
+
+
+def compute_placeholder(path: str, x_components: int, y_components: int) -> Optional[str]:
+    """Return the blurhash of an image file, or None when it cannot be computed.
+
+    Module-level and free of shared state so it can run in the verification process pool.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(path) as img:
+            # JPEG can decode at a reduced scale, which is much cheaper than a full decode
+            img.draft("RGB", (_SAMPLE_EDGE, _SAMPLE_EDGE))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA", "LA", "L"):
+                img = img.convert("RGBA")
+            if img.mode in ("RGBA", "LA"):
+                # transparent areas render over white, as in most avatar UIs
+                background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+                img = Image.alpha_composite(background, img.convert("RGBA"))
+            sample = img.convert("RGB").resize((_SAMPLE_EDGE, _SAMPLE_EDGE), Image.Resampling.BOX)
+        return encode_blurhash(list(sample.getdata()), _SAMPLE_EDGE, _SAMPLE_EDGE, x_components, y_components)
+    except Exception as e:
+        logger.error("Failed to compute placeholder for %s", path, exc_info=True)
+        return None
@@ -0,0 +1,229 @@
+import io
+import os
+import uuid
+import logging
+from pathlib import PurePosixPath
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import nta_user_svc.config as config
+from nta_user_svc.storage.files import get_full_file_path, remove_file
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# format key -> (PIL format, file extension, MIME type)
+_FORMATS: Dict[str, Tuple[str, str, str]] = {
+    "avif": ("AVIF", ".avif", "image/avif"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+}
+# Server-side preference when the client weighs several formats equally
+_PREFERENCE = ("avif", "webp")
+# MIME type of a stored original (or its size variant) by file extension
+_ORIGINAL_MIME = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+}
+
+
+def supported_formats() -> List[str]:
+    """Configured transcode formats that the installed Pillow can encode, in preference order."""
+    from PIL import features
+
+    configured = set(config.PHOTO_TRANSCODE_FORMATS)
+    return [fmt for fmt in _PREFERENCE if fmt in configured and features.check(fmt)]
+
+
+def alternate_relative_path(relative_path: str, fmt: str) -> str:
+    """Return the stored path of the ``fmt`` alternate of a photo ("{dir}/{stem}{ext}")."""
+    return str(PurePosixPath(relative_path).with_suffix(_FORMATS[fmt][1]))
+
+
+def _encode(img: "Image.Image", fmt: str) -> bytes:
+    pil_format = _FORMATS[fmt][0]
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+    bio = io.BytesIO()
+    # No exif/icc/xmp arguments are passed, so the alternate carries no metadata
+    if pil_format == "WEBP":
+        img.save(bio, format=pil_format, quality=config.PHOTO_TRANSCODE_QUALITY, method=4)
+    else:
+        img.save(bio, format=pil_format, quality=config.PHOTO_TRANSCODE_QUALITY)
+    return bio.getvalue()
+
+
+def strip_metadata(path: str, quality: int) -> None:
+    """Re-encode the image file at ``path`` in place, in its own format, without metadata.
+
+    EXIF orientation is applied and EXIF (including GPS), XMP and comments are dropped; the
+    ICC profile is kept so colours do not shift. JPEG and WebP are re-encoded at
+    ``quality``, PNG losslessly. Animated images are left untouched. Module level and
+    config-free so it can run in the verification process pool.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as src:
+        if getattr(src, "is_animated", False):
+            return
+        pil_format = src.format
+        icc_profile = src.info.get("icc_profile")
+        img = ImageOps.exif_transpose(src)
+        params = {"icc_profile": icc_profile} if icc_profile else {}
+        if pil_format == "JPEG":
+            if img.mode not in ("RGB", "L", "CMYK"):
+                img = img.convert("RGB")
+            params.update(quality=quality, optimize=True)
+        elif pil_format == "WEBP":
+            params.update(quality=quality, method=4)
+        elif pil_format == "PNG":
+            params.update(optimize=True)
+            if "transparency" in img.info:
+                params["transparency"] = img.info["transparency"]
+        else:
+            raise ValueError("unsupported image format")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            img.save(tmp_path, format=pil_format, **params)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def transcode_alternates(relative_path: str, data: Optional[bytes] = None) -> List[str]:
+    """Re-encode a stored photo into each configured format and store the results.
+
+    The image is decoded once, EXIF orientation is applied and all metadata is dropped.
+    Alternates that would not be smaller than the original are not kept. Returns the
+    relative paths of the alternates written.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        source = get_full_file_path(relative_path)
+        if data is None:
+            data = source.read_bytes()
+        original_suffix = PurePosixPath(relative_path).suffix.lower()
+
+        written = []
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            for fmt in supported_formats():
+                if _FORMATS[fmt][1] == original_suffix:
+                    # the original already is this format
+                    continue
+                encoded = _encode(img, fmt)
+                if len(encoded) >= len(data):
+                    continue
+
+                alt_relative = alternate_relative_path(relative_path, fmt)
+                dest = get_full_file_path(alt_relative)
+                tmp_path = dest.with_name(f"{dest.name}.{uuid.uuid4().hex}.tmp")
+                try:
+                    with open(tmp_path, "wb") as f:
+                        f.write(encoded)
+                    os.replace(tmp_path, dest)
+                except Exception:
+                    try:
+                        tmp_path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    raise
+                written.append(alt_relative)
+        return written
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def _parse_accept(accept_header: Optional[str]) -> Dict[str, float]:
+    """Return explicitly listed media types mapped to their q-values."""
+    weights: Dict[str, float] = {}
+    if not accept_header:
+        return weights
+    for item in accept_header.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type:
+            weights[media_type.lower()] = q
+    return weights
+
+
+def _original_q(weights: Dict[str, float], relative_path: str) -> float:
+    """q-value of the stored file's own media type: listed explicitly, by type wildcard or by
+    ``*/*``; without an Accept header the original is acceptable."""
+    if not weights:
+        return 1.0
+    media_type = _ORIGINAL_MIME.get(PurePosixPath(relative_path).suffix.lower())
+    if media_type is None:
+        return weights.get("*/*", 0.0)
+    for key in (media_type, media_type.split("/")[0] + "/*", "*/*"):
+        if key in weights:
+            return weights[key]
+    return 0.0
+
+
+def negotiate_alternate(relative_path: str, accept_header: Optional[str]) -> str:
+    """Pick the stored representation of a photo best matching the request ``Accept`` header.
+
+    The original competes with its own q-value (see _original_q). Alternates are only
+    considered when the client lists their format explicitly (e.g. ``image/avif``), so
+    wildcards alone keep the original. An alternate existing on disk wins with a higher
+    q-value, or an equal one since it is the smaller file; among alternates ties go to the
+    server preference order. Falls back to ``relative_path``.
+    """
+    formats = supported_formats()
+    if not formats:
+        return relative_path
+
+    weights = _parse_accept(accept_header)
+    best_path, best_q = relative_path, _original_q(weights, relative_path)
+    for fmt in formats:
+        q = weights.get(_FORMATS[fmt][2], 0.0)
+        if q <= 0 or q < best_q or (q == best_q and best_path != relative_path):
+            continue
+        alt_relative = alternate_relative_path(relative_path, fmt)
+        if alt_relative == relative_path:
+            continue
+        try:
+            if get_full_file_path(alt_relative).is_file():
+                best_path, best_q = alt_relative, q
+        except ValueError:
+            continue
+    return best_path
+
+
+def accept_signature(accept_header: Optional[str], relative_path: str = "") -> str:
+    """Summarize the parts of ``Accept`` that negotiate_alternate depends on for a photo.
+
+    Two requests with the same signature are served the same representation of it.
+    """
+    weights = _parse_accept(accept_header)
+    original = f"{_original_q(weights, relative_path):g}"
+    return ",".join([original] + [f"{fmt}={weights.get(_FORMATS[fmt][2], 0.0):g}" for fmt in supported_formats()])
+
+
+def remove_alternates(relative_path: str) -> None:
+    """Remove every transcoded alternate of a stored photo; missing files are ignored."""
+    original_suffix = PurePosixPath(relative_path).suffix.lower()
+    for fmt, (_, ext, _) in _FORMATS.items():
+        if ext == original_suffix:
+            continue
+        try:
+            remove_file(alternate_relative_path(relative_path, fmt))
+        except Exception as e:
+            logger.error("Failed to remove %s alternate of %s", fmt, relative_path, exc_info=True)
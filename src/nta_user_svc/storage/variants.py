@@ -0,0 +1,114 @@
+import os
+import uuid
+import logging
+from pathlib import PurePosixPath
+from typing import Iterable, List, Optional
+
+import nta_user_svc.config as config
+from nta_user_svc.storage import transcode
+from nta_user_svc.storage.files import get_full_file_path, remove_file
+
+logger = logging.getLogger(__name__)
+
+_SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 85, "method": 4},
+}
+
+
+def variant_relative_path(relative_path: str, size: int) -> str:
+    """Return the stored path of the ``size`` variant of a photo ("{dir}/{stem}_{size}{ext}")."""
+    original = PurePosixPath(relative_path)
+    return str(original.with_name(f"{original.stem}_{int(size)}{original.suffix}"))
+
+
+def select_variant_size(requested: Optional[int]) -> Optional[int]:
+    """Map a requested edge length to the smallest configured variant that covers it.
+
+    Returns None when no size was requested or the request exceeds every configured
+    variant, in which case the original should be served.
+    """
+    if requested is None:
+        return None
+    for size in sorted(config.PHOTO_VARIANT_SIZES):
+        if size >= requested:
+            return size
+    return None
+
+
+def generate_variant(relative_path: str, size: int) -> str:
+    """Render the ``size`` variant of a stored photo and return its relative path.
+
+    The variant keeps the original format and aspect ratio; its longest edge is at most
+    ``size`` pixels. Originals already within ``size`` are re-encoded unchanged in size.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        source = get_full_file_path(relative_path)
+        variant_relative = variant_relative_path(relative_path, size)
+        dest = get_full_file_path(variant_relative)
+
+        with Image.open(source) as img:
+            img_format = img.format
+            # JPEG can decode at a reduced scale, which is much cheaper than a full decode
+            img.draft(img.mode, (size, size))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+
+            # unique temp name so concurrent lazy generations do not clobber each other
+            tmp_path = dest.with_name(f"{dest.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                img.save(tmp_path, format=img_format, **_SAVE_OPTIONS.get(img_format, {}))
+                os.replace(tmp_path, dest)
+            except Exception:
+                try:
+                    tmp_path.unlink()
+                except FileNotFoundError:
+                    pass
+                raise
+
+        if config.PHOTO_TRANSCODE_FORMATS:
+            try:
+                transcode.transcode_alternates(variant_relative)
+            except Exception as e:
+                logger.error("Failed to transcode alternates for %s", variant_relative, exc_info=True)
+
+        return variant_relative
+    except Exception as e:
+        logger.error(e, exc_info=True)
+        raise
+
+
+def get_or_create_variant(relative_path: str, size: int) -> str:
+    """Return the relative path of the ``size`` variant, generating it on first use.
+
+    Generated variants are memoized on disk next to the original.
+    """
+    variant_relative = variant_relative_path(relative_path, size)
+    if get_full_file_path(variant_relative).is_file():
+        return variant_relative
+    return generate_variant(relative_path, size)
+
+
+def generate_variants(relative_path: str, sizes: Optional[Iterable[int]] = None) -> List[str]:
+    """Eagerly generate every configured variant of a stored photo."""
+    created = []
+    for size in sizes if sizes is not None else config.PHOTO_VARIANT_SIZES:
+        created.append(generate_variant(relative_path, size))
+    return created
+
+
+def remove_variants(relative_path: str) -> None:
+    """Remove every configured variant of a stored photo, and their transcoded alternates.
+
+    Missing files are ignored.
+    """
+    for size in config.PHOTO_VARIANT_SIZES:
+        variant_relative = variant_relative_path(relative_path, size)
+        try:
+            remove_file(variant_relative)
+        except Exception as e:
+            logger.error("Failed to remove photo variant %s (%s)", relative_path, size, exc_info=True)
+        transcode.remove_alternates(variant_relative)
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import anyio.to_thread
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+# recent wait samples kept for percentiles
+_WAIT_WINDOW = 2048
+
+
+class _TimedLimiter:
+    """Stand-in for AnyIO's default thread limiter recording how long each acquisition waited.
+
+    AnyIO enters the limiter around every thread hop, so timing ``acquire`` measures the
+    wait for a token itself, whichever route, dependency or helper asked for the thread.
+    Everything else (total_tokens, statistics) is delegated to the wrapped limiter.
+    """
+
+    def __init__(self, limiter: Any):
+        object.__setattr__(self, "_limiter", limiter)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._limiter, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._limiter, name, value)
+
+    async def __aenter__(self) -> None:
+        start = time.perf_counter()
+        await self._limiter.acquire()
+        _stats.record_wait(time.perf_counter() - start)
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._limiter.release()
+
+
+def _install_timed_limiter() -> Any:
+    """Replace the default thread limiter of the running loop with a _TimedLimiter around it."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    if isinstance(limiter, _TimedLimiter):
+        return limiter
+    try:
+        # AnyIO has no public setter for the default limiter
+        from anyio._backends._asyncio import _default_thread_limiter
+
+        timed = _TimedLimiter(limiter)
+        _default_thread_limiter.set(timed)
+    except Exception as e:
+        logger.warning("Cannot time threadpool waits with this AnyIO backend", exc_info=True)
+        return limiter
+    return timed
+
+
+def configure_threadpool(capacity: Optional[int] = None) -> int:
+    """Set the token count of AnyIO's default thread limiter and return it.
+
+    Every sync route and dependency runs through this limiter (AnyIO's default is 40).
+    The limiter is wrapped so that every wait for a token is recorded in the threadpool
+    stats. Must be called from within the running event loop, e.g. a startup handler.
+    """
+    capacity = int(config.THREADPOOL_SIZE if capacity is None else capacity)
+    limiter = _install_timed_limiter()
+    limiter.total_tokens = capacity
+    logger.info("Sync handler threadpool capacity set to %d", capacity)
+    return capacity
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ThreadpoolStats:
+    """Thread-safe record of sync-handler occupancy samples and waits for a thread token."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._capacity = 0
+        self._running = 0
+        self._queued = 0
+        self._peak_running = 0
+        self._peak_queued = 0
+        self._samples = 0
+        self._saturated_samples = 0
+        self._thread_bound_samples = 0
+        self._db_pool_size: Optional[int] = None
+        self._db_checked_out: Optional[int] = None
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: Deque[float] = deque(maxlen=_WAIT_WINDOW)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def sample(
+        self,
+        capacity: int,
+        running: int,
+        queued: int,
+        db_pool_size: Optional[int] = None,
+        db_checked_out: Optional[int] = None,
+    ) -> None:
+        with self._lock:
+            self._capacity = capacity
+            self._running = running
+            self._queued = queued
+            self._db_pool_size = db_pool_size
+            self._db_checked_out = db_checked_out
+            self._peak_running = max(self._peak_running, running)
+            self._peak_queued = max(self._peak_queued, queued)
+            self._samples += 1
+            if queued:
+                self._saturated_samples += 1
+                # handlers wait for a thread although the DB pool still has idle connections
+                if db_pool_size is not None and db_checked_out is not None and db_checked_out < db_pool_size:
+                    self._thread_bound_samples += 1
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._waits += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+            self._recent_waits.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy (capacity, running, queued and their peaks), the fraction of samples
+        with handlers queued for a thread (``saturation``) and of samples queued while the
+        DB pool had idle connections (``thread_bound``), and thread wait times in seconds."""
+        with self._lock:
+            recent = list(self._recent_waits)
+            return {
+                "capacity": self._capacity,
+                "running": self._running,
+                "queued": self._queued,
+                "peak_running": self._peak_running,
+                "peak_queued": self._peak_queued,
+                "saturation": self._saturated_samples / self._samples if self._samples else 0.0,
+                "thread_bound": self._thread_bound_samples / self._samples if self._samples else 0.0,
+                "db_pool_size": self._db_pool_size,
+                "db_checked_out": self._db_checked_out,
+                "wait_count": self._waits,
+                "wait_seconds_total": self._wait_total,
+                "wait_seconds_max": self._wait_max,
+                "wait_seconds_p50": _percentile(recent, 0.50),
+                "wait_seconds_p95": _percentile(recent, 0.95),
+                "wait_seconds_p99": _percentile(recent, 0.99),
+            }
+
+
+_stats = ThreadpoolStats()
+
+
+def get_threadpool_stats() -> ThreadpoolStats:
+    return _stats
+
+
+def _db_pool_usage():
+    """(pool size, checked-out connections) of the app engine, or Nones for pools without a size."""
+    from nta_user_svc.database import engine
+
+    pool = engine.pool
+    if not hasattr(pool, "size") or not hasattr(pool, "checkedout"):
+        return None, None
+    return pool.size(), pool.checkedout()
+
+
+def sample_threadpool() -> None:
+    """Record the current limiter and DB pool occupancy; call from within the event loop."""
+    limiter_stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    db_pool_size, db_checked_out = _db_pool_usage()
+    _stats.sample(
+        int(limiter_stats.total_tokens),
+        limiter_stats.borrowed_tokens,
+        limiter_stats.tasks_waiting,
+        db_pool_size,
+        db_checked_out,
+    )
+
+
+class ThreadpoolMonitor:
+    """Event-loop task sampling the sync-handler limiter every THREADPOOL_MONITOR_INTERVAL seconds."""
+
+    def __init__(self, interval: Optional[float] = None):
+        self._interval = float(config.THREADPOOL_MONITOR_INTERVAL if interval is None else interval)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sample_threadpool()
+            except Exception as e:
+                logger.error("Failed to sample the sync handler threadpool", exc_info=True)
+            await asyncio.sleep(self._interval)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+_monitor: Optional[ThreadpoolMonitor] = None
+
+
+def start_threadpool_monitor() -> Optional[ThreadpoolMonitor]:
+    """Start the sampling task unless THREADPOOL_MONITOR_ENABLED is off; needs a running loop."""
+    global _monitor
+    if not config.THREADPOOL_MONITOR_ENABLED:
+        return None
+    if _monitor is None:
+        _monitor = ThreadpoolMonitor()
+        _monitor.start()
+    return _monitor
+
+
+async def stop_threadpool_monitor() -> None:
+    global _monitor
+    monitor, _monitor = _monitor, None
+    if monitor is not None:
+        await monitor.stop()
@@ -0,0 +1,539 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.exceptions import HTTPException
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "nta_user_svc"
+
+# OTLP span kinds
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+# OTLP status codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# SQL text recorded on DB spans is cut to this length
+_MAX_STATEMENT_LENGTH = 500
+# traces waiting for the exporter thread; further traces are dropped (and counted)
+_EXPORT_QUEUE_SIZE = 1024
+# W3C trace context: version-traceid-parentid-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_ZERO_TRACE_ID = "0" * 32
+_ZERO_SPAN_ID = "0" * 16
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("nta_current_span", default=None)
+
+
+class Trace:
+    """The spans of one sampled request, sharing a trace id.
+
+    Span times are taken from perf_counter_ns and anchored to the wall clock once, at the
+    start of the trace, so durations are immune to clock adjustments.
+    """
+
+    __slots__ = ("trace_id", "root", "spans", "dropped_spans", "_wall_ns", "_perf_ns")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.root: Optional["Span"] = None
+        self.spans: List["Span"] = []
+        self.dropped_spans = 0
+        self._wall_ns = time.time_ns()
+        self._perf_ns = time.perf_counter_ns()
+
+    def now_ns(self) -> int:
+        return self._wall_ns + time.perf_counter_ns() - self._perf_ns
+
+    def add(self, span: "Span") -> None:
+        # list.append is atomic; spans end on the event loop and on worker threads alike
+        if len(self.spans) < int(config.TRACING_MAX_SPANS_PER_TRACE):
+            self.spans.append(span)
+        else:
+            self.dropped_spans += 1
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+        "status_message",
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent_id: Optional[str] = None,
+        kind: int = KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace = trace
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = trace.now_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        """Mark the span failed; HTTP errors below 500 are expected outcomes, not failures."""
+        if isinstance(exc, HTTPException) and exc.status_code < 500:
+            self.attributes["http.status_code"] = exc.status_code
+            return
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"[:200]
+        self.attributes["exception.type"] = type(exc).__name__
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = self.trace.now_ns()
+            self.trace.add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or self.trace.now_ns()) - self.start_ns) / 1e6
+
+
+def _new_id(bits: int) -> str:
+    return format(random.getrandbits(bits), f"0{bits // 4}x")
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of this request, or None when it is not sampled."""
+    return _current_span.get()
+
+
+class _NoopSpan:
+    """Shared stand-in for spans outside sampled requests."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, child: Span):
+        self._span = child
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        if exc is not None:
+            self._span.record_exception(exc)
+        self._span.end()
+        return False
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes: Any):
+    """Context manager recording a child of the current span, yielding the new Span.
+
+    Outside a sampled request it yields None at the cost of one context variable lookup,
+    so instrumented code pays next to nothing for the unsampled majority of requests.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return _ActiveSpan(Span(parent.trace, name, parent.span_id, kind, attributes))
+
+
+def traced(name: str) -> Callable:
+    """Decorator recording a span around every call of a sync or async function."""
+
+    def decorate(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled flag) of a W3C traceparent header, or None."""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == _ZERO_TRACE_ID or parent_id == _ZERO_SPAN_ID:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any) -> Optional[Span]:
+    """Make the sampling decision for a request and open its root span when sampled.
+
+    A valid traceparent header continues the caller's trace. Its sampled flag decides
+    sampling only with TRACING_TRUST_TRACEPARENT; otherwise, as without the header,
+    TRACING_SAMPLE_RATE does. Make the root span current with attach and close it with
+    end_trace.
+    """
+    if not config.TRACING_ENABLED:
+        return None
+    parent = parse_traceparent(traceparent)
+    if parent is not None and config.TRACING_TRUST_TRACEPARENT:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = parent[:2] if parent is not None else (None, None)
+        sampled = random.random() < float(config.TRACING_SAMPLE_RATE)
+    if not sampled:
+        return None
+    trace = Trace(trace_id or _new_id(128))
+    trace.root = Span(trace, name, parent_id, KIND_SERVER, attributes)
+    return trace.root
+
+
+def attach(s: Span) -> Token:
+    """Make ``s`` the current span; undo with detach(token)."""
+    return _current_span.set(s)
+
+
+def detach(token: Token) -> None:
+    _current_span.reset(token)
+
+
+def end_trace(root: Span) -> None:
+    """Close the root span and publish the finished trace to the buffer and the exporter."""
+    root.end()
+    get_trace_buffer().add(root.trace)
+    exporter = _exporter
+    if exporter is not None:
+        exporter.submit(root.trace)
+
+
+# ---- ring buffer -----------------------------------------------------------------------
+
+
+class TraceBuffer:
+    """The most recent finished traces, oldest dropped first."""
+
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._traces: Deque[Trace] = deque(maxlen=max(1, size))
+        self._recorded = 0
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+            self._recorded += 1
+
+    def find(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+    def recent(self, limit: int = 20, min_duration_ms: float = 0.0, name: Optional[str] = None) -> List[Trace]:
+        """Newest first, filtered by root span duration and a substring of its name."""
+        with self._lock:
+            traces = list(self._traces)
+        found = []
+        for trace in reversed(traces):
+            root = trace.root
+            if root is None or root.duration_ms < min_duration_ms:
+                continue
+            if name and name not in root.name:
+                continue
+            found.append(trace)
+            if len(found) >= limit:
+                break
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"buffered": len(self._traces), "capacity": self._traces.maxlen, "recorded": self._recorded}
+
+
+_buffer_lock = threading.Lock()
+_buffer: Optional[TraceBuffer] = None
+
+
+def get_trace_buffer() -> TraceBuffer:
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = TraceBuffer(int(config.TRACING_BUFFER_SIZE))
+        return _buffer
+
+
+def reset_trace_buffer() -> None:
+    """Discard buffered traces; the buffer is recreated from the settings on next use."""
+    global _buffer
+    with _buffer_lock:
+        _buffer = None
+
+
+# ---- serialization ---------------------------------------------------------------------
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    data = {
+        "traceId": s.trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": _otlp_attributes(s.attributes),
+        "status": {"code": s.status},
+    }
+    if s.parent_id:
+        data["parentSpanId"] = s.parent_id
+    if s.status_message:
+        data["status"]["message"] = s.status_message
+    return data
+
+
+def to_otlp(traces: List[Trace]) -> Dict[str, Any]:
+    """An OTLP/JSON ExportTraceServiceRequest holding the spans of ``traces``."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME, "process.pid": os.getpid()})},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": SERVICE_NAME},
+                        "spans": [_otlp_span(s) for trace in traces for s in list(trace.spans)],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def summarize(trace: Trace) -> Dict[str, Any]:
+    """Readable form of a trace for the debug endpoint: span offsets and durations in ms."""
+    root = trace.root
+    start_ns = root.start_ns if root is not None else 0
+    spans = sorted(list(trace.spans), key=lambda s: s.start_ns)
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name if root is not None else "",
+        "start": start_ns / 1e9,
+        "duration_ms": round(root.duration_ms, 3) if root is not None else 0.0,
+        "status": root.status if root is not None else STATUS_UNSET,
+        "span_count": len(spans),
+        "dropped_spans": trace.dropped_spans,
+        "spans": [
+            {
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "name": s.name,
+                "offset_ms": round((s.start_ns - start_ns) / 1e6, 3),
+                "duration_ms": round(s.duration_ms, 3),
+                "status": s.status,
+                "attributes": s.attributes,
+            }
+            for s in spans
+        ],
+    }
+
+
+# ---- export ----------------------------------------------------------------------------
+
+
+class TraceExporter(threading.Thread):
+    """Appends finished traces to ``<dir>/traces-<pid>.jsonl``, one OTLP/JSON request per line.
+
+    This is the line format of the OpenTelemetry Collector's file exporter and receiver.
+    Requests never wait on it: traces are queued and written every TRACING_EXPORT_INTERVAL,
+    and dropped when the queue is full. Past TRACING_EXPORT_MAX_BYTES the file is renamed
+    to ``.1``, replacing the previous one.
+    """
+
+    def __init__(self, directory: str, interval: float, max_bytes: int):
+        super().__init__(name="trace-export", daemon=True)
+        self._path = os.path.join(directory, f"traces-{os.getpid()}.jsonl")
+        self._interval = interval
+        self._max_bytes = max_bytes
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=_EXPORT_QUEUE_SIZE)
+        self._stop_event = threading.Event()
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        traces = []
+        while True:
+            try:
+                traces.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not traces:
+            return
+        try:
+            line = json.dumps(to_otlp(traces), separators=(",", ":")) + "\n"
+            if os.path.exists(self._path) and os.path.getsize(self._path) + len(line) > self._max_bytes:
+                os.replace(self._path, f"{self._path}.1")
+            with open(self._path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+        except Exception as e:
+            logger.error("Failed to export %d traces", len(traces), exc_info=True)
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self._interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join(timeout=5)
+        self.flush()
+
+
+_exporter: Optional[TraceExporter] = None
+
+
+def start_tracing() -> None:
+    """Start the OTLP file exporter when TRACING_EXPORT_DIR is set."""
+    global _exporter
+    if not config.TRACING_ENABLED or not config.TRACING_EXPORT_DIR or _exporter is not None:
+        return
+    _exporter = TraceExporter(
+        config.TRACING_EXPORT_DIR, float(config.TRACING_EXPORT_INTERVAL), int(config.TRACING_EXPORT_MAX_BYTES)
+    )
+    _exporter.start()
+
+
+def stop_tracing() -> None:
+    """Stop the exporter after writing the traces still queued."""
+    global _exporter
+    exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.stop()
+
+
+# ---- database --------------------------------------------------------------------------
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    parent = _current_span.get()
+    if parent is None:
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    db_span = Span(
+        parent.trace,
+        f"db.{operation.lower() or 'statement'}",
+        parent.span_id,
+        KIND_CLIENT,
+        {
+            "db.system": conn.engine.dialect.name,
+            "db.operation": operation,
+            "db.statement": statement[:_MAX_STATEMENT_LENGTH],
+        },
+    )
+    conn.info.setdefault("nta_trace_spans", []).append(db_span)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    spans = conn.info.get("nta_trace_spans")
+    if not spans:
+        return
+    db_span = spans.pop()
+    if cursor is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+        db_span.attributes["db.rowcount"] = cursor.rowcount
+    db_span.end()
+
+
+def _handle_error(exception_context) -> None:
+    conn = exception_context.connection
+    spans = conn.info.get("nta_trace_spans") if conn is not None else None
+    if not spans:
+        return
+    db_span = spans.pop()
+    db_span.record_exception(exception_context.original_exception)
+    db_span.end()
+
+
+def trace_engine(engine: Engine) -> None:
+    """Record a span for every statement executed through ``engine`` in a sampled request."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
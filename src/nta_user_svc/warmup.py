@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import nta_user_svc.config as config
+
+logger = logging.getLogger(__name__)
+
+# bcrypt hash of "warmup" at the minimum cost factor: checking it loads and exercises bcrypt
+# without spending a full PASSWORD_HASH_ROUNDS hash on startup
+_WARMUP_HASH = "$2b$04$n4m0clIilkX4Y0nSzDpj9OFXgSAo4q47ARZaVRsLVcuAw6/Hktq.2"
+# user id that never exists, so the warm-up queries read nothing
+_ABSENT_ID = 0
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_timings: Dict[str, float] = {}
+_thread: Optional[threading.Thread] = None
+
+
+def _prime_pool(engine: Engine) -> None:
+    """Check out WARMUP_DB_CONNECTIONS connections at once, so the pool keeps that many open."""
+    connections = []
+    try:
+        for _ in range(max(1, int(config.WARMUP_DB_CONNECTIONS))):
+            conn = engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def _compile_queries(engine: Engine) -> None:
+    """Run the hot read statements once each so their compiled forms are cached."""
+    from nta_user_svc.models import Profile, User
+    from nta_user_svc.services.profile_service import ProfileService
+
+    with Session(bind=engine) as db:
+        # get_current_user
+        db.get(User, _ABSENT_ID)
+        # profile reads (users router)
+        ProfileService(db).get_profile_by_user_id(_ABSENT_ID)
+        # login
+        db.execute(select(User).where(User.email == "warmup@invalid")).scalars().first()
+        # photo download / upload
+        db.execute(select(Profile).where(Profile.user_id == _ABSENT_ID)).scalars().first()
+        # signed photo URLs
+        db.execute(select(Profile.profile_photo_path).where(Profile.user_id == _ABSENT_ID)).scalar_one_or_none()
+
+
+def _build_serializers() -> None:
+    from nta_user_svc.schemas.profile import ProfileOut, ProfilePublic
+    from nta_user_svc.schemas.serializers import dump_json
+
+    now = datetime.now(timezone.utc)
+    sample = {"id": 1, "user_id": 1, "email": "warmup@example.com", "created_at": now, "updated_at": now}
+    dump_json(ProfileOut, sample)
+    dump_json(ProfilePublic, sample)
+
+
+def _load_password_hashing() -> None:
+    from nta_user_svc.security.passwords import verify_password
+
+    verify_password("warmup", _WARMUP_HASH)
+
+
+def _load_imaging() -> None:
+    # registers Pillow's format plugins ahead of the first upload
+    from PIL import Image
+
+    Image.init()
+
+
+def warmup_steps(engine: Engine) -> List[Tuple[str, Callable[[], None]]]:
+    return [
+        ("db_pool", lambda: _prime_pool(engine)),
+        ("queries", lambda: _compile_queries(engine)),
+        ("serializers", _build_serializers),
+        ("bcrypt", _load_password_hashing),
+        ("imaging", _load_imaging),
+    ]
+
+
+def run_warmup(engine: Optional[Engine] = None) -> Dict[str, float]:
+    """Run every warm-up step, then mark the service ready; returns seconds per step.
+
+    A failing step is logged and skipped: warm-up only shifts first-request costs, it
+    must never keep a working service from becoming ready.
+    """
+    if engine is None:
+        from nta_user_svc.database import engine
+
+    timings: Dict[str, float] = {}
+    for name, step in warmup_steps(engine):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.error("Warm-up step %s failed", name, exc_info=True)
+        timings[name] = time.perf_counter() - started
+    with _lock:
+        _timings.clear()
+        _timings.update(timings)
+    _ready.set()
+    logger.info("Warm-up finished in %.3fs: %s", sum(timings.values()), timings)
+    return timings
+
+
+def start_warmup(engine: Optional[Engine] = None) -> Optional[threading.Thread]:
+    """Start warm-up in a background thread, or mark the service ready at once when
+    WARMUP_ENABLED is off. The server accepts requests meanwhile; only readiness waits."""
+    global _thread
+    if not config.WARMUP_ENABLED:
+        _ready.set()
+        return None
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _ready.clear()
+            _thread = threading.Thread(target=run_warmup, args=(engine,), name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    return _ready.wait(timeout)
+
+
+def warmup_timings() -> Dict[str, float]:
+    with _lock:
+        return dict(_timings)
+
+
+def reset_warmup() -> None:
+    """Forget warm-up results (tests)."""
+    global _thread
+    with _lock:
+        _thread = None
+        _timings.clear()
+    _ready.clear()
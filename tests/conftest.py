@@ -39,4 +39,29 @@ def client(session_local):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides[get_db] = get_db
-# DO NOT MODIFY SECTION END
\ No newline at end of file
+# DO NOT MODIFY SECTION END
+
+@pytest.fixture(autouse=True)
+def _no_photo_deletion_worker(monkeypatch):
+    # Tests drain the photo deletion outbox explicitly; a background drain would share
+    # the single in-memory SQLite connection with the test thread.
+    import nta_user_svc.config as config
+
+    monkeypatch.setattr(config, "PHOTO_DELETION_WORKER_ENABLED", False)
+
+
+@pytest.fixture(autouse=True)
+def _no_startup_warmup(monkeypatch):
+    # The warm-up thread would query the module engine, not the per-test database
+    import nta_user_svc.config as config
+
+    monkeypatch.setattr(config, "WARMUP_ENABLED", False)
+
+
+@pytest.fixture(autouse=True)
+def _no_trace_sampling(monkeypatch):
+    # Sampled requests gain an X-Trace-Id header; tests opt in with a traceparent header
+    import nta_user_svc.config as config
+
+    monkeypatch.setattr(config, "TRACING_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(config, "TRACING_TRUST_TRACEPARENT", True)
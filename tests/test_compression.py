@@ -0,0 +1,121 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import nta_user_svc.config as config
+from nta_user_svc.middleware import CompressionMiddleware, get_compression_stats
+from nta_user_svc.middleware.compression import negotiate_encoding
+
+BODY = b"nta-user-svc " * 400
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse(BODY, headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse(b"tiny")
+
+    @app.get("/image")
+    def image():
+        return Response(BODY, media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BODY, BODY]), media_type="text/plain")
+
+    return app
+
+
+@pytest.fixture
+def compression_client(monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(config, "COMPRESSION_MIN_SIZE", 1024)
+    monkeypatch.setattr(config, "COMPRESSION_ENCODINGS", ["zstd", "br", "gzip"])
+    get_compression_stats().reset()
+    return TestClient(make_app())
+
+
+def test_negotiate_encoding():
+    supported = ["zstd", "br", "gzip"]
+    assert negotiate_encoding(None, supported) is None
+    assert negotiate_encoding("identity", supported) is None
+    assert negotiate_encoding("gzip, deflate", supported) == "gzip"
+    # ties go to the server preference, q-values override it
+    assert negotiate_encoding("gzip, br, zstd", supported) == "zstd"
+    assert negotiate_encoding("gzip;q=1.0, zstd;q=0.5", supported) == "gzip"
+    assert negotiate_encoding("*", supported) == "zstd"
+    assert negotiate_encoding("*, zstd;q=0", supported) == "br"
+    assert negotiate_encoding("br", ["gzip"]) is None
+
+
+def test_gzip_response_is_compressed(compression_client, monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION_ENCODINGS", ["gzip"])
+    resp = compression_client.get("/text", headers={"Accept-Encoding": "gzip"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in resp.headers["vary"].lower()
+    assert resp.headers["etag"] == 'W/"abc"'
+    assert int(resp.headers["content-length"]) < len(BODY)
+    assert resp.content == BODY
+
+    stats = get_compression_stats().stats()["encodings"]["gzip"]
+    assert stats["responses"] == 1
+    assert stats["bytes_in"] == len(BODY)
+    assert stats["ratio"] > 1
+    assert stats["cpu_seconds"] >= 0
+
+
+def test_streaming_response_is_compressed_incrementally(compression_client, monkeypatch):
+    monkeypatch.setattr(config, "COMPRESSION_ENCODINGS", ["gzip"])
+    with compression_client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as resp:
+        raw = b"".join(resp.iter_raw())
+
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "content-length" not in resp.headers
+    assert gzip.decompress(raw) == BODY * 2
+    assert get_compression_stats().stats()["encodings"]["gzip"]["bytes_in"] == len(BODY) * 2
+
+
+def test_small_and_image_bodies_are_not_compressed(compression_client):
+    small = compression_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.content == b"tiny"
+
+    image = compression_client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in image.headers
+    assert image.content == BODY
+
+    assert get_compression_stats().stats()["skipped"] == {"small": 1, "content_type": 1}
+
+
+def test_disabled_or_unaccepted_is_identity(compression_client, monkeypatch):
+    resp = compression_client.get("/text", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in resp.headers
+
+    monkeypatch.setattr(config, "COMPRESSION_ENABLED", False)
+    resp = compression_client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in resp.headers
+    assert resp.content == BODY
+
+
+@pytest.mark.parametrize("encoding,module", [("zstd", "zstandard"), ("br", "brotli")])
+def test_optional_encodings(compression_client, encoding, module):
+    lib = pytest.importorskip(module)
+    with compression_client.stream("GET", "/text", headers={"Accept-Encoding": encoding}) as resp:
+        raw = b"".join(resp.iter_raw())
+
+    assert resp.headers["content-encoding"] == encoding
+    if encoding == "zstd":
+        assert lib.ZstdDecompressor().decompress(raw, max_output_size=len(BODY)) == BODY
+    else:
+        assert lib.decompress(raw) == BODY
@@ -30,7 +30,7 @@ def test_save_profile_photo_accepts_valid_images(tmp_path, monkeypatch):
     for fmt, filename, content_type in [("JPEG", "photo.jpg", "image/jpeg"), ("PNG", "photo.png", "image/png"), ("WEBP", "photo.webp", "image/webp")]:
         data = make_image_bytes(fmt=fmt)
         upload = DummyUploadFile(filename=filename, content_type=content_type, data=data)
-        relative = save_profile_photo(upload, user_id)
+        relative = save_profile_photo(upload, user_id).relative_path
         assert relative.startswith(f"{user_id}/")
         full = get_full_file_path(relative)
         assert full.exists()
@@ -66,8 +66,8 @@ def test_save_profile_photo_unique_filenames(tmp_path, monkeypatch):
     data = make_image_bytes(fmt="JPEG")
     upload1 = DummyUploadFile(filename="a.jpg", content_type="image/jpeg", data=data)
     upload2 = DummyUploadFile(filename="a.jpg", content_type="image/jpeg", data=data)
-    r1 = save_profile_photo(upload1, 4)
-    r2 = save_profile_photo(upload2, 4)
+    r1 = save_profile_photo(upload1, 4).relative_path
+    r2 = save_profile_photo(upload2, 4).relative_path
     assert r1 != r2
     remove_file(r1)
     remove_file(r2)
@@ -79,7 +79,7 @@ def test_files_stored_in_user_subdirectory(tmp_path, monkeypatch):
 
     data = make_image_bytes(fmt="PNG")
     upload = DummyUploadFile(filename="x.png", content_type="image/png", data=data)
-    relative = save_profile_photo(upload, 42)
+    relative = save_profile_photo(upload, 42).relative_path
     assert relative.startswith("42/")
     full = get_full_file_path(relative)
     assert full.exists()
@@ -93,7 +93,7 @@ def test_remove_file_deletes_file(tmp_path, monkeypatch):
 
     data = make_image_bytes(fmt="PNG")
     upload = DummyUploadFile(filename="r.png", content_type="image/png", data=data)
-    relative = save_profile_photo(upload, 99)
+    relative = save_profile_photo(upload, 99).relative_path
     full = get_full_file_path(relative)
     assert full.exists()
     remove_file(relative)
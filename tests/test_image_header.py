@@ -0,0 +1,76 @@
+import io
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.storage.files import save_profile_photo
+from nta_user_svc.storage.image_header import ImageHeader, check_image_limits, inspect_image_header
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def encode(img: Image.Image, fmt: str, **kwargs) -> bytes:
+    bio = io.BytesIO()
+    img.save(bio, format=fmt, **kwargs)
+    return bio.getvalue()
+
+
+@pytest.mark.parametrize(
+    "fmt,kwargs",
+    [
+        ("PNG", {}),
+        ("JPEG", {}),
+        ("JPEG", {"progressive": True, "exif": Image.Exif()}),
+        ("WEBP", {}),
+        ("WEBP", {"lossless": True}),
+        ("WEBP", {"exif": b"Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x00"}),
+    ],
+)
+def test_inspect_reads_dimensions(fmt, kwargs):
+    data = encode(Image.new("RGB", (123, 45), (1, 2, 3)), fmt, **kwargs)
+    assert inspect_image_header(io.BytesIO(data)) == ImageHeader(fmt, 123, 45, 1)
+
+
+def test_inspect_detects_animation():
+    frames = [Image.new("RGB", (8, 8), c) for c in ((255, 0, 0), (0, 255, 0))]
+    apng = encode(frames[0], "PNG", save_all=True, append_images=frames[1:])
+    webp = encode(frames[0], "WEBP", save_all=True, append_images=frames[1:])
+    assert inspect_image_header(io.BytesIO(apng)).frames == 2
+    assert inspect_image_header(io.BytesIO(webp)).frames > 1
+
+
+def test_inspect_rejects_garbage():
+    with pytest.raises(ValueError):
+        inspect_image_header(io.BytesIO(b"GIF89a" + b"\x00" * 20))
+    with pytest.raises(ValueError):
+        inspect_image_header(io.BytesIO(b"\x89PNG\r\n\x1a\n\x00"))
+
+
+def test_check_image_limits(monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_MAX_WIDTH", 100)
+    monkeypatch.setattr(config, "PHOTO_MAX_HEIGHT", 100)
+    monkeypatch.setattr(config, "PHOTO_MAX_PIXELS", 5000)
+    check_image_limits(ImageHeader("PNG", 100, 50, 1))
+    for header in (ImageHeader("PNG", 101, 1, 1), ImageHeader("PNG", 1, 101, 1), ImageHeader("PNG", 100, 51, 1)):
+        with pytest.raises(ValueError):
+            check_image_limits(header)
+    with pytest.raises(ValueError, match="animated"):
+        check_image_limits(ImageHeader("WEBP", 10, 10, 2))
+
+
+def test_save_rejects_decompression_bomb(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 1048576)
+    # 30 megapixels of a single colour compress to a few kilobytes
+    bomb = encode(Image.new("1", (10000, 3000)), "PNG")
+    assert len(bomb) < 100000
+
+    with pytest.raises(ValueError, match="too large"):
+        save_profile_photo(DummyUploadFile("bomb.png", "image/png", bomb), 1)
+    assert list((tmp_path / ".incoming").iterdir()) == []
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules that must not be imported by `import nta_user_svc.app`; they are loaded on first use
+LAZY_MODULES = ("PIL", "bcrypt", "zstandard", "brotli", "nta_user_svc.storage.backends.s3")
+# Self time of this package's own modules (route and schema construction included).
+# Generous for slow CI machines; IMPORT_TIME_BUDGET_MS tightens or relaxes it.
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 600))
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+
+
+def _import_app():
+    env = {**os.environ, "PYTHONPATH": SRC, "LOAD_DOTENV": "false", "JWT_SECRET": "test"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import nta_user_svc.app"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows[name.strip()] = int(self_us)
+    return rows
+
+
+@pytest.fixture(scope="module")
+def import_runs():
+    return [_import_app() for _ in range(3)]
+
+
+def test_heavy_dependencies_are_imported_lazily(import_runs):
+    imported = import_runs[0]
+    assert "nta_user_svc.app" in imported
+    eager = [name for name in LAZY_MODULES if name in imported]
+    assert eager == []
+
+
+def test_own_import_time_within_budget(import_runs):
+    own_ms = min(
+        sum(us for name, us in rows.items() if name.startswith("nta_user_svc")) / 1000 for rows in import_runs
+    )
+    assert own_ms <= IMPORT_TIME_BUDGET_MS, f"nta_user_svc modules took {own_ms:.0f} ms to import"
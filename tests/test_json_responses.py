@@ -0,0 +1,68 @@
+from typing import List
+
+import pytest
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.routers.responses import ORJSONResponse
+from nta_user_svc.schemas.profile import ProfileOut, ProfilePublic
+from nta_user_svc.schemas.serializers import dump_json, type_adapter
+from nta_user_svc.security.jwt import create_access_token
+
+
+def _user_with_profile(db_session, email: str):
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    profile = Profile(user_id=user.id, name="Zoë", bio="héllo", phone="+123", photo_placeholder="L00000fQfQfQ")
+    db_session.add(profile)
+    db_session.commit()
+    return user, {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+
+def test_type_adapters_are_cached():
+    assert type_adapter(ProfilePublic) is type_adapter(ProfilePublic)
+    assert type_adapter(List[ProfilePublic]) is type_adapter(List[ProfilePublic])
+
+
+def test_dump_json_matches_model_dump(db_session):
+    user, _ = _user_with_profile(db_session, "dump@example.com")
+    profile = db_session.query(Profile).filter_by(user_id=user.id).one()
+    profile.email = user.email
+    assert dump_json(ProfileOut, profile) == ProfileOut.model_validate(profile).model_dump_json().encode()
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_profile_endpoints_are_identical_with_and_without_fast_path(client, db_session, monkeypatch, fast):
+    monkeypatch.setattr(config, "FAST_JSON_RESPONSES", fast)
+    user, headers = _user_with_profile(db_session, f"fast{fast}@example.com")
+
+    own = client.get("/api/users/me/profile", headers=headers)
+    public = client.get(f"/api/profiles/{user.id}", headers=headers)
+    updated = client.put("/api/profiles/me", json={"hobby": "chess"}, headers=headers)
+    for resp in (own, public, updated):
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/json"
+
+    assert own.json()["email"] == user.email
+    assert own.json()["name"] == "Zoë"
+    assert "email" not in public.json()
+    assert public.json()["photo_placeholder"] == "L00000fQfQfQ"
+    assert updated.json()["hobby"] == "chess"
+    assert set(own.json()) == set(ProfileOut.model_fields)
+    assert set(public.json()) == set(ProfilePublic.model_fields)
+
+
+def test_create_keeps_201(client, db_session):
+    user = User(email="created@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+    resp = client.post("/api/profiles", json={"name": "New"}, headers=headers)
+    assert resp.status_code == 201
+    assert resp.json()["name"] == "New"
+
+
+def test_orjson_response_renders_compact_utf8():
+    pytest.importorskip("orjson")
+    assert ORJSONResponse({"a": "é", 1: [1, 2]}).body == '{"a":"é","1":[1,2]}'.encode()
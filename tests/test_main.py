@@ -0,0 +1,28 @@
+import nta_user_svc.config as config
+from nta_user_svc.main import build_config
+
+
+def test_build_config_reads_server_settings(monkeypatch):
+    monkeypatch.setattr(config, "SERVER_HOST", "127.0.0.1")
+    monkeypatch.setattr(config, "SERVICE_PORT", "9001")
+    monkeypatch.setattr(config, "SERVER_LOOP", "asyncio")
+    monkeypatch.setattr(config, "SERVER_HTTP", "h11")
+    monkeypatch.setattr(config, "SERVER_BACKLOG", 512)
+    monkeypatch.setattr(config, "SERVER_KEEP_ALIVE", 15)
+    monkeypatch.setattr(config, "SERVER_LIMIT_CONCURRENCY", 0)
+
+    uv_config = build_config()
+    assert (uv_config.host, uv_config.port) == ("127.0.0.1", 9001)
+    assert (uv_config.loop, uv_config.http) == ("asyncio", "h11")
+    assert uv_config.backlog == 512
+    assert uv_config.timeout_keep_alive == 15
+    # 0 means unlimited
+    assert uv_config.limit_concurrency is None
+
+
+def test_build_config_arguments_override(monkeypatch):
+    monkeypatch.setattr(config, "SERVER_LIMIT_CONCURRENCY", 0)
+    uv_config = build_config(port=9002, keep_alive=2, limit_concurrency=100)
+    assert uv_config.port == 9002
+    assert uv_config.timeout_keep_alive == 2
+    assert uv_config.limit_concurrency == 100
@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+import threading
+
+import nta_user_svc.config as config
+from nta_user_svc.metrics import REGISTRY, MetricsRegistry, instrument_engine
+from nta_user_svc.metrics.registry import merge_snapshots, read_snapshots, render_snapshot, write_snapshot
+from nta_user_svc.models import User
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.security.passwords import hash_password, verify_password
+from nta_user_svc.storage.photo_cache import reset_photo_cache
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["route"])
+    temperature = registry.gauge("temperature", 'A "quoted" gauge.')
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+    requests.labels(route="/a").inc()
+    requests.labels("/a").inc(2)
+    requests.labels("/b\n").inc()
+    temperature.set(21.5)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    registry.add_collector(lambda: [("items", "gauge", "Items.", [({"kind": "x"}, 3)])])
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'requests_total{route="/b\\n"} 1' in text
+    assert '# HELP temperature A \\"quoted\\" gauge.' in text
+    assert "temperature 21.5" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_sum 5.55" in text
+    assert "latency_seconds_count 3" in text
+    assert 'items{kind="x"} 3' in text
+
+
+def test_multiprocess_snapshots_are_merged(tmp_path):
+    def worker_snapshot(count, gauge_value):
+        registry = MetricsRegistry()
+        registry.counter("jobs_total", "Jobs.").inc(count)
+        registry.gauge("busy", "Busy.").set(gauge_value)
+        registry.gauge("lag", "Lag.", aggregate="max").set(gauge_value)
+        registry.histogram("wait_seconds", "Wait.", buckets=(1.0,)).observe(count)
+        return registry.snapshot()
+
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        write_snapshot(str(tmp_path), worker_snapshot(2, 5), pid=live.pid)
+        write_snapshot(str(tmp_path), worker_snapshot(3, 7), pid=_dead_pid())
+        text = render_snapshot(merge_snapshots(read_snapshots(str(tmp_path))))
+    finally:
+        live.kill()
+        live.wait()
+
+    # counters and histograms of exited workers still count, their gauges do not
+    assert "jobs_total 5" in text
+    assert "wait_seconds_count 2" in text
+    assert "busy 5" in text
+    assert "lag 5" in text
+
+
+def test_metrics_endpoint_reports_routes_and_db(client, db_session, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_MULTIPROC_DIR", "")
+    monkeypatch.setattr(config, "PHOTO_CACHE_MAX_BYTES", 1024 * 1024)
+    reset_photo_cache()
+    instrument_engine(db_session.get_bind())
+    REGISTRY.reset()
+
+    user = User(email="metrics@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    token = create_access_token({"user_id": user.id})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get(f"/api/profiles/{user.id}", headers=headers).status_code == 404
+    assert client.get("/no/such/path").status_code == 404
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    assert 'http_requests_total{method="GET",route="/api/profiles/{user_id}",status="404"} 1' in text
+    assert f"/api/profiles/{user.id}" not in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/profiles/{user_id}"} 1' in text
+    assert 'db_queries_total{operation="SELECT"}' in text
+    assert "db_query_duration_seconds_bucket" in text
+    # statistics of other components are exported as well
+    assert "# TYPE photo_cache_hits_total counter" in text
+    assert "# TYPE threadpool_queued gauge" in text
+    reset_photo_cache()
+
+
+def test_password_timings_are_recorded(monkeypatch):
+    monkeypatch.setattr("nta_user_svc.security.passwords.PASSWORD_HASH_ROUNDS", 4)
+    REGISTRY.reset()
+
+    hashed = hash_password("secret123")
+    assert verify_password("secret123", hashed)
+
+    text = REGISTRY.render()
+    assert "password_hash_duration_seconds_count 1" in text
+    assert "password_verify_duration_seconds_count 1" in text
+
+
+def test_render_and_snapshot_writer_do_not_race(tmp_path):
+    registry = MetricsRegistry()
+    jobs = registry.counter("jobs_total", "Jobs.")
+    errors = []
+
+    def hammer(action):
+        try:
+            for _ in range(200):
+                jobs.inc()
+                action()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=hammer, args=(lambda: write_snapshot(str(tmp_path), registry.snapshot()),)),
+        threading.Thread(target=hammer, args=(lambda: registry.render(str(tmp_path)),)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+    # a stale file of this process is superseded by its live series
+    write_snapshot(str(tmp_path), {})
+    assert "jobs_total 400" in registry.render(str(tmp_path))
@@ -6,7 +6,7 @@ from sqlalchemy.exc import IntegrityError
 
 import nta_user_svc.config as config
 from nta_user_svc.storage.files import save_profile_photo, get_full_file_path, remove_file
-from nta_user_svc.services import init_profile_photo_cleanup_listeners
+from nta_user_svc.services import drain_photo_deletions, init_profile_photo_cleanup_listeners
 from nta_user_svc.models import User, Profile
 
 
@@ -55,7 +55,7 @@ def test_user_profile_crud(db_session, tmp_path, monkeypatch):
         data = bio.getvalue()
 
         upload = type("DummyUploadFile", (), {"filename": "p.jpg", "content_type": "image/jpeg", "file": io.BytesIO(data)})()
-        relative = save_profile_photo(upload, user.id)
+        relative = save_profile_photo(upload, user.id).relative_path
 
         # attach to profile and commit
         profile.profile_photo_path = relative
@@ -65,11 +65,12 @@ def test_user_profile_crud(db_session, tmp_path, monkeypatch):
         full = get_full_file_path(relative)
         assert full.exists()
 
-        # Delete profile and ensure file is removed by listener
+        # Delete profile and ensure file removal is queued by listener
         db_session.delete(profile)
         db_session.commit()
 
-        # After commit, file should no longer exist
+        # Once the deletion outbox is drained, file should no longer exist
+        drain_photo_deletions(db_session)
         assert not full.exists()
 
         # Also verify user.profile is None
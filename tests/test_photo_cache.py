@@ -0,0 +1,145 @@
+import io
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.services import drain_photo_deletions
+from nta_user_svc.storage import photo_cache
+from nta_user_svc.storage import files as storage_files
+from nta_user_svc.storage.files import save_profile_photo
+from nta_user_svc.storage.photo_cache import CachedPhoto, PhotoCache, photo_cache_key
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def _entry(size: int) -> CachedPhoto:
+    return CachedPhoto("p", b"x" * size, "image/png", 0.0)
+
+
+def test_lru_eviction_is_byte_bounded():
+    cache = PhotoCache(max_bytes=100, max_item_bytes=60)
+    assert cache.put("a", _entry(40))
+    assert cache.put("b", _entry(40))
+    assert cache.get("a") is not None  # "b" becomes least recently used
+    assert cache.put("c", _entry(40))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert not cache.put("big", _entry(61))
+
+    stats = cache.stats()
+    assert stats["bytes"] == 80
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.75
+
+
+def test_invalidate_drops_every_representation():
+    cache = PhotoCache(max_bytes=1000, max_item_bytes=1000)
+    cache.put(photo_cache_key("1/abc.png", None, ""), _entry(10))
+    cache.put(photo_cache_key("1/abc.png", 48, "webp=1"), _entry(10))
+    cache.put(photo_cache_key("1/abd.png", None, ""), _entry(10))
+    assert cache.invalidate("1/abc.png") == 2
+    assert cache.stats()["bytes"] == 10
+
+
+def test_eviction_and_replacement_keep_the_path_index():
+    cache = PhotoCache(max_bytes=30, max_item_bytes=30)
+    small, webp = photo_cache_key("1/abc.png", 48, ""), photo_cache_key("1/abc.png", None, "webp=1")
+    cache.put(small, _entry(10))
+    cache.put(small, _entry(10))
+    cache.put(webp, _entry(10))
+    cache.put(photo_cache_key("1/abd.png", None, ""), _entry(20))  # evicts "small"
+    assert cache.get(small) is None
+
+    assert cache.invalidate("1/abc.png") == 1
+    assert cache.invalidate("1/abc.png") == 0
+    assert cache.stats() == {**cache.stats(), "entries": 1, "bytes": 20}
+    # evicted and invalidated keys leave no stale index entries behind
+    assert cache._keys_by_path == {"1/abd.png": {photo_cache_key("1/abd.png", None, "")}}
+
+
+@pytest.fixture
+def cached_photo(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_CACHE_MAX_BYTES", 1 << 20)
+    photo_cache.reset_photo_cache()
+    user = User(email="cache@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    data = make_image_bytes()
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", data), user.id).relative_path
+    db_session.add(Profile(user_id=user.id, profile_photo_path=relative))
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+    yield user, headers, relative, data
+    photo_cache.reset_photo_cache()
+
+
+def test_second_request_is_served_from_memory(client, cached_photo, monkeypatch):
+    user, headers, relative, data = cached_photo
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.status_code == 200
+    assert resp.content == data
+
+    # the file is no longer touched once cached
+    def _no_disk(*args, **kwargs):
+        raise AssertionError("disk accessed on a cache hit")
+
+    monkeypatch.setattr(storage_files, "get_full_file_path", _no_disk)
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.status_code == 200
+    assert resp.content == data
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.headers["content-length"] == str(len(data))
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**headers, "Range": "bytes=0-3"})
+    assert resp.status_code == 206
+    assert resp.content == data[:4]
+    assert resp.headers["content-range"] == f"bytes 0-3/{len(data)}"
+
+    stats = photo_cache.get_photo_cache().stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["bytes"] == len(data)
+
+
+def test_files_above_item_cap_are_not_cached(client, cached_photo, monkeypatch):
+    user, headers, _, data = cached_photo
+    monkeypatch.setattr(config, "PHOTO_CACHE_MAX_FILE_BYTES", len(data) - 1)
+    photo_cache.reset_photo_cache()
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.content == data
+    assert photo_cache.get_photo_cache().stats()["entries"] == 0
+
+
+def test_removed_photo_leaves_the_cache(client, db_session, cached_photo):
+    user, headers, relative, _ = cached_photo
+    client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert photo_cache.get_photo_cache().stats()["entries"] == 1
+
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("b.png", make_image_bytes(color=(0, 0, 255)), "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    drain_photo_deletions(db_session)
+    assert photo_cache.get_photo_cache().stats()["entries"] == 0
@@ -0,0 +1,184 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile, PhotoBlob, PhotoDeletion
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.services import (
+    confirm_photo_reservation,
+    drain_photo_deletions,
+    init_profile_photo_cleanup_listeners,
+    reserve_photo,
+)
+from nta_user_svc.storage.files import content_address_of, get_full_file_path, save_profile_photo
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+@pytest.fixture
+def dedup_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_DEDUP_ENABLED", True)
+    return tmp_path
+
+
+def _user_with_token(db_session, email: str):
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    return user, {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+
+def _upload(client, user, headers, data: bytes) -> str:
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("p.png", data, "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    return resp.json()["profile_photo_path"]
+
+
+def test_identical_content_stored_once(dedup_storage):
+    data = make_image_bytes()
+    r1 = save_profile_photo(DummyUploadFile("a.png", "image/png", data), 1).relative_path
+    r2 = save_profile_photo(DummyUploadFile("b.png", "image/png", data), 2).relative_path
+    assert r1 == r2
+    assert content_address_of(r1) is not None
+    assert r1.startswith("sha256/")
+    assert get_full_file_path(r1).read_bytes() == data
+    assert content_address_of("42/abcdef.png") is None
+
+
+def test_upload_counts_references_and_releases_on_replace(client, db_session, dedup_storage):
+    shared = make_image_bytes(color=(1, 2, 3))
+    alice, alice_headers = _user_with_token(db_session, "dedup_a@example.com")
+    bob, bob_headers = _user_with_token(db_session, "dedup_b@example.com")
+
+    path = _upload(client, alice, alice_headers, shared)
+    assert _upload(client, bob, bob_headers, shared) == path
+    db_session.expire_all()
+    assert db_session.get(PhotoBlob, content_address_of(path)).ref_count == 2
+
+    # Alice moves to another picture: the shared file survives for Bob
+    _upload(client, alice, alice_headers, make_image_bytes(color=(9, 9, 9)))
+    drain_photo_deletions(db_session)
+    db_session.expire_all()
+    assert db_session.get(PhotoBlob, content_address_of(path)).ref_count == 1
+    assert get_full_file_path(path).exists()
+
+    # Bob too: last reference gone, file and row removed
+    _upload(client, bob, bob_headers, make_image_bytes(color=(7, 7, 7)))
+    drain_photo_deletions(db_session)
+    db_session.expire_all()
+    assert db_session.get(PhotoBlob, content_address_of(path)) is None
+    assert not get_full_file_path(path).exists()
+
+
+def test_delete_listener_decrements_reference(client, db_session, dedup_storage):
+    init_profile_photo_cleanup_listeners()
+    shared = make_image_bytes(color=(4, 5, 6))
+    alice, alice_headers = _user_with_token(db_session, "dedup_c@example.com")
+    bob, bob_headers = _user_with_token(db_session, "dedup_d@example.com")
+    path = _upload(client, alice, alice_headers, shared)
+    _upload(client, bob, bob_headers, shared)
+
+    db_session.delete(db_session.query(Profile).filter_by(user_id=alice.id).one())
+    db_session.commit()
+    drain_photo_deletions(db_session)
+    assert get_full_file_path(path).exists()
+    assert db_session.get(PhotoBlob, content_address_of(path)).ref_count == 1
+
+    db_session.delete(db_session.query(Profile).filter_by(user_id=bob.id).one())
+    db_session.commit()
+    drain_photo_deletions(db_session)
+    assert not get_full_file_path(path).exists()
+    assert db_session.get(PhotoBlob, content_address_of(path)) is None
+
+
+def test_reupload_survives_drain_of_queued_removal(client, db_session, dedup_storage, monkeypatch):
+    import nta_user_svc.routers.photos as photos_router
+
+    shared = make_image_bytes(color=(3, 1, 4))
+    alice, alice_headers = _user_with_token(db_session, "dedup_e@example.com")
+    path = _upload(client, alice, alice_headers, shared)
+    # replacing it drops the last reference and queues the file's removal
+    _upload(client, alice, alice_headers, make_image_bytes(color=(2, 7, 1)))
+    full = get_full_file_path(path)
+    old_mtime = full.stat().st_mtime - 3600
+    os.utime(full, (old_mtime, old_mtime))
+
+    commit = photos_router._commit_new_photo
+
+    def drain_then_commit(db, *args, **kwargs):
+        # the deletion worker runs between storing the upload and committing the profile
+        drain_photo_deletions(db)
+        return commit(db, *args, **kwargs)
+
+    monkeypatch.setattr(photos_router, "_commit_new_photo", drain_then_commit)
+    bob, bob_headers = _user_with_token(db_session, "dedup_f@example.com")
+    assert _upload(client, bob, bob_headers, shared) == path
+
+    assert full.read_bytes() == shared
+    assert full.stat().st_mtime > old_mtime
+    db_session.expire_all()
+    assert db_session.get(PhotoBlob, content_address_of(path)).ref_count == 1
+    assert db_session.query(PhotoDeletion).filter_by(path=path).count() == 0
+
+
+def test_failed_upload_leaves_no_profile_and_releases_reservation(client, db_session, dedup_storage, monkeypatch):
+    import nta_user_svc.routers.photos as photos_router
+
+    def fail_commit(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(photos_router, "_commit_new_photo", fail_commit)
+    user, headers = _user_with_token(db_session, "dedup_g@example.com")
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("p.png", make_image_bytes(color=(8, 8, 8)), "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 500
+
+    db_session.expire_all()
+    assert db_session.query(Profile).filter_by(user_id=user.id).count() == 0
+    assert db_session.query(PhotoBlob).count() == 0
+    # the reservation is gone and the unreferenced file is queued for removal
+    (entry,) = db_session.query(PhotoDeletion).all()
+    assert not entry.releases_reference
+    path = entry.path
+    drain_photo_deletions(db_session)
+    assert not get_full_file_path(path).exists()
+
+
+def test_expired_reservation_drops_its_reference(db_session, dedup_storage):
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes(color=(6, 6, 6))), 1).relative_path
+    reservation_id = reserve_photo(db_session, relative)
+    db_session.commit()
+    assert db_session.get(PhotoBlob, content_address_of(relative)).ref_count == 1
+
+    # the uploading process died before its profile commit
+    assert drain_photo_deletions(db_session) == 0
+    db_session.get(PhotoDeletion, reservation_id).next_attempt_at = None
+    db_session.commit()
+    assert drain_photo_deletions(db_session) == 1
+    assert db_session.get(PhotoBlob, content_address_of(relative)) is None
+    assert not get_full_file_path(relative).exists()
+    assert not confirm_photo_reservation(db_session, reservation_id)
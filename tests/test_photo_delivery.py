@@ -0,0 +1,111 @@
+import io
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.storage.delivery import RangeNotSatisfiable, parse_range_header
+from nta_user_svc.storage.files import save_profile_photo, sharded_relative_path
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(32, 32), color=(0, 128, 255)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def _setup_photo(db_session, tmp_path, monkeypatch, email: str):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+
+    data = make_image_bytes()
+    relative = save_profile_photo(DummyUploadFile("p.png", "image/png", data), user.id).relative_path
+    db_session.add(Profile(user_id=user.id, profile_photo_path=relative))
+    db_session.commit()
+
+    token = create_access_token({"user_id": user.id})
+    return user, relative, data, {"Authorization": f"Bearer {token}"}
+
+
+def test_parse_range_header():
+    assert parse_range_header(None, 100) is None
+    assert parse_range_header("bytes=0-9", 100) == (0, 9)
+    assert parse_range_header("bytes=90-", 100) == (90, 99)
+    assert parse_range_header("bytes=-10", 100) == (90, 99)
+    assert parse_range_header("bytes=50-500", 100) == (50, 99)
+    # malformed or multi-range: serve the full body
+    assert parse_range_header("bytes=0-1,5-6", 100) is None
+    assert parse_range_header("items=0-1", 100) is None
+    assert parse_range_header("bytes=abc", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=100-", 100)
+
+
+def test_full_photo_advertises_ranges(client, db_session, tmp_path, monkeypatch):
+    user, _, data, headers = _setup_photo(db_session, tmp_path, monkeypatch, "full@example.com")
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.status_code == 200
+    assert resp.content == data
+    assert resp.headers["accept-ranges"] == "bytes"
+    assert resp.headers["content-length"] == str(len(data))
+
+
+def test_range_request_returns_partial_content(client, db_session, tmp_path, monkeypatch):
+    user, _, data, headers = _setup_photo(db_session, tmp_path, monkeypatch, "range@example.com")
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**headers, "Range": "bytes=4-15"})
+    assert resp.status_code == 206
+    assert resp.content == data[4:16]
+    assert resp.headers["content-range"] == f"bytes 4-15/{len(data)}"
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**headers, "Range": f"bytes={len(data)}-"})
+    assert resp.status_code == 416
+    assert resp.headers["content-range"] == f"bytes */{len(data)}"
+
+
+@pytest.mark.parametrize(
+    "mode,header",
+    [("x-accel-redirect", "x-accel-redirect"), ("x-sendfile", "x-sendfile")],
+)
+def test_offload_mode_returns_header_without_body(client, db_session, tmp_path, monkeypatch, mode, header):
+    user, relative, _, headers = _setup_photo(db_session, tmp_path, monkeypatch, f"{mode}@example.com")
+    monkeypatch.setattr(config, "PHOTO_OFFLOAD_MODE", mode)
+    monkeypatch.setattr(config, "PHOTO_OFFLOAD_PREFIX", "/internal/photos")
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.status_code == 200
+    assert resp.content == b""
+    assert resp.headers["content-type"] == "image/png"
+    if mode == "x-accel-redirect":
+        assert resp.headers[header] == f"/internal/photos/{relative}"
+    else:
+        assert resp.headers[header] == str(tmp_path / relative)
+
+
+def test_x_accel_redirect_follows_moved_photo(client, db_session, tmp_path, monkeypatch):
+    user, relative, _, headers = _setup_photo(db_session, tmp_path, monkeypatch, "moved@example.com")
+    monkeypatch.setattr(config, "PHOTO_OFFLOAD_MODE", "x-accel-redirect")
+    monkeypatch.setattr(config, "PHOTO_OFFLOAD_PREFIX", "/internal/photos")
+    # moved by the layout migration, profile row not rewritten yet
+    sharded = sharded_relative_path(relative)
+    (tmp_path / sharded).parent.mkdir(parents=True)
+    (tmp_path / relative).rename(tmp_path / sharded)
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["x-accel-redirect"] == f"/internal/photos/{sharded}"
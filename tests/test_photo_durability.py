@@ -0,0 +1,109 @@
+import io
+import threading
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.storage import durability
+from nta_user_svc.storage.durability import GroupCommitter
+from nta_user_svc.storage.files import get_full_file_path, save_profile_photo
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+@pytest.fixture
+def fsync_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    calls = []
+    real_fsync_path = durability.fsync_path
+
+    def _record(path):
+        calls.append(Path(path))
+        real_fsync_path(path)
+
+    monkeypatch.setattr(durability, "fsync_path", _record)
+    return calls
+
+
+def test_none_mode_never_fsyncs(fsync_calls, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_DURABILITY", "none")
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes()), 5).relative_path
+    assert get_full_file_path(relative).is_file()
+    assert fsync_calls == []
+
+
+def test_per_file_mode_fsyncs_file_and_directories(fsync_calls, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_DURABILITY", "per-file")
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes()), 5).relative_path
+    full = get_full_file_path(relative)
+    # temp file data, the user directory, and the base directory that gained "5/"
+    assert len(fsync_calls) == 3
+    assert fsync_calls[0].parent.name == ".incoming"
+    assert set(fsync_calls[1:]) == {full.parent, tmp_path.resolve()}
+
+    fsync_calls.clear()
+    save_profile_photo(DummyUploadFile("b.png", "image/png", make_image_bytes()), 5)
+    # the user directory already existed
+    assert fsync_calls[1:] == [full.parent]
+
+
+def test_grouped_commit_batches_directory_fsyncs(fsync_calls, tmp_path):
+    committer = GroupCommitter(window=0.05)
+    dest_dir = tmp_path / "7"
+    dest_dir.mkdir()
+    tmp_files = []
+    for i in range(6):
+        tmp = tmp_path / f"{i}.tmp"
+        tmp.write_bytes(b"x")
+        tmp_files.append(tmp)
+    errors = []
+
+    def _publish(i):
+        try:
+            committer.publish(tmp_files[i], dest_dir / f"{i}.png", [dest_dir])
+        except Exception as e:
+            errors.append((i, e))
+
+    # one member fails: its temp file is gone
+    tmp_files[3].unlink()
+    threads = [threading.Thread(target=_publish, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [i for i, _ in errors] == [3]
+    assert isinstance(errors[0][1], FileNotFoundError)
+    assert sorted(p.name for p in dest_dir.iterdir()) == ["0.png", "1.png", "2.png", "4.png", "5.png"]
+    # one fsync attempt per file and a single fsync of the shared directory
+    assert fsync_calls.count(dest_dir) == 1
+    assert len(fsync_calls) == 7
+
+    # a rename failing inside the group is reported to its own publisher only
+    tmp = tmp_path / "6.tmp"
+    tmp.write_bytes(b"x")
+    with pytest.raises(OSError):
+        committer.publish(tmp, tmp_path / "missing" / "6.png", [])
+
+
+def test_grouped_mode_through_save(fsync_calls, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_DURABILITY", "grouped")
+    monkeypatch.setattr(durability, "_committer", GroupCommitter(window=0.001))
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes()), 6).relative_path
+    assert get_full_file_path(relative).is_file()
+    assert get_full_file_path(relative).parent in fsync_calls
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.storage import executors
+from nta_user_svc.storage.files import get_full_file_path, save_profile_photo_async
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10)) -> bytes:
+    img = Image.new("RGB", size, (0, 0, 255))
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+@pytest.fixture
+def photo_pools(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_VERIFY_WORKERS", 1)
+    monkeypatch.setattr(config, "PHOTO_IO_WORKERS", 2)
+    executors.shutdown_executors()
+    yield
+    executors.shutdown_executors()
+
+
+def test_async_save_uses_process_pool(photo_pools):
+    data = make_image_bytes()
+
+    relative = asyncio.run(save_profile_photo_async(DummyUploadFile("a.png", "image/png", data), 5)).relative_path
+    assert relative.startswith("5/")
+    assert get_full_file_path(relative).read_bytes() == data
+    assert isinstance(executors.get_cpu_executor(), executors.ProcessPoolExecutor)
+    assert executors.get_io_executor()._max_workers == 2
+
+
+def test_async_save_rejects_corrupt_image(photo_pools, tmp_path):
+    # valid PNG signature, truncated body: only a real Pillow verify catches it
+    data = make_image_bytes()[:30]
+
+    with pytest.raises(ValueError):
+        asyncio.run(save_profile_photo_async(DummyUploadFile("a.png", "image/png", data), 6))
+    assert list((tmp_path / ".incoming").iterdir()) == []
+
+
+def test_io_work_runs_off_the_calling_thread(photo_pools):
+    async def which_thread():
+        return await executors.run_io_bound(lambda: threading.current_thread().name)
+
+    assert asyncio.run(which_thread()).startswith("photo-io")
+
+
+def test_zero_verify_workers_uses_io_pool(photo_pools, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_VERIFY_WORKERS", 0)
+    assert executors.get_cpu_executor() is executors.get_io_executor()
@@ -0,0 +1,127 @@
+import os
+import time
+import uuid
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile, PhotoBlob
+from nta_user_svc.storage.files import sharded_relative_path
+from nta_user_svc.storage.photo_gc import collect_orphan_photos, photo_key
+
+
+def _write(path, data: bytes = b"x" * 10, age: float = 2 * 86400):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def _profile(db, email: str, photo_path: str) -> None:
+    user = User(email=email, hashed_password="h")
+    db.add(user)
+    db.commit()
+    db.add(Profile(user_id=user.id, profile_photo_path=photo_path))
+    db.commit()
+
+
+def test_photo_key():
+    stem = uuid.uuid4().hex
+    assert photo_key(f"{stem}.png") == stem
+    assert photo_key(f"{stem}_48.png") == stem
+    assert photo_key(f"{stem}.avif") == stem
+    assert photo_key("notes.txt") is None
+
+
+def test_collects_only_old_unreferenced_files(session_local, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    live, orphan, recent = uuid.uuid4().hex, uuid.uuid4().hex, uuid.uuid4().hex
+    digest = "ab" * 32
+
+    with session_local() as db:
+        _profile(db, "gc1@example.com", f"1/{live}.png")
+        _profile(db, "gc2@example.com", f"sha256/ab/ab/{digest}.jpg")
+
+    kept = [
+        _write(tmp_path / "1" / f"{live}.png"),
+        _write(tmp_path / "1" / f"{live}_48.png"),
+        _write(tmp_path / "1" / f"{live}.webp"),
+        _write(tmp_path / "sha256" / "ab" / "ab" / f"{digest}.jpg"),
+        # unreferenced but inside the grace period
+        _write(tmp_path / "2" / f"{recent}.png", age=60),
+        # not a photo file
+        _write(tmp_path / "README.txt"),
+    ]
+    deleted = [
+        _write(tmp_path / "2" / f"{orphan}.png", b"y" * 100),
+        _write(tmp_path / "2" / f"{orphan}_48.png", b"y" * 20),
+        _write(tmp_path / ".incoming" / f"{uuid.uuid4().hex}.tmp", b"z" * 5),
+    ]
+
+    # a chunk size of 2 forces several sorted runs on both sides
+    stats = collect_orphan_photos(session_local, grace_seconds=3600, delete_rate=0, chunk_size=2)
+
+    assert all(path.exists() for path in kept)
+    assert not any(path.exists() for path in deleted)
+    assert stats["referenced"] == 4
+    assert stats["too_recent"] == 1
+    assert stats["deleted"] == 3
+    assert stats["reclaimed_bytes"] == 125
+
+
+def test_dry_run_reports_without_deleting(session_local, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    orphan = _write(tmp_path / "3" / f"{uuid.uuid4().hex}.png", b"y" * 64)
+
+    stats = collect_orphan_photos(session_local, grace_seconds=3600, dry_run=True)
+
+    assert orphan.exists()
+    assert stats["orphans"] == 1
+    assert stats["deleted"] == 0
+    assert stats["reclaimed_bytes"] == 64
+
+
+def test_file_referenced_during_run_is_kept(session_local, tmp_path, monkeypatch):
+    from nta_user_svc.storage import photo_gc
+
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    digest, stem = "cd" * 32, uuid.uuid4().hex
+    blob = _write(tmp_path / "sha256" / "cd" / "cd" / f"{digest}.png")
+    flat = _write(tmp_path / "4" / f"{stem}.png")
+    snapshot = photo_gc._referenced_keys
+
+    def referenced_after_snapshot(session_factory, chunk_size):
+        yield from snapshot(session_factory, chunk_size)
+        # a deduplicated upload reserves the blob, a rewrite points a profile at the file
+        with session_factory() as db:
+            db.add(PhotoBlob(sha256=digest, path=f"sha256/cd/cd/{digest}.png", ref_count=1))
+            db.commit()
+            _profile(db, "gc3@example.com", sharded_relative_path(f"4/{stem}.png"))
+
+    monkeypatch.setattr(photo_gc, "_referenced_keys", referenced_after_snapshot)
+    stats = collect_orphan_photos(session_local, grace_seconds=3600, delete_rate=0)
+
+    assert blob.exists() and flat.exists()
+    assert stats["orphans"] == 2
+    assert stats["referenced_again"] == 2
+    assert stats["deleted"] == 0
+
+
+def test_recheck_matches_exact_stored_paths(session_local, tmp_path, monkeypatch):
+    from nta_user_svc.storage import photo_gc
+
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    stem, other = uuid.uuid4().hex, uuid.uuid4().hex
+    variant = _write(tmp_path / "5" / f"{stem}_48.webp")
+    orphan = _write(tmp_path / "5" / f"{other}.png")
+    monkeypatch.setattr(photo_gc, "_referenced_keys", lambda session_factory, chunk_size: iter(()))
+
+    with session_local() as db:
+        # the variant's original, in the sharded layout; a path merely containing the
+        # other key does not reference it
+        _profile(db, "gc4@example.com", sharded_relative_path(f"5/{stem}.jpg"))
+        _profile(db, "gc5@example.com", f"6/{other}.png")
+    stats = collect_orphan_photos(session_local, grace_seconds=3600, delete_rate=0)
+
+    assert variant.exists() and not orphan.exists()
+    assert stats["referenced_again"] == 1
+    assert stats["deleted"] == 1
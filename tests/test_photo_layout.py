@@ -0,0 +1,133 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.storage.files import (
+    LAYOUT_FLAT,
+    LAYOUT_SHARDED,
+    get_full_file_path,
+    photo_layout_of,
+    save_profile_photo,
+    sharded_relative_path,
+    user_photo_dir,
+)
+from nta_user_svc.storage.layout_migration import migrate_photo_layout
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+@pytest.fixture
+def photo_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    return tmp_path
+
+
+def _profile_with_photo(db_session, email: str, user_id_photo_path) -> Profile:
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    path = user_id_photo_path(user.id)
+    profile = Profile(user_id=user.id, profile_photo_path=path)
+    db_session.add(profile)
+    db_session.commit()
+    return profile
+
+
+def test_user_photo_dir_layouts():
+    assert user_photo_dir(42, LAYOUT_FLAT) == "42"
+    sharded = user_photo_dir(42, LAYOUT_SHARDED)
+    shard_a, shard_b, user = sharded.split("/")
+    assert len(shard_a) == len(shard_b) == 2
+    assert user == "42"
+    assert photo_layout_of("42/abc.png") == LAYOUT_FLAT
+    assert photo_layout_of(f"{sharded}/abc.png") == LAYOUT_SHARDED
+    assert photo_layout_of("sha256/ab/cd/" + "0" * 64 + ".png") is None
+    assert sharded_relative_path("42/abc.png") == f"{sharded}/abc.png"
+
+
+def test_sharded_layout_for_new_uploads(photo_storage, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_STORAGE_LAYOUT", LAYOUT_SHARDED)
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes()), 7).relative_path
+    assert relative.startswith(user_photo_dir(7, LAYOUT_SHARDED) + "/")
+    assert photo_layout_of(relative) == LAYOUT_SHARDED
+    full = get_full_file_path(relative)
+    assert full.is_file()
+    assert (full.parent.stat().st_mode & 0o777) == 0o700
+
+
+def test_flat_path_resolves_after_move(photo_storage):
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes()), 7).relative_path
+    flat_full = get_full_file_path(relative)
+    sharded_full = photo_storage / sharded_relative_path(relative)
+    sharded_full.parent.mkdir(parents=True)
+    flat_full.rename(sharded_full)
+
+    assert get_full_file_path(relative) == sharded_full.resolve()
+
+
+def test_migration_moves_files_and_rewrites_paths(photo_storage, session_local, tmp_path_factory):
+    data = make_image_bytes()
+    with session_local() as db:
+        p1 = _profile_with_photo(
+            db, "a@example.com", lambda uid: save_profile_photo(DummyUploadFile("a.png", "image/png", data), uid).relative_path
+        )
+        p2 = _profile_with_photo(
+            db, "b@example.com", lambda uid: save_profile_photo(DummyUploadFile("b.png", "image/png", data), uid).relative_path
+        )
+        old_paths = {p1.id: p1.profile_photo_path, p2.id: p2.profile_photo_path}
+        # a derived sibling file moves with the original
+        sibling = get_full_file_path(p1.profile_photo_path).with_name("extra_48.png")
+        sibling.write_bytes(data)
+
+    state_file = str(tmp_path_factory.mktemp("state") / "layout.json")
+    stats = migrate_photo_layout(session_local, batch_size=1, state_file=state_file)
+    assert stats["migrated"] == 2
+    assert stats["files_moved"] == 3
+
+    with session_local() as db:
+        for profile_id, old in old_paths.items():
+            new = db.get(Profile, profile_id).profile_photo_path
+            assert new == sharded_relative_path(old)
+            assert get_full_file_path(new).read_bytes() == data
+            # the old value still resolves to the moved file
+            assert get_full_file_path(old) == get_full_file_path(new)
+            assert not (photo_storage / old.split("/")[0]).exists()
+
+    with open(state_file) as f:
+        assert json.load(f)["last_id"] == max(old_paths)
+
+    # resuming from the checkpoint finds nothing left to do
+    again = migrate_photo_layout(session_local, batch_size=1, state_file=state_file)
+    assert again["scanned"] == 0
+
+
+def test_migration_dry_run_changes_nothing(photo_storage, session_local):
+    data = make_image_bytes()
+    with session_local() as db:
+        p1 = _profile_with_photo(
+            db, "a@example.com", lambda uid: save_profile_photo(DummyUploadFile("a.png", "image/png", data), uid).relative_path
+        )
+        old = p1.profile_photo_path
+
+    stats = migrate_photo_layout(session_local, dry_run=True)
+    assert stats["migrated"] == 1
+    with session_local() as db:
+        assert db.get(Profile, p1.id).profile_photo_path == old
+    assert (photo_storage / old).is_file()
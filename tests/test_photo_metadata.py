@@ -0,0 +1,133 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.storage.files import get_full_file_path, save_profile_photo
+from nta_user_svc.storage.metadata_backfill import backfill_photo_metadata
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(12, 7), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+@pytest.fixture
+def photo_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    return tmp_path
+
+
+def _auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'user_id': user_id})}"}
+
+
+def test_save_returns_photo_metadata(photo_storage):
+    data = make_image_bytes("JPEG")
+    stored = save_profile_photo(DummyUploadFile("a.jpg", "image/jpeg", data), 3)
+    assert stored.relative_path.startswith("3/")
+    assert (stored.width, stored.height) == (12, 7)
+    assert stored.size == len(data)
+    assert stored.mime_type == "image/jpeg"
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+
+
+def test_get_full_file_path_rejects_traversal(photo_storage):
+    with pytest.raises(ValueError):
+        get_full_file_path("../outside.png")
+    with pytest.raises(ValueError):
+        get_full_file_path("1/../../outside.png")
+    assert get_full_file_path("1/./a.png") == photo_storage.resolve() / "1" / "a.png"
+
+
+def test_upload_records_metadata_and_serve_uses_it(client, db_session, photo_storage, monkeypatch):
+    user = User(email="meta@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    data = make_image_bytes()
+
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload", files={"file": ("a.png", data, "image/png")}, headers=_auth(user.id)
+    )
+    assert resp.status_code == 200
+    profile = db_session.query(Profile).filter_by(user_id=user.id).one()
+    db_session.refresh(profile)
+    digest = hashlib.sha256(data).hexdigest()
+    assert (profile.photo_width, profile.photo_height) == (12, 7)
+    assert profile.photo_size == len(data)
+    assert profile.photo_mime_type == "image/png"
+    assert profile.photo_sha256 == digest
+
+    real_stat = os.stat
+    photo_dir = str(photo_storage) + os.sep
+
+    def _no_photo_stat(path, *args, **kwargs):
+        if str(path).startswith(photo_dir):
+            raise AssertionError("photo stat'ed although its metadata is on the row")
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", _no_photo_stat)
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=_auth(user.id))
+    assert resp.status_code == 200
+    assert resp.content == data
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.headers["content-length"] == str(len(data))
+    assert resp.headers["etag"] == f'"{digest}"'
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**_auth(user.id), "If-None-Match": f'"{digest}"'})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**_auth(user.id), "Range": "bytes=1-4"})
+    assert resp.status_code == 206
+    assert resp.content == data[1:5]
+
+    # a missing file is still reported as 404 without a prior stat
+    monkeypatch.undo()
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(photo_storage))
+    os.unlink(get_full_file_path(profile.profile_photo_path))
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=_auth(user.id))
+    assert resp.status_code == 404
+
+
+def test_backfill_fills_rows_without_metadata(session_local, photo_storage):
+    data = make_image_bytes("WEBP")
+    with session_local() as db:
+        users = [User(email=f"bf{i}@example.com", hashed_password="h") for i in range(3)]
+        db.add_all(users)
+        db.commit()
+        stored = save_profile_photo(DummyUploadFile("a.webp", "image/webp", data), users[0].id)
+        db.add(Profile(user_id=users[0].id, profile_photo_path=stored.relative_path))
+        db.add(Profile(user_id=users[1].id, profile_photo_path=f"{users[1].id}/{'0' * 32}.png"))
+        db.add(Profile(user_id=users[2].id))
+        db.commit()
+        first_id = users[0].id
+
+    assert backfill_photo_metadata(session_local, dry_run=True)["updated"] == 1
+    stats = backfill_photo_metadata(session_local, batch_size=1)
+    assert stats == {"scanned": 2, "updated": 1, "missing": 1, "failed": 0, "skipped": 0}
+
+    with session_local() as db:
+        profile = db.query(Profile).filter_by(user_id=first_id).one()
+        assert (profile.photo_width, profile.photo_height) == (12, 7)
+        assert profile.photo_size == len(data)
+        assert profile.photo_mime_type == "image/webp"
+        assert profile.photo_sha256 == hashlib.sha256(data).hexdigest()
+
+    # filled rows are not selected again
+    assert backfill_photo_metadata(session_local)["scanned"] == 1
@@ -0,0 +1,106 @@
+import io
+import time
+from unittest.mock import patch
+
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile, PhotoDeletion
+from nta_user_svc.services import drain_photo_deletions, init_profile_photo_cleanup_listeners
+from nta_user_svc.services.photo_outbox_service import PhotoDeletionWorker
+from nta_user_svc.storage.files import get_full_file_path, save_profile_photo
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def _profile_with_photo(db_session, tmp_path, monkeypatch, email: str) -> Profile:
+    init_profile_photo_cleanup_listeners()
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes()), user.id).relative_path
+    profile = Profile(user_id=user.id, profile_photo_path=relative)
+    db_session.add(profile)
+    db_session.commit()
+    return profile
+
+
+def test_delete_queues_removal_until_drained(db_session, tmp_path, monkeypatch):
+    profile = _profile_with_photo(db_session, tmp_path, monkeypatch, "outbox1@example.com")
+    full = get_full_file_path(profile.profile_photo_path)
+
+    db_session.delete(profile)
+    db_session.commit()
+    assert full.exists()
+    assert db_session.query(PhotoDeletion).count() == 1
+
+    assert drain_photo_deletions(db_session) == 1
+    assert not full.exists()
+    assert db_session.query(PhotoDeletion).count() == 0
+
+
+def test_rolled_back_delete_keeps_photo(db_session, tmp_path, monkeypatch):
+    profile = _profile_with_photo(db_session, tmp_path, monkeypatch, "outbox2@example.com")
+    full = get_full_file_path(profile.profile_photo_path)
+
+    db_session.delete(profile)
+    db_session.flush()
+    db_session.rollback()
+
+    assert drain_photo_deletions(db_session) == 0
+    assert db_session.query(PhotoDeletion).count() == 0
+    assert full.exists()
+
+
+def test_failed_removal_is_retried_with_backoff(db_session, tmp_path, monkeypatch):
+    profile = _profile_with_photo(db_session, tmp_path, monkeypatch, "outbox3@example.com")
+    full = get_full_file_path(profile.profile_photo_path)
+    db_session.delete(profile)
+    db_session.commit()
+
+    with patch("nta_user_svc.storage.files.remove_file", side_effect=OSError("disk busy")):
+        assert drain_photo_deletions(db_session) == 0
+    entry = db_session.query(PhotoDeletion).one()
+    assert entry.attempts == 1
+    assert entry.last_error == "disk busy"
+    assert entry.next_attempt_at is not None
+
+    # not due yet
+    assert drain_photo_deletions(db_session) == 0
+    assert full.exists()
+
+    entry.next_attempt_at = None
+    db_session.commit()
+    assert drain_photo_deletions(db_session) == 1
+    assert not full.exists()
+
+
+def test_worker_drains_after_commit(db_session, session_local, tmp_path, monkeypatch):
+    profile = _profile_with_photo(db_session, tmp_path, monkeypatch, "outbox4@example.com")
+    full = get_full_file_path(profile.profile_photo_path)
+    db_session.delete(profile)
+    db_session.commit()
+
+    worker = PhotoDeletionWorker(session_local.kw["bind"])
+    worker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while full.exists() and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        worker.stop()
+    assert not full.exists()
@@ -0,0 +1,76 @@
+import asyncio
+import io
+
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.storage.files import save_profile_photo, save_profile_photo_async
+from nta_user_svc.storage.placeholder import _BASE83, compute_placeholder, encode_blurhash
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(40, 20), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def test_blurhash_of_solid_black_matches_reference():
+    # reference value produced by the blurhash reference implementations
+    assert encode_blurhash([(0, 0, 0)] * 16, 4, 4, 4, 3) == "L00000fQfQfQfQfQfQfQfQfQfQfQ"
+    assert len(encode_blurhash([(0, 0, 0)] * 16, 4, 4, 1, 1)) == 6
+
+
+def test_placeholder_encodes_average_color(tmp_path):
+    path = tmp_path / "a.png"
+    path.write_bytes(make_image_bytes(color=(0, 0, 255)))
+    blurhash = compute_placeholder(str(path), 3, 3)
+    assert blurhash[0] == "K"  # size flag (3 - 1) + (3 - 1) * 9 = 20
+    # the DC component (chars 2-5) holds the average sRGB colour
+    value = 0
+    for char in blurhash[2:6]:
+        value = value * 83 + _BASE83.index(char)
+    assert value == 0x0000FF
+    assert compute_placeholder(str(tmp_path / "missing.png"), 3, 3) is None
+
+
+def test_save_computes_placeholder(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    data = make_image_bytes("JPEG")
+    stored = save_profile_photo(DummyUploadFile("a.jpg", "image/jpeg", data), 1)
+    assert stored.placeholder is not None and len(stored.placeholder) == 28
+    stored_async = asyncio.run(save_profile_photo_async(DummyUploadFile("b.jpg", "image/jpeg", data), 1))
+    assert stored_async.placeholder == stored.placeholder
+
+    monkeypatch.setattr(config, "PHOTO_PLACEHOLDER_ENABLED", False)
+    assert save_profile_photo(DummyUploadFile("c.jpg", "image/jpeg", data), 1).placeholder is None
+
+
+def test_profile_responses_embed_placeholder(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    user = User(email="lqip@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("a.png", make_image_bytes(), "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+
+    own = client.get("/api/users/me/profile", headers=headers).json()
+    public = client.get(f"/api/profiles/{user.id}", headers=headers).json()
+    for body in (own, public):
+        assert len(body["photo_placeholder"]) == 28
+        assert (body["photo_width"], body["photo_height"]) == (40, 20)
@@ -0,0 +1,120 @@
+import hashlib
+import io
+
+import pytest
+from PIL import Image, features
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.storage.files import save_profile_photo, get_full_file_path, remove_profile_photo
+from nta_user_svc.storage.transcode import alternate_relative_path, negotiate_alternate
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_noisy_png(size=(128, 128)) -> bytes:
+    # photo-like noise compresses poorly as lossless PNG, well as WebP/AVIF
+    bands = [Image.effect_noise(size, 40), Image.linear_gradient("L").resize(size), Image.effect_noise(size, 20)]
+    img = Image.merge("RGB", bands)
+    bio = io.BytesIO()
+    img.save(bio, format="PNG", exif=Image.Exif())
+    return bio.getvalue()
+
+
+@pytest.fixture
+def webp_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 500000)
+    monkeypatch.setattr(config, "PHOTO_TRANSCODE_FORMATS", ["webp"])
+    monkeypatch.setattr(config, "PHOTO_TRANSCODE_QUALITY", 70)
+    return tmp_path
+
+
+def test_upload_stores_smaller_webp_alternate(webp_storage):
+    data = make_noisy_png()
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", data), 1).relative_path
+
+    alt = get_full_file_path(alternate_relative_path(relative, "webp"))
+    assert alt.is_file()
+    assert alt.stat().st_size < len(data)
+    with Image.open(alt) as img:
+        assert img.format == "WEBP"
+        assert not img.getexif()
+
+    remove_profile_photo(relative)
+    assert not alt.exists()
+
+
+def test_negotiate_alternate_honours_accept(webp_storage):
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_noisy_png()), 2).relative_path
+    webp = alternate_relative_path(relative, "webp")
+
+    assert negotiate_alternate(relative, "image/webp,image/*;q=0.8") == webp
+    assert negotiate_alternate(relative, "image/webp;q=0") == relative
+    # wildcards alone keep the original
+    assert negotiate_alternate(relative, "*/*") == relative
+    assert negotiate_alternate(relative, None) == relative
+    # the original competes with its own q-value
+    assert negotiate_alternate(relative, "image/png, image/webp;q=0.5") == relative
+    assert negotiate_alternate(relative, "image/*;q=0.9, image/webp;q=0.5") == relative
+    assert negotiate_alternate(relative, "image/jpeg, image/webp;q=0.5") == webp
+    assert negotiate_alternate(relative, "image/png;q=0.5, image/webp") == webp
+
+
+def test_upload_strips_original_metadata(webp_storage):
+    img = Image.merge("RGB", [Image.effect_noise((64, 32), 30)] * 3)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    exif[0x010F] = "Camera Maker"
+    exif.get_ifd(0x8825)[2] = (52.0, 31.0, 12.0)  # GPSLatitude
+    bio = io.BytesIO()
+    img.save(bio, format="JPEG", quality=95, exif=exif)
+
+    stored = save_profile_photo(DummyUploadFile("a.jpg", "image/jpeg", bio.getvalue()), 4)
+
+    path = get_full_file_path(stored.relative_path)
+    with Image.open(path) as original:
+        assert original.format == "JPEG"
+        assert not original.getexif()
+        assert original.size == (32, 64)
+    assert (stored.width, stored.height) == (32, 64)
+    assert stored.size == path.stat().st_size < len(bio.getvalue())
+    assert stored.content_hash == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+@pytest.mark.skipif(not features.check("avif"), reason="Pillow built without AVIF")
+def test_negotiate_prefers_avif_on_tie(webp_storage, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_TRANSCODE_FORMATS", ["webp", "avif"])
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_noisy_png()), 3).relative_path
+
+    assert negotiate_alternate(relative, "image/avif,image/webp") == alternate_relative_path(relative, "avif")
+    assert negotiate_alternate(relative, "image/avif;q=0.5,image/webp") == alternate_relative_path(relative, "webp")
+
+
+def test_get_photo_serves_negotiated_format(client, db_session, webp_storage):
+    user = User(email="transcode@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    data = make_noisy_png()
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", data), user.id).relative_path
+    db_session.add(Profile(user_id=user.id, profile_photo_path=relative))
+    db_session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**headers, "Accept": "image/webp,*/*"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/webp"
+    assert resp.headers["vary"] == "Accept"
+    assert len(resp.content) < len(data)
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers={**headers, "Accept": "*/*"})
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.content == get_full_file_path(relative).read_bytes()
+    with Image.open(io.BytesIO(resp.content)) as img:
+        assert "exif" not in img.info
@@ -0,0 +1,112 @@
+import io
+
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.services import drain_photo_deletions, init_profile_photo_cleanup_listeners
+from nta_user_svc.storage.files import save_profile_photo, get_full_file_path
+from nta_user_svc.storage.variants import (
+    get_or_create_variant,
+    remove_variants,
+    select_variant_size,
+    variant_relative_path,
+)
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "JPEG", size=(400, 200), color=(10, 200, 30)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def test_select_variant_size(monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_VARIANT_SIZES", [48, 128, 256])
+    assert select_variant_size(None) is None
+    assert select_variant_size(10) == 48
+    assert select_variant_size(48) == 48
+    assert select_variant_size(100) == 128
+    assert select_variant_size(1000) is None
+
+
+def test_variant_generated_lazily_and_memoized(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_VARIANT_SIZES", [48])
+
+    relative = save_profile_photo(DummyUploadFile("a.jpg", "image/jpeg", make_image_bytes()), 7).relative_path
+    expected = variant_relative_path(relative, 48)
+    assert not get_full_file_path(expected).exists()
+
+    variant = get_or_create_variant(relative, 48)
+    assert variant == expected
+    full = get_full_file_path(variant)
+    mtime = full.stat().st_mtime_ns
+    with Image.open(full) as img:
+        assert img.format == "JPEG"
+        assert img.size == (48, 24)
+
+    # second call reuses the stored file
+    assert get_or_create_variant(relative, 48) == variant
+    assert full.stat().st_mtime_ns == mtime
+
+    remove_variants(relative)
+    assert not full.exists()
+
+
+def test_eager_variants_created_on_upload(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_VARIANT_SIZES", [32, 64])
+    monkeypatch.setattr(config, "PHOTO_VARIANTS_EAGER", True)
+
+    relative = save_profile_photo(DummyUploadFile("a.png", "image/png", make_image_bytes("PNG")), 8).relative_path
+    for size in (32, 64):
+        assert get_full_file_path(variant_relative_path(relative, size)).is_file()
+
+
+def test_get_photo_with_size_and_cleanup_on_delete(client, db_session, tmp_path, monkeypatch):
+    init_profile_photo_cleanup_listeners()
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_VARIANT_SIZES", [48, 128])
+
+    user = User(email="variant@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    data = make_image_bytes()
+    relative = save_profile_photo(DummyUploadFile("a.jpg", "image/jpeg", data), user.id).relative_path
+    profile = Profile(user_id=user.id, profile_photo_path=relative)
+    db_session.add(profile)
+    db_session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+    resp = client.get(f"/api/profiles/{user.id}/photo?size=40", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/jpeg"
+    with Image.open(io.BytesIO(resp.content)) as img:
+        assert max(img.size) == 48
+
+    # larger than any variant: original
+    resp = client.get(f"/api/profiles/{user.id}/photo?size=1000", headers=headers)
+    assert resp.content == data
+
+    resp = client.get(f"/api/profiles/{user.id}/photo?size=0", headers=headers)
+    assert resp.status_code == 422
+
+    variant_full = get_full_file_path(variant_relative_path(relative, 48))
+    assert variant_full.exists()
+    db_session.delete(profile)
+    db_session.commit()
+    drain_photo_deletions(db_session)
+    assert not variant_full.exists()
+    assert not get_full_file_path(relative).exists()
@@ -42,7 +42,7 @@ def test_get_profile_photo_success(client, db_session, tmp_path, monkeypatch):
     # save a photo
     data = make_image_bytes(fmt="JPEG")
     upload = DummyUploadFile(filename="photo.jpg", content_type="image/jpeg", data=data)
-    relative = save_profile_photo(upload, user.id)
+    relative = save_profile_photo(upload, user.id).relative_path
 
     # attach to profile
     profile = Profile(user_id=user.id, profile_photo_path=relative)
@@ -79,7 +79,7 @@ def test_get_profile_photo_forbidden(client, db_session, tmp_path, monkeypatch):
     # save a photo for owner
     data = make_image_bytes(fmt="PNG")
     upload = DummyUploadFile(filename="p.png", content_type="image/png", data=data)
-    relative = save_profile_photo(upload, owner.id)
+    relative = save_profile_photo(upload, owner.id).relative_path
     profile = Profile(user_id=owner.id, profile_photo_path=relative)
     db_session.add(profile)
     db_session.commit()
@@ -0,0 +1,121 @@
+import json
+import os
+import time
+
+import pytest
+
+import nta_user_svc.config as config
+from nta_user_svc.profiling import (
+    enforce_output_caps,
+    get_profiling_stats,
+    reset_profiling_stats,
+    start_request_profile,
+)
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(config, "PROFILING_TOKEN", "s3cret")
+    monkeypatch.setattr(config, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PROFILING_INTERVAL", 0.001)
+    reset_profiling_stats()
+    yield tmp_path
+    reset_profiling_stats()
+
+
+@pytest.fixture
+def slow_hash(monkeypatch):
+    def busy_hash_password(password: str) -> str:
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+        return "hashed"
+
+    monkeypatch.setattr("nta_user_svc.routers.auth.hash_password", busy_hash_password)
+
+
+def _wait_written(count=1, timeout=5.0):
+    # profiles are written by the sampler thread after the response has been sent
+    deadline = time.monotonic() + timeout
+    while get_profiling_stats()["written"] < count:
+        assert time.monotonic() < deadline, "profile was not written"
+        time.sleep(0.01)
+
+
+def _register(client, email, headers=None):
+    return client.post(
+        "/api/auth/register", json={"email": email, "password": "password123"}, headers=headers or {}
+    )
+
+
+def test_authorized_header_writes_speedscope_profile(client, profiling, slow_hash):
+    resp = _register(client, "prof@example.com", {"X-Profile": "s3cret"})
+    assert resp.status_code == 201
+    filename = resp.headers["x-profile-file"]
+    assert filename.endswith(".speedscope.json")
+    _wait_written()
+
+    data = json.loads((profiling / filename).read_text())
+    profile = data["profiles"][0]
+    assert profile["type"] == "sampled"
+    assert profile["name"] == "POST /api/auth/register"
+    assert profile["samples"] and len(profile["weights"]) == len(profile["samples"])
+    names = {frame["name"] for frame in data["shared"]["frames"]}
+    assert "busy_hash_password" in names
+
+
+def test_wrong_token_is_not_profiled(client, profiling):
+    resp = _register(client, "nope@example.com", {"X-Profile": "guess"})
+    assert resp.status_code == 201
+    assert "x-profile-file" not in resp.headers
+    assert get_profiling_stats()["profiled"] == 0
+
+
+def test_sampled_request_writes_collapsed_stacks(client, profiling, slow_hash, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_TOKEN", "")
+    monkeypatch.setattr(config, "PROFILING_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(config, "PROFILING_FORMAT", "collapsed")
+
+    resp = _register(client, "sampled@example.com")
+    assert resp.status_code == 201
+    # only requests asking by header learn where their profile went
+    assert "x-profile-file" not in resp.headers
+
+    _wait_written()
+    (path,) = profiling.glob("*-POST-api_auth_register.collapsed.txt")
+    lines = path.read_text().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stack.startswith("thread ") and int(count) > 0
+    assert any("busy_hash_password (" in line for line in lines)
+
+
+def test_concurrent_profiles_are_capped(profiling, monkeypatch):
+    monkeypatch.setattr(config, "PROFILING_MAX_CONCURRENT", 1)
+    first = start_request_profile("GET", "/a")
+    try:
+        assert start_request_profile("GET", "/b") is None
+    finally:
+        first.finish()
+        first.join(timeout=5)
+    assert get_profiling_stats()["skipped_busy"] == 1
+    assert os.path.exists(first.path)
+    # the slot is free again
+    second = start_request_profile("GET", "/c")
+    second.finish()
+    second.join(timeout=5)
+
+
+def test_output_caps_evict_oldest_profiles(tmp_path):
+    for i in range(5):
+        path = tmp_path / f"{i}.collapsed.txt"
+        path.write_text("x" * 100)
+        os.utime(path, (1000 + i, 1000 + i))
+    (tmp_path / "notes.txt").write_text("not a profile")
+
+    assert enforce_output_caps(str(tmp_path), max_files=3, max_bytes=10**6) == 2
+    remaining = sorted(p.name for p in tmp_path.glob("*.collapsed.txt"))
+    assert remaining == ["2.collapsed.txt", "3.collapsed.txt", "4.collapsed.txt"]
+    assert enforce_output_caps(str(tmp_path), max_files=10, max_bytes=150) == 2
+    assert [p.name for p in tmp_path.glob("*.collapsed.txt")] == ["4.collapsed.txt"]
+    assert (tmp_path / "notes.txt").exists()
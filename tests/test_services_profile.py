@@ -5,7 +5,7 @@ import pytest
 from nta_user_svc.models import User, Profile
 from nta_user_svc.services.profile_service import ProfileService
 from nta_user_svc.schemas.profile import ProfileCreate, ProfileUpdate
-from nta_user_svc.services import init_profile_photo_cleanup_listeners
+from nta_user_svc.services import drain_photo_deletions, init_profile_photo_cleanup_listeners
 
 
 def test_create_and_get_profile_success(db_session):
@@ -80,7 +80,9 @@ def test_delete_profile_triggers_cleanup_listener(db_session, tmp_path, monkeypa
     with patch("nta_user_svc.storage.files.remove_file") as mock_remove:
         svc = ProfileService(db_session)
         svc.delete_profile(profile)
-        # listener should call remove_file once with the path
+        # listener only queues the removal; the file is untouched until the outbox drains
+        mock_remove.assert_not_called()
+        drain_photo_deletions(db_session)
         mock_remove.assert_called()
 
         # ensure profile is gone
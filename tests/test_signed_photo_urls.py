@@ -0,0 +1,110 @@
+import io
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User, Profile
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.security.photo_urls import sign_photo_path, verify_photo_signature
+from nta_user_svc.storage.files import save_profile_photo
+
+
+class DummyUploadFile:
+    def __init__(self, filename: str, content_type: str, data: bytes):
+        self.filename = filename
+        self.content_type = content_type
+        self.file = io.BytesIO(data)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(64, 32), color=(0, 128, 255)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def _setup_photo(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    user = User(email="signed@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    data = make_image_bytes()
+    relative = save_profile_photo(DummyUploadFile("p.png", "image/png", data), user.id).relative_path
+    db_session.add(Profile(user_id=user.id, profile_photo_path=relative))
+    db_session.commit()
+    return user, relative, data, {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+
+def test_signature_binds_path_size_and_expiry(monkeypatch):
+    params = sign_photo_path("1/abc.png", 48, ttl=60)
+    assert verify_photo_signature("1/abc.png", 48, params["expires"], params["sig"])
+    assert not verify_photo_signature("1/abd.png", 48, params["expires"], params["sig"])
+    assert not verify_photo_signature("1/abc.png", None, params["expires"], params["sig"])
+    assert not verify_photo_signature("1/abc.png", 48, params["expires"] + 1, params["sig"])
+    assert not verify_photo_signature("1/abc.png", 48, params["expires"], "")
+
+    expired = sign_photo_path("1/abc.png", ttl=60)
+    monkeypatch.setattr(time, "time", lambda: expired["expires"] + 1)
+    assert not verify_photo_signature("1/abc.png", None, expired["expires"], expired["sig"])
+
+
+def test_signing_key_setting_changes_signatures(monkeypatch):
+    params = sign_photo_path("1/abc.png", ttl=60)
+    monkeypatch.setattr(config, "PHOTO_URL_SIGNING_KEY", "another-key")
+    assert not verify_photo_signature("1/abc.png", None, params["expires"], params["sig"])
+
+
+def test_minted_url_serves_without_auth_or_db(client, db_session, tmp_path, monkeypatch):
+    user, relative, data, headers = _setup_photo(db_session, tmp_path, monkeypatch)
+
+    resp = client.post(f"/api/profiles/{user.id}/photo/url", headers=headers)
+    assert resp.status_code == 200
+    body = resp.json()
+    url = urlsplit(body["url"])
+    assert url.path == f"/api/photos/{relative}"
+    assert int(parse_qs(url.query)["expires"][0]) == body["expires_at"]
+
+    # the profile row is gone: serving the signed URL needs no database lookup
+    db_session.query(Profile).delete()
+    db_session.commit()
+
+    resp = client.get(f"{url.path}?{url.query}")
+    assert resp.status_code == 200
+    assert resp.content == data
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.headers["cache-control"].startswith("private, max-age=")
+
+    resp = client.get(f"{url.path}?{url.query}", headers={"Range": "bytes=0-1"})
+    assert resp.status_code == 206
+
+    resp = client.get(f"/api/photos/{relative}?{url.query.replace('sig=', 'sig=x')}")
+    assert resp.status_code == 403
+
+
+def test_minted_url_carries_size(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_VARIANT_SIZES", [16])
+    user, relative, data, headers = _setup_photo(db_session, tmp_path, monkeypatch)
+
+    url = urlsplit(client.post(f"/api/profiles/{user.id}/photo/url?size=16", headers=headers).json()["url"])
+    resp = client.get(f"{url.path}?{url.query}")
+    assert resp.status_code == 200
+    with Image.open(io.BytesIO(resp.content)) as img:
+        assert max(img.size) == 16
+
+    # the size cannot be changed without invalidating the signature
+    query = url.query.replace("size=16", "size=17")
+    assert client.get(f"{url.path}?{query}").status_code == 403
+
+
+def test_mint_requires_owner(client, db_session, tmp_path, monkeypatch):
+    user, _, _, _ = _setup_photo(db_session, tmp_path, monkeypatch)
+    other = User(email="other@example.com", hashed_password="h")
+    db_session.add(other)
+    db_session.commit()
+    token = create_access_token({"user_id": other.id})
+    resp = client.post(f"/api/profiles/{user.id}/photo/url", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 403
+    assert client.post(f"/api/profiles/{user.id}/photo/url").status_code == 401
@@ -0,0 +1,303 @@
+import hashlib
+import io
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.services import drain_photo_deletions
+from nta_user_svc.storage.backends import (
+    LocalStorageBackend,
+    S3StorageBackend,
+    close_storage_backend,
+)
+
+
+class FakeObjectStore:
+    """Minimal in-process S3-compatible server: objects and multipart uploads in memory."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.connections = 0
+        self.puts = 0
+        self.in_flight_parts = 0
+        self.max_in_flight_parts = 0
+        self.lock = threading.Lock()
+        store = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with store.lock:
+                    store.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _parse(self):
+                parts = urlsplit(self.path)
+                bucket, _, key = unquote(parts.path).lstrip("/").partition("/")
+                query = {k: v[0] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                assert self.headers["Authorization"].startswith("AWS4-HMAC-SHA256 Credential=key/")
+                assert self.headers["x-amz-content-sha256"] == hashlib.sha256(body).hexdigest()
+                return bucket, key, query, body
+
+            def do_PUT(self):
+                bucket, key, query, body = self._parse()
+                if "uploadId" in query:
+                    with store.lock:
+                        store.in_flight_parts += 1
+                        store.max_in_flight_parts = max(store.max_in_flight_parts, store.in_flight_parts)
+                    time.sleep(0.05)
+                    with store.lock:
+                        store.in_flight_parts -= 1
+                    store.uploads[query["uploadId"]][int(query["partNumber"])] = body
+                    self._reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+                    return
+                with store.lock:
+                    store.puts += 1
+                store.objects[(bucket, key)] = (body, self.headers.get("Content-Type", "binary/octet-stream"))
+                self._reply(200)
+
+            def do_POST(self):
+                bucket, key, query, body = self._parse()
+                if "uploads" in query:
+                    upload_id = f"upload-{len(store.uploads) + 1}"
+                    store.uploads[upload_id] = {}
+                    xml = f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                    self._reply(200, xml.encode())
+                    return
+                parts = store.uploads.pop(query["uploadId"])
+                numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+                assert numbers == sorted(parts)
+                store.objects[(bucket, key)] = (b"".join(parts[n] for n in numbers), "binary/octet-stream")
+                self._reply(200, b"<CompleteMultipartUploadResult/>")
+
+            def do_GET(self):
+                bucket, key, _, _ = self._parse()
+                if (bucket, key) not in store.objects:
+                    self._reply(404, b"<Error><Code>NoSuchKey</Code></Error>")
+                    return
+                data, content_type = store.objects[(bucket, key)]
+                self._reply(200, data, {"Content-Type": content_type})
+
+            def do_HEAD(self):
+                bucket, key, _, _ = self._parse()
+                if (bucket, key) not in store.objects:
+                    self._reply(404)
+                    return
+                data, content_type = store.objects[(bucket, key)]
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Last-Modified", "Mon, 19 Oct 2026 10:00:00 GMT")
+                self.end_headers()
+
+            def do_DELETE(self):
+                bucket, key, query, _ = self._parse()
+                if "uploadId" in query:
+                    store.uploads.pop(query["uploadId"], None)
+                else:
+                    store.objects.pop((bucket, key), None)
+                self._reply(204)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def object_store():
+    store = FakeObjectStore()
+    try:
+        yield store
+    finally:
+        store.stop()
+
+
+def _backend(store, **kwargs):
+    return S3StorageBackend(store.url, "photos", "key", "secret", **kwargs)
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10), color=(255, 0, 0)) -> bytes:
+    img = Image.new("RGB", size, color)
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def test_local_backend_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    backend = LocalStorageBackend()
+    backend.put("7/a.png", b"abc")
+    assert backend.exists("7/a.png")
+    assert backend.get("7/a.png") == b"abc"
+    assert b"".join(backend.stream("7/a.png", chunk_size=1)) == b"abc"
+    assert backend.stat("7/a.png").size == 3
+    backend.delete("7/a.png")
+    backend.delete("7/a.png")
+    assert not backend.exists("7/a.png")
+    with pytest.raises(FileNotFoundError):
+        backend.stream("7/a.png")
+
+
+def test_s3_backend_roundtrip_reuses_connections(object_store):
+    backend = _backend(object_store, key_prefix="avatars")
+    try:
+        backend.put("7/a b.png", b"hello", content_type="image/png")
+        assert object_store.objects[("photos", "avatars/7/a b.png")] == (b"hello", "image/png")
+        assert backend.exists("7/a b.png")
+        assert backend.get("7/a b.png") == b"hello"
+        assert b"".join(backend.stream("7/a b.png", chunk_size=2)) == b"hello"
+        stat_result = backend.stat("7/a b.png")
+        assert stat_result.size == 5
+        assert stat_result.content_type == "image/png"
+        assert stat_result.mtime > 0
+
+        backend.delete("7/a b.png")
+        backend.delete("7/a b.png")
+        assert not backend.exists("7/a b.png")
+        with pytest.raises(FileNotFoundError):
+            backend.get("7/a b.png")
+        with pytest.raises(FileNotFoundError):
+            backend.stream("7/a b.png")
+        # every sequential request went over one keep-alive connection
+        assert object_store.connections == 1
+    finally:
+        backend.close()
+
+
+def test_s3_stream_closed_unstarted_frees_connection(object_store):
+    backend = _backend(object_store, max_connections=1)
+    try:
+        backend.put("7/a.png", b"abc")
+        # as when the client disconnects before the response starts iterating
+        backend.stream("7/a.png").close()
+        assert backend._pool._slots.acquire(blocking=False)
+        backend._pool._slots.release()
+
+        chunks = backend.stream("7/a.png", chunk_size=1)
+        assert next(chunks) == b"a"
+        del chunks
+        assert backend._pool._slots.acquire(blocking=False)
+        backend._pool._slots.release()
+        assert backend.get("7/a.png") == b"abc"
+    finally:
+        backend.close()
+
+
+def test_s3_backend_concurrent_multipart_upload(object_store, tmp_path):
+    data = bytes(range(256)) * 40  # 10240 bytes -> 6 parts of 2000
+    path = tmp_path / "big.bin"
+    path.write_bytes(data)
+    backend = _backend(object_store, multipart_threshold=4096, part_size=2000, upload_concurrency=4)
+    try:
+        backend.put_file("7/big.bin", str(path))
+        assert object_store.objects[("photos", "7/big.bin")][0] == data
+        assert object_store.max_in_flight_parts > 1
+        assert not object_store.uploads
+    finally:
+        backend.close()
+
+
+@pytest.fixture
+def s3_storage(object_store, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    monkeypatch.setattr(config, "PHOTO_STORAGE_BACKEND", "s3")
+    monkeypatch.setattr(config, "S3_ENDPOINT_URL", object_store.url)
+    monkeypatch.setattr(config, "S3_BUCKET", "photos")
+    monkeypatch.setattr(config, "S3_ACCESS_KEY_ID", "key")
+    monkeypatch.setattr(config, "S3_SECRET_ACCESS_KEY", "secret")
+    close_storage_backend()
+    try:
+        yield object_store
+    finally:
+        close_storage_backend()
+
+
+def _user_headers(db_session, email: str):
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    return user, {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+
+def test_upload_and_serve_through_object_store(client, db_session, s3_storage, tmp_path):
+    object_store = s3_storage
+    user, headers = _user_headers(db_session, "s3@example.com")
+
+    data = make_image_bytes()
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("p.png", data, "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    relative = resp.json()["profile_photo_path"]
+    assert object_store.objects[("photos", relative)] == (data, "image/png")
+    # the staged local copy is gone
+    assert not (tmp_path / relative).exists()
+
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.status_code == 200
+    assert resp.content == data
+    assert resp.headers["content-type"] == "image/png"
+    assert resp.headers["content-length"] == str(len(data))
+
+    # replacing the photo deletes the old object
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("p.png", make_image_bytes(color=(0, 255, 0)), "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    drain_photo_deletions(db_session)
+    assert ("photos", relative) not in object_store.objects
+
+
+def test_identical_upload_is_not_put_again(client, db_session, s3_storage, monkeypatch):
+    monkeypatch.setattr(config, "PHOTO_DEDUP_ENABLED", True)
+    data = make_image_bytes(color=(5, 6, 7))
+    paths = []
+    for email in ("s3dedup_a@example.com", "s3dedup_b@example.com"):
+        user, headers = _user_headers(db_session, email)
+        resp = client.post(
+            f"/api/profiles/{user.id}/photo/upload",
+            files={"file": ("p.png", data, "image/png")},
+            headers=headers,
+        )
+        assert resp.status_code == 200
+        paths.append(resp.json()["profile_photo_path"])
+
+    assert paths[0] == paths[1]
+    assert s3_storage.objects[("photos", paths[0])] == (data, "image/png")
+    assert s3_storage.puts == 1
+    resp = client.get(f"/api/profiles/{user.id}/photo", headers=headers)
+    assert resp.content == data
@@ -0,0 +1,92 @@
+import time
+
+import anyio
+import anyio.to_thread
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+import nta_user_svc.config as config
+from nta_user_svc.database import get_db
+from nta_user_svc.threadpool import (
+    ThreadpoolStats,
+    configure_threadpool,
+    get_threadpool_stats,
+    sample_threadpool,
+)
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.on_event("startup")
+    async def _startup():
+        configure_threadpool()
+
+    @app.get("/sync")
+    def sync_route(db=Depends(get_db)):
+        return {"ok": True}
+
+    @app.get("/no-db")
+    def no_db_route():
+        return {"ok": True}
+
+    return app
+
+
+def test_threadpool_capacity_is_configured_at_startup(monkeypatch):
+    monkeypatch.setattr(config, "THREADPOOL_SIZE", 7)
+    with TestClient(make_app()) as client:
+        capacity = client.portal.call(lambda: anyio.to_thread.current_default_thread_limiter().total_tokens)
+        assert capacity == 7
+
+        get_threadpool_stats().reset()
+        client.portal.call(sample_threadpool)
+        stats = get_threadpool_stats().stats()
+        assert stats["capacity"] == 7
+        assert stats["queued"] == 0
+
+
+def test_sync_route_records_thread_wait():
+    get_threadpool_stats().reset()
+    with TestClient(make_app()) as client:
+        assert client.get("/no-db").status_code == 200
+        assert get_threadpool_stats().stats()["wait_count"] == 1
+        assert client.get("/sync").status_code == 200
+
+    stats = get_threadpool_stats().stats()
+    # get_db setup and the endpoint each take a token (FastAPI runs teardown on its own limiter)
+    assert stats["wait_count"] == 3
+    assert 0 <= stats["wait_seconds_p50"] <= stats["wait_seconds_max"]
+
+
+def test_thread_wait_is_measured_around_token_acquisition(monkeypatch):
+    monkeypatch.setattr(config, "THREADPOOL_SIZE", 1)
+
+    async def two_hops():
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(anyio.to_thread.run_sync, time.sleep, 0.2)
+            tg.start_soon(anyio.to_thread.run_sync, time.sleep, 0)
+
+    get_threadpool_stats().reset()
+    with TestClient(make_app()) as client:
+        client.portal.call(two_hops)
+
+    stats = get_threadpool_stats().stats()
+    assert stats["wait_count"] == 2
+    # the second hop waited for the first one's token
+    assert 0.15 <= stats["wait_seconds_max"] < 1
+
+
+def test_stats_saturation_and_thread_bound():
+    stats = ThreadpoolStats()
+    stats.sample(capacity=4, running=4, queued=3, db_pool_size=5, db_checked_out=2)
+    stats.sample(capacity=4, running=4, queued=1, db_pool_size=5, db_checked_out=5)
+    stats.sample(capacity=4, running=1, queued=0, db_pool_size=5, db_checked_out=1)
+    stats.sample(capacity=4, running=2, queued=0)
+
+    result = stats.stats()
+    assert result["peak_running"] == 4
+    assert result["peak_queued"] == 3
+    assert result["saturation"] == 0.5
+    # only the first sample queued for threads while the DB pool had idle connections
+    assert result["thread_bound"] == 0.25
@@ -0,0 +1,187 @@
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.models import User
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.tracing import (
+    TraceExporter,
+    attach,
+    detach,
+    end_trace,
+    get_trace_buffer,
+    parse_traceparent,
+    reset_trace_buffer,
+    span,
+    start_trace,
+    trace_engine,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SAMPLED = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+DEBUG_TOKEN = {"X-Debug-Token": "d3bug"}
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    monkeypatch.setattr(config, "TRACING_DEBUG_ENDPOINT", True)
+    monkeypatch.setattr(config, "TRACING_DEBUG_TOKEN", DEBUG_TOKEN["X-Debug-Token"])
+    reset_trace_buffer()
+    yield get_trace_buffer()
+    reset_trace_buffer()
+
+
+def _auth(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token({'user_id': user_id})}"}
+
+
+def _png() -> bytes:
+    bio = io.BytesIO()
+    Image.new("RGB", (8, 8), (0, 128, 255)).save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def _record_trace(name: str) -> None:
+    root = start_trace(name, SAMPLED.replace(TRACE_ID, f"{len(name):032x}"))
+    token = attach(root)
+    try:
+        with span("child"):
+            pass
+    finally:
+        detach(token)
+        end_trace(root)
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(SAMPLED) == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert parse_traceparent(SAMPLED[:-2] + "00")[2] is False
+    assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_spans_are_noops_outside_sampled_requests(monkeypatch):
+    with span("unsampled") as s:
+        assert s is None
+    monkeypatch.setattr(config, "TRACING_SAMPLE_RATE", 0.0)
+    assert start_trace("GET /") is None
+    # an unsampled parent is followed even at full sampling
+    monkeypatch.setattr(config, "TRACING_SAMPLE_RATE", 1.0)
+    assert start_trace("GET /", SAMPLED[:-2] + "00") is None
+    assert start_trace("GET /") is not None
+
+
+def test_untrusted_traceparent_only_correlates(monkeypatch):
+    monkeypatch.setattr(config, "TRACING_TRUST_TRACEPARENT", False)
+    monkeypatch.setattr(config, "TRACING_SAMPLE_RATE", 0.0)
+    assert start_trace("GET /", SAMPLED) is None
+    monkeypatch.setattr(config, "TRACING_SAMPLE_RATE", 1.0)
+    root = start_trace("GET /", SAMPLED[:-2] + "00")
+    assert root.trace.trace_id == TRACE_ID
+    assert root.parent_id == "00f067aa0ba902b7"
+
+
+def test_upload_trace_breaks_down_request(client, db_session, tmp_path, monkeypatch, traces):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    trace_engine(db_session.get_bind())
+    user = User(email="trace@example.com", hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("a.png", _png(), "image/png")},
+        headers={**_auth(user.id), "traceparent": SAMPLED},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["x-trace-id"] == TRACE_ID
+
+    listing = client.get("/debug/traces", params={"name": "upload"}, headers=DEBUG_TOKEN).json()
+    assert listing["recorded"] >= 1
+    trace = listing["traces"][0]
+    assert trace["trace_id"] == TRACE_ID
+    assert trace["name"] == "POST /api/profiles/{user_id}/photo/upload"
+    spans = {s["name"]: s for s in trace["spans"]}
+    for name in (
+        "http.receive_body",
+        "security.get_current_user",
+        "photos.upload_profile_photo",
+        "photos.get_profile",
+        "storage.spool",
+        "storage.verify",
+        "storage.publish",
+        "storage.durable_replace",
+        "photos.commit_new_photo",
+        "db.select",
+        "db.insert",
+    ):
+        assert name in spans, name
+    # work handed to the photo I/O pool stays in the request's trace
+    assert spans["storage.durable_replace"]["parent_id"] == spans["storage.publish"]["span_id"]
+    assert spans["storage.publish"]["parent_id"] == spans["photos.upload_profile_photo"]["span_id"]
+    assert spans["db.insert"]["attributes"]["db.system"] == "sqlite"
+    assert spans["http.receive_body"]["attributes"]["http.request.body.size"] > 0
+
+
+def test_debug_trace_is_otlp_json(client, traces):
+    _record_trace("GET /otlp")
+    trace_id = f"{len('GET /otlp'):032x}"
+
+    resp = client.get(f"/debug/traces/{trace_id}", headers=DEBUG_TOKEN)
+    assert resp.status_code == 200
+    resource_spans = resp.json()["resourceSpans"][0]
+    service = resource_spans["resource"]["attributes"][0]
+    assert service == {"key": "service.name", "value": {"stringValue": "nta_user_svc"}}
+    spans = resource_spans["scopeSpans"][0]["spans"]
+    root = next(s for s in spans if s["name"] == "GET /otlp")
+    child = next(s for s in spans if s["name"] == "child")
+    assert root["traceId"] == child["traceId"] == trace_id
+    assert root["parentSpanId"] == "00f067aa0ba902b7"
+    assert child["parentSpanId"] == root["spanId"]
+    assert int(root["endTimeUnixNano"]) >= int(child["endTimeUnixNano"])
+
+    assert client.get(f"/debug/traces/{'f' * 32}", headers=DEBUG_TOKEN).status_code == 404
+
+
+def test_debug_endpoint_requires_opt_in_and_token(client, monkeypatch, traces):
+    assert client.get("/debug/traces").status_code == 404
+    assert client.get("/debug/traces", headers={"X-Debug-Token": "guess"}).status_code == 404
+    assert client.get("/debug/traces", headers=DEBUG_TOKEN).status_code == 200
+    # enabled without a configured token stays closed
+    monkeypatch.setattr(config, "TRACING_DEBUG_TOKEN", "")
+    assert client.get("/debug/traces", headers={"X-Debug-Token": ""}).status_code == 404
+    monkeypatch.setattr(config, "TRACING_DEBUG_TOKEN", DEBUG_TOKEN["X-Debug-Token"])
+    monkeypatch.setattr(config, "TRACING_DEBUG_ENDPOINT", False)
+    assert client.get("/debug/traces", headers=DEBUG_TOKEN).status_code == 404
+
+
+def test_buffer_keeps_most_recent_traces(monkeypatch, traces):
+    monkeypatch.setattr(config, "TRACING_BUFFER_SIZE", 2)
+    reset_trace_buffer()
+    for name in ("a", "bb", "ccc"):
+        _record_trace(name)
+
+    buffer = get_trace_buffer()
+    assert [trace.root.name for trace in buffer.recent()] == ["ccc", "bb"]
+    assert buffer.stats() == {"buffered": 2, "capacity": 2, "recorded": 3}
+
+
+def test_exporter_writes_and_rotates_otlp_lines(tmp_path, traces):
+    exporter = TraceExporter(str(tmp_path), interval=60, max_bytes=1)
+    root = start_trace("GET /export", SAMPLED)
+    end_trace(root)
+
+    exporter.submit(root.trace)
+    exporter.flush()
+    line = json.loads(open(exporter.path).read())
+    assert line["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "GET /export"
+
+    # past max_bytes the current file becomes ".1"
+    exporter.submit(root.trace)
+    exporter.flush()
+    assert os.path.exists(f"{exporter.path}.1")
+    assert len(open(exporter.path).read().splitlines()) == 1
@@ -0,0 +1,112 @@
+import asyncio
+import io
+
+from PIL import Image
+
+import nta_user_svc.config as config
+from nta_user_svc.middleware import UploadLimitMiddleware
+from nta_user_svc.models import User
+from nta_user_svc.security.jwt import create_access_token
+from nta_user_svc.storage.files import sniff_image_extension
+
+
+def make_image_bytes(fmt: str = "PNG", size=(10, 10)) -> bytes:
+    img = Image.new("RGB", size, (255, 0, 0))
+    bio = io.BytesIO()
+    img.save(bio, format=fmt)
+    return bio.getvalue()
+
+
+def _user_headers(db_session, email: str):
+    user = User(email=email, hashed_password="h")
+    db_session.add(user)
+    db_session.commit()
+    return user, {"Authorization": f"Bearer {create_access_token({'user_id': user.id})}"}
+
+
+async def _run_streaming_upload(chunks, headers):
+    """Drive the middleware directly and report how many body chunks the app pulled."""
+    consumed = 0
+    sent = []
+
+    async def receive():
+        nonlocal consumed
+        consumed += 1
+        return {"type": "http.request", "body": chunks[consumed - 1], "more_body": consumed < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            if not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    scope = {"type": "http", "method": "POST", "path": "/api/profiles/1/photo/upload", "headers": headers}
+    await UploadLimitMiddleware(app)(scope, receive, send)
+    return consumed, sent[0]["status"]
+
+
+def test_sniff_image_extension():
+    assert sniff_image_extension(make_image_bytes("PNG")) == ".png"
+    assert sniff_image_extension(make_image_bytes("JPEG")) == ".jpg"
+    assert sniff_image_extension(make_image_bytes("WEBP")) == ".webp"
+    assert sniff_image_extension(b"GIF89a......") is None
+
+
+def test_declared_oversize_rejected_before_body(client, db_session, monkeypatch):
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 1000)
+    monkeypatch.setattr(config, "UPLOAD_BODY_OVERHEAD_BYTES", 1000)
+    user, headers = _user_headers(db_session, "limit1@example.com")
+
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("p.png", b"\x89PNG\r\n\x1a\n" + b"0" * 5000, "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 413
+    assert resp.json()["detail"] == "file too large"
+
+
+def test_streamed_oversize_aborts_after_limit(monkeypatch):
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 64 * 1024)
+    monkeypatch.setattr(config, "UPLOAD_BODY_OVERHEAD_BYTES", 1024)
+    # 16 MiB body sent without Content-Length
+    chunks = [b"x" * (64 * 1024)] * 256
+
+    consumed, status = asyncio.run(_run_streaming_upload(chunks, []))
+    assert status == 413
+    assert consumed == 2
+
+
+def test_wrong_type_rejected_on_first_chunk(monkeypatch):
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 10 * 1024 * 1024)
+    boundary = b"xyz"
+    first = (
+        b"--xyz\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.png\"\r\n"
+        b"Content-Type: image/png\r\n\r\nMZ\x90\x00 this is an executable"
+    )
+    chunks = [first] + [b"x" * 1024] * 100
+    headers = [(b"content-type", b"multipart/form-data; boundary=" + boundary)]
+
+    consumed, status = asyncio.run(_run_streaming_upload(chunks, headers))
+    assert status == 400
+    assert consumed == 1
+
+
+def test_valid_upload_passes_through(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_PHOTO_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "MAX_PHOTO_SIZE_BYTES", 200000)
+    user, headers = _user_headers(db_session, "limit2@example.com")
+
+    resp = client.post(
+        f"/api/profiles/{user.id}/photo/upload",
+        files={"file": ("p.png", make_image_bytes(), "image/png")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    # nothing left behind in the spool directory
+    assert list((tmp_path / ".incoming").iterdir()) == []
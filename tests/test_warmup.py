@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine
+
+import nta_user_svc.config as config
+from nta_user_svc.models.base import Base
+from nta_user_svc.warmup import is_ready, reset_warmup, run_warmup, start_warmup
+
+
+@pytest.fixture
+def warm_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warmup.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+    reset_warmup()
+
+
+def test_run_warmup_primes_pool_and_compiled_cache(warm_engine, monkeypatch):
+    monkeypatch.setattr(config, "WARMUP_DB_CONNECTIONS", 3)
+    reset_warmup()
+
+    timings = run_warmup(warm_engine)
+
+    assert set(timings) == {"db_pool", "queries", "serializers", "bcrypt", "imaging"}
+    assert is_ready()
+    assert warm_engine.pool.checkedin() == 3
+    # the hot statements were compiled once and cached
+    assert len(warm_engine._compiled_cache) >= 4
+
+
+def test_failing_step_does_not_block_readiness(monkeypatch):
+    reset_warmup()
+    # no tables: the query step fails and is skipped
+    engine = create_engine("sqlite://")
+    timings = run_warmup(engine)
+    assert "queries" in timings
+    assert is_ready()
+    reset_warmup()
+
+
+def test_readiness_waits_for_warmup(client, warm_engine, monkeypatch):
+    assert client.get("/health/live").status_code == 200
+    # WARMUP_ENABLED is off in the tests, so startup reported ready immediately
+    assert client.get("/health/ready").status_code == 200
+
+    reset_warmup()
+    resp = client.get("/health/ready")
+    assert resp.status_code == 503
+    assert resp.json() == {"status": "warming_up"}
+
+    monkeypatch.setattr(config, "WARMUP_ENABLED", True)
+    start_warmup(warm_engine).join(timeout=30)
+    resp = client.get("/health/ready")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "ready"
+    assert "queries" in resp.json()["warmup_seconds"]